@@ -18,14 +18,18 @@ It includes routes for searching podcast episodes, generating summaries, and man
 Key Features:
 - Search Functionality: Processes search queries to find relevant podcast episodes and returns the results in JSON format.
 - Summary Generation: Creates summaries for podcast episodes based on user input.
-- Request Logging: Captures details of incoming requests and logs them, including IP address, request method, and URL.
-- Response Logging: Logs the details of the responses sent back to the client.
+- Request Logging: Writes one record per request (IP address, method, URL, status, duration and truncated bodies)
+  through the background writer of `app.server.request_log`, sampled at LOG_SAMPLE_RATE.
 - Error Handling: Includes a custom handler for internal server errors (500) with logging support.
 
 Routes:
 - `/`: Renders the home page of the web application.
-- `/search`: Handles search requests for podcast episodes and returns results in JSON format.
+- `/search`: Handles search requests for podcast episodes and returns results in JSON format. An optional `fields`
+  selection (e.g. `fields=number,title,link`, in the JSON body or the query string) limits the returned fields.
 - `/make_summary`: Generates a summary for a specified podcast episode and returns the data in JSON format.
+- `/make_summary/stream`: Same as `/make_summary`, but streams the summary as Server-Sent Events while it is generated.
+- `/metrics`: Stage latencies, error counts and cache hit ratios in the Prometheus text format. Every response also
+  carries the stage timings of its request in a `Server-Timing` header.
 
 The module utilizes several external libraries, including `loguru` for logging, `json` for JSON parsing, and custom modules like `engine.similarity_retrieval` and `engine.security` for specific functionalities related to podcast data processing and security.
 
@@ -33,15 +37,19 @@ Usage of this module requires a running Flask environment and is intended to be
 """
 from urllib.parse import unquote
 import json
-from flask import Flask, request, jsonify, render_template, Response
+import time
+from flask import Flask, g, request, jsonify, render_template, Response, stream_with_context
 from flask_cors import CORS
 from werkzeug.exceptions import HTTPException
 from loguru import logger
 
-from engine.similiarty_retrieval import find_episodes
+from engine.similiarty_retrieval import find_episodes, parse_fields
 import engine.summarizer as summarizer
 from engine.security import GibberishDetector
-from engine.data_handler.get import get_episode
+from engine.data_handler.get import get_episodes_bulk, get_text, DataBase, EPISODE_CATALOG
+from app.server.compression import maybe_compress
+from app.server.request_log import RequestLog, sample, should_log, truncate
+from engine.metrics import render as render_metrics, start_request
 
 
 app = Flask(__name__)
@@ -51,43 +59,84 @@ logger.add("app.log", rotation="1 day", format="{time} {level} {message}")
 
 
 CORS(app)
+# no indentation in JSON responses, even when running with debug=True
+app.json.compact = True
+
+# load episode metadata at startup rather than on the first request
+if EPISODE_CATALOG:
+    DataBase.get_catalog()
 
 
 @app.before_request
 def log_request() -> None:
     """
-    Logs details about each incoming request.
+    Starts the log record of an incoming request.
 
-    Captures and logs the IP address, request method, URL, and request data.
-    Attempts to parse request data as JSON; if parsing fails, raw data is logged.
+    Notes the start time and whether the request is sampled for logging. The body is not parsed here;
+    the routes parse it once with request.get_json, and the log keeps the raw bytes.
 
     Returns:
         None
     """
-    ip = request.remote_addr
-    method = request.method
-    url = request.url
-    logger.info("Request from {ip}: {method} {url}", ip=ip, method=method, url=url)
-    try:
-        # Attempt to parse request data as JSON
-        request_data = json.loads(request.data.decode())
-    except json.JSONDecodeError:
-        # If parsing fails, use the raw data
-        request_data = request.data.decode()
-    logger.info(
-        "Request: path: {path}, json: {json}",
-        path=request.path,
-        json=request_data,
-    )
+    g.log_start = time.perf_counter()
+    g.log_sampled = sample()
+    g.timings = start_request()
+
+
+@app.after_request
+def add_server_timing(response: Response) -> Response:
+    """
+    Reports the time the request spent in each stage in a `Server-Timing` header.
+
+    A streamed response only reports the stages that ran before it started.
+
+    Args:
+        response (Response): The response to send.
+
+    Returns:
+        Response: The response with the header, if any stage was timed.
+    """
+    timings = g.get("timings")
+    header = timings.header() if timings is not None else ""
+    if header:
+        response.headers["Server-Timing"] = header
+    return response
+
+
+@app.after_request
+def compress_response(response: Response) -> Response:
+    """
+    Gzips JSON responses for clients that accept it.
+
+    Registered before log_response, so it runs after it and the log still shows the plain body.
+
+    Args:
+        response (Response): The response to send.
+
+    Returns:
+        Response: The response, compressed if the client accepts gzip and the body is large enough.
+    """
+    if (
+        response.is_streamed
+        or response.mimetype != "application/json"
+        or "Content-Encoding" in response.headers
+    ):
+        return response
+    compressed = maybe_compress(response.get_data(), request.headers.get("Accept-Encoding"))
+    response.vary.add("Accept-Encoding")
+    if compressed is not None:
+        response.set_data(compressed)
+        response.headers["Content-Encoding"] = "gzip"
+    return response
 
 
 @app.after_request
 def log_response(response: Response) -> Response:
     """
-    Logs details about the response after processing a request.
+    Queues one structured log record for the request and its response.
 
-    This function logs the response status code and the response data.
-    It attempts to parse the request data as JSON; if parsing fails, it logs the raw request data.
+    Bodies are truncated to LOG_BODY_MAX_BYTES, a streamed response is logged without its body, and the
+    record is written by a background thread, so this takes about the same time whatever the response.
 
     Args:
         response (Response): The response object to be logged.
@@ -95,15 +144,21 @@ def log_response(response: Response) -> Response:
     Returns:
         Response: The same response object for further processing by Flask.
     """
-    try:
-        # Attempt to parse request data as JSON
-        request_data = json.loads(request.data.decode())
-    except json.JSONDecodeError:
-        # If parsing fails, use the raw data
-        request_data = request.data.decode()
-    logger.info("Request Data: {data}", data=request_data)
-    logger.info("Response: Status: {response}", response=response.status_code)
-    logger.info("Response: {response}", response=response.data)
+    if not should_log(response.status_code, g.get("log_sampled", True)):
+        return response
+    # reading the data of a streamed response would consume the stream
+    body = None if response.is_streamed else truncate(response.get_data())
+    RequestLog.submit(
+        {
+            "ip": request.remote_addr,
+            "method": request.method,
+            "url": request.url,
+            "status": response.status_code,
+            "ms": round((time.perf_counter() - g.get("log_start", time.perf_counter())) * 1000, 1),
+            "request": truncate(request.get_data(cache=True)),
+            "response": body,
+        }
+    )
     return response
 
 
@@ -124,6 +179,15 @@ def handle_500_error(exception: HTTPException) -> tuple:
     return jsonify({"error": "Internal Server Error"}), 500
 
 
+@app.route("/metrics")
+def metrics():
+    """
+    Exposes the stage latencies, error counts and cache hit ratios in the Prometheus text format.
+    """
+    body, content_type = render_metrics()
+    return Response(body, content_type=content_type)
+
+
 @app.route("/")
 def index():
     """
@@ -140,7 +204,8 @@ def search():
     This function processes POST requests by extracting user input,
     checking for gibberish using the GibberishDetector, and then
     searching for relevant episodes using the 'find_episodes' function.
-    The results are returned as a JSON response.
+    The results are returned as a JSON response, with only the requested `fields` if a selection is given;
+    an unknown field is answered with 400.
 
     Returns:
         Any: A Flask response object containing the search results in JSON format.
@@ -152,11 +217,15 @@ def search():
         data = request.get_json()
         user_input = data["user_input"]
         user_input = unquote(user_input)
+        try:
+            fields = parse_fields(data.get("fields", request.args.get("fields")))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
 
         if GibberishDetector.detect(user_input):
             return jsonify({"results": []})
 
-        user_response = find_episodes(user_input)
+        user_response = find_episodes(user_input, fields=fields)
         response_data = {"results": user_response}
 
         return jsonify(response_data)
@@ -168,7 +237,8 @@ def make_summary():
     Creates and returns a summary for a specified podcast episode based on user input.
 
     This function processes POST requests by extracting the episode number, hint/question, and podcast title from the request.
-    It retrieves the episode data, generates a summary using the 'summarizer' module, and returns this information in JSON format.
+    It retrieves the episode data, reads the summary through the shared summary store (generating it with the
+    'summarizer' module on a miss), and returns this information in JSON format.
     """
 
     data = request.get_json()
@@ -177,17 +247,20 @@ def make_summary():
         data = request.get_json()
 
         episode_number = data["epi_num"]
-        hint = data["question"]
+        hint = unquote(data["question"])
         podcast_title = data["podcast_title"]
-        episode_data = get_episode(episode_number, podcast_title)
+        episode_data = get_episodes_bulk(
+            [(episode_number, podcast_title)], columns=("Number", "Title")
+        )[(str(episode_number), podcast_title)]
 
-        episode_number, episode_title, episode_text = (
-            episode_data[0][0],
-            episode_data[0][1],
-            episode_data[0][2],
-        )
+        episode_number, episode_title = episode_data["Number"], episode_data["Title"]
 
-        summary = summarizer.make_summary(episode_text=episode_text, hint=hint)
+        summary = summarizer.summarize_episode(
+            episode_number,
+            podcast_title,
+            hint,
+            load_text=lambda: get_text(episode_number, podcast_title)[0][0],
+        )
 
         response_data = {
             "results": {
@@ -201,6 +274,67 @@ def make_summary():
         return jsonify(response_data)
 
 
+def _sse(data: dict, event: str = None) -> str:
+    """
+    Formats one Server-Sent Event.
+    """
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data)}\n\n"
+
+
+@app.route("/make_summary/stream", methods=["POST"])
+def make_summary_stream():
+    """
+    Streams the summary of a specified podcast episode as Server-Sent Events.
+
+    Takes the same JSON body as `/make_summary`. The stream starts with a `meta` event holding the episode
+    number, title and podcast title, continues with one unnamed event per generated piece of the summary
+    (`{"token": ...}`), and ends with a `done` event holding the complete `episode_summary`, or an `error`
+    event if generation failed. The completed summary is written to the shared summary store.
+    """
+    data = request.get_json()
+
+    episode_number = data["epi_num"]
+    hint = unquote(data["question"])
+    podcast_title = data["podcast_title"]
+    episode_data = get_episodes_bulk(
+        [(episode_number, podcast_title)], columns=("Number", "Title")
+    )[(str(episode_number), podcast_title)]
+
+    episode_number, episode_title = episode_data["Number"], episode_data["Title"]
+
+    def _events():
+        yield _sse(
+            {
+                "episode_number": episode_number,
+                "episode_title": episode_title,
+                "podcast_title": podcast_title,
+            },
+            event="meta",
+        )
+        pieces = []
+        try:
+            for piece in summarizer.stream_episode_summary(
+                episode_number,
+                podcast_title,
+                hint,
+                load_text=lambda: get_text(episode_number, podcast_title)[0][0],
+            ):
+                pieces.append(piece)
+                yield _sse({"token": piece})
+        except Exception as e:
+            logger.exception("Streaming summary failed: {error}", error=e)
+            yield _sse({"error": "Internal Server Error"}, event="error")
+            return
+        yield _sse({"episode_summary": "".join(pieces)}, event="done")
+
+    return Response(
+        stream_with_context(_events()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 if __name__ == "__main__":
     logger.info("starting the app!")
     app.run(host="0.0.0.0", port=5500, debug=True)
@@ -0,0 +1,278 @@
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+This module serves the web interface as an ASGI application, with the same routes and payloads as the
+Flask application in `app.server.app`.
+
+Requests do not hold a thread while they wait: the embedding and LLM clients are awaited, SQLite is read
+on a few dedicated database threads, and the CPU-bound steps (gibberish detection, vector search, chunk
+selection) run on the default executor. A worker can therefore keep many more requests in flight than it
+has threads.
+
+Routes:
+- `/`: Renders the home page of the web application.
+- `/search`: Handles search requests for podcast episodes and returns results in JSON format. An optional `fields`
+  selection (e.g. `fields=number,title,link`, in the JSON body or the query string) limits the returned fields.
+- `/make_summary`: Generates a summary for a specified podcast episode and returns the data in JSON format.
+- `/make_summary/stream`: Same as `/make_summary`, but streams the summary as Server-Sent Events while it is generated.
+- `/metrics`: Stage latencies, error counts and cache hit ratios in the Prometheus text format.
+
+Usage:
+    uvicorn app.server.asgi:app --host 0.0.0.0 --port 5500 --workers 4
+"""
+import asyncio
+import json
+import os
+import time
+from urllib.parse import unquote
+from fastapi import FastAPI, Request
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse
+from loguru import logger
+
+from engine.similiarty_retrieval import afind_episodes, parse_fields
+import engine.summarizer as summarizer
+from engine.security import GibberishDetector
+from engine.data_handler.get import DataBase, EPISODE_CATALOG
+from engine.data_handler.aio import aget_episodes_bulk, aget_text
+from app.server.compression import maybe_compress
+from app.server.request_log import RequestLog, sample, should_log, truncate
+from engine.metrics import render as render_metrics, start_request
+
+
+TEMPLATES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "templates")
+
+app = FastAPI()
+logger.add("app.log", rotation="1 day", format="{time} {level} {message}")
+
+# Enable CORS (Cross-Origin Resource Sharing) for all routes
+app.add_middleware(
+    CORSMiddleware, allow_origins=["*"], allow_methods=["*"], allow_headers=["*"]
+)
+
+# load episode metadata at startup rather than on the first request
+if EPISODE_CATALOG:
+    DataBase.get_catalog()
+
+
+@app.middleware("http")
+async def log_request(request: Request, call_next):
+    """
+    Queues one structured log record per request, like the Flask application, and reports the request's
+    stage timings in a `Server-Timing` header.
+
+    The request body is the one the route read (`_request_json` keeps it on the request state); response
+    bodies are not buffered here, only their length is logged.
+    """
+    start = time.perf_counter()
+    sampled = sample()
+    # the route runs in a task that inherits this context, so its stages are added to these timings
+    timings = start_request()
+    response = await call_next(request)
+    header = timings.header()
+    if header:
+        response.headers["Server-Timing"] = header
+    if should_log(response.status_code, sampled):
+        RequestLog.submit(
+            {
+                "ip": request.client.host if request.client else None,
+                "method": request.method,
+                "url": str(request.url),
+                "status": response.status_code,
+                "ms": round((time.perf_counter() - start) * 1000, 1),
+                "request": truncate(getattr(request.state, "body", None)),
+                "response_bytes": response.headers.get("content-length"),
+            }
+        )
+    return response
+
+
+@app.exception_handler(Exception)
+async def handle_500_error(request: Request, exception: Exception) -> JSONResponse:
+    """
+    Logs unhandled exceptions and returns a standard error message to the client.
+    """
+    logger.exception("Server error: {exception}", exception=exception)
+    return JSONResponse({"error": "Internal Server Error"}, status_code=500)
+
+
+async def _request_json(request: Request) -> dict:
+    body = await request.body()
+    # the request log reads the raw body from here instead of parsing it again
+    request.state.body = body
+    return json.loads(body)
+
+
+def _json_response(request: Request, payload: dict, status_code: int = 200) -> Response:
+    """
+    Returns a compact JSON response, gzipped if the client accepts it.
+    """
+    response = JSONResponse(payload, status_code=status_code)
+    compressed = maybe_compress(response.body, request.headers.get("accept-encoding"))
+    if compressed is None:
+        response.headers["Vary"] = "Accept-Encoding"
+        return response
+    return Response(
+        compressed,
+        status_code=status_code,
+        media_type="application/json",
+        headers={"Content-Encoding": "gzip", "Vary": "Accept-Encoding"},
+    )
+
+
+async def _episode_header(data: dict) -> tuple:
+    """
+    Reads the episode of a summary request and looks up its number and title.
+    """
+    episode_number = data["epi_num"]
+    hint = unquote(data["question"])
+    podcast_title = data["podcast_title"]
+    episode_data = (
+        await aget_episodes_bulk(
+            [(episode_number, podcast_title)], columns=("Number", "Title")
+        )
+    )[(str(episode_number), podcast_title)]
+    return episode_data["Number"], episode_data["Title"], hint, podcast_title
+
+
+@app.get("/metrics")
+async def metrics():
+    """
+    Exposes the stage latencies, error counts and cache hit ratios in the Prometheus text format.
+    """
+    body, content_type = render_metrics()
+    return Response(body, headers={"Content-Type": content_type})
+
+
+@app.get("/")
+async def index():
+    """
+    Render the home page.
+    """
+    return FileResponse(os.path.join(TEMPLATES_PATH, "home.html"))
+
+
+@app.post("/search")
+async def search(request: Request):
+    """
+    Handle search requests and return results as JSON.
+
+    The gibberish check runs on the default executor; the search itself is awaited through
+    'afind_episodes'. Only the requested `fields` are returned if a selection is given; an unknown
+    field is answered with 400.
+    """
+    data = await _request_json(request)
+    user_input = unquote(data["user_input"])
+    try:
+        fields = parse_fields(data.get("fields", request.query_params.get("fields")))
+    except ValueError as e:
+        return _json_response(request, {"error": str(e)}, status_code=400)
+
+    if await asyncio.to_thread(GibberishDetector.detect, user_input):
+        return _json_response(request, {"results": []})
+
+    user_response = await afind_episodes(user_input, fields=fields)
+    return _json_response(request, {"results": user_response})
+
+
+@app.post("/make_summary")
+async def make_summary(request: Request):
+    """
+    Creates and returns a summary for a specified podcast episode based on user input.
+
+    The summary is read through the shared summary store and generated with the async LLM client on a miss.
+    """
+    data = await _request_json(request)
+    episode_number, episode_title, hint, podcast_title = await _episode_header(data)
+
+    async def _load_text() -> str:
+        return (await aget_text(episode_number, podcast_title))[0][0]
+
+    summary = await summarizer.asummarize_episode(
+        episode_number, podcast_title, hint, load_text=_load_text
+    )
+
+    return _json_response(
+        request,
+        {
+            "results": {
+                "episode_number": episode_number,
+                "episode_title": episode_title,
+                "episode_summary": summary,
+                "podcast_title": podcast_title,
+            }
+        },
+    )
+
+
+def _sse(data: dict, event: str = None) -> str:
+    """
+    Formats one Server-Sent Event.
+    """
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data)}\n\n"
+
+
+@app.post("/make_summary/stream")
+async def make_summary_stream(request: Request):
+    """
+    Streams the summary of a specified podcast episode as Server-Sent Events.
+
+    Sends the same `meta`, token, `done` and `error` events as the Flask route of the same name.
+    """
+    data = await _request_json(request)
+    episode_number, episode_title, hint, podcast_title = await _episode_header(data)
+
+    async def _load_text() -> str:
+        return (await aget_text(episode_number, podcast_title))[0][0]
+
+    async def _events():
+        yield _sse(
+            {
+                "episode_number": episode_number,
+                "episode_title": episode_title,
+                "podcast_title": podcast_title,
+            },
+            event="meta",
+        )
+        pieces = []
+        try:
+            async for piece in summarizer.astream_episode_summary(
+                episode_number, podcast_title, hint, load_text=_load_text
+            ):
+                pieces.append(piece)
+                yield _sse({"token": piece})
+        except Exception as e:
+            logger.exception("Streaming summary failed: {error}", error=e)
+            yield _sse({"error": "Internal Server Error"}, event="error")
+            return
+        yield _sse({"episode_summary": "".join(pieces)}, event="done")
+
+    return StreamingResponse(
+        _events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    logger.info("starting the app!")
+    uvicorn.run(
+        "app.server.asgi:app",
+        host="0.0.0.0",
+        port=5500,
+        workers=int(os.getenv("ASGI_WORKERS", "1")),
+    )
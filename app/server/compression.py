@@ -0,0 +1,64 @@
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+This module compresses JSON responses for clients that accept gzip.
+
+Constants:
+- COMPRESS_MIN_BYTES: Responses smaller than this are sent as is (environment variable COMPRESS_MIN_BYTES).
+- COMPRESS_LEVEL: The gzip level (environment variable COMPRESS_LEVEL).
+
+Functions:
+- accepts_gzip: Tells whether an Accept-Encoding header allows gzip.
+- maybe_compress: Gzips a response body when the client accepts it and it is worth it.
+"""
+import gzip
+import os
+from typing import Optional
+
+
+COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", "1024"))
+COMPRESS_LEVEL = int(os.getenv("COMPRESS_LEVEL", "6"))
+
+
+def accepts_gzip(accept_encoding: Optional[str]) -> bool:
+    """
+    Tells whether an Accept-Encoding header allows gzip.
+
+    Args:
+        accept_encoding (Optional[str]): The header value.
+
+    Returns:
+        bool: True unless gzip is absent or explicitly refused with q=0.
+    """
+    for coding in (accept_encoding or "").split(","):
+        name, _, params = coding.strip().partition(";")
+        if name.strip().lower() in ("gzip", "*"):
+            return params.replace(" ", "") not in ("q=0", "q=0.0", "q=0.00", "q=0.000")
+    return False
+
+
+def maybe_compress(body: bytes, accept_encoding: Optional[str]) -> Optional[bytes]:
+    """
+    Gzips a response body when the client accepts gzip and the body is at least COMPRESS_MIN_BYTES long.
+
+    Args:
+        body (bytes): The response body.
+        accept_encoding (Optional[str]): The Accept-Encoding header of the request.
+
+    Returns:
+        Optional[bytes]: The compressed body, or None if the body should be sent as is.
+    """
+    if len(body) < COMPRESS_MIN_BYTES or not accepts_gzip(accept_encoding):
+        return None
+    return gzip.compress(body, compresslevel=COMPRESS_LEVEL)
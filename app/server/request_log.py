@@ -0,0 +1,172 @@
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+This module writes one structured log record per request without blocking the request.
+
+The servers build a small record (method, path, status, duration and the request and response bodies,
+truncated) and hand it to a bounded queue; a background thread serializes and writes it. When the writer
+falls behind, new records are dropped and counted instead of stalling requests, so logging costs about the
+same whatever the size of the response or the speed of the disk.
+
+Constants:
+- LOG_QUEUE_SIZE: Records waiting for the writer before new ones are dropped (environment variable
+  LOG_QUEUE_SIZE).
+- LOG_BODY_MAX_BYTES: Bytes of a request or response body kept in the log (environment variable
+  LOG_BODY_MAX_BYTES).
+- LOG_SAMPLE_RATE: Share of successful requests that are logged; errors are always logged (environment
+  variable LOG_SAMPLE_RATE).
+
+Classes:
+- RequestLog: The bounded queue and its writer thread.
+
+Functions:
+- truncate: Decodes the head of a body for the log.
+- sample: Picks a request for logging at the sampling rate.
+- should_log: Decides whether a request is logged.
+"""
+import json
+import os
+import queue
+import random
+import threading
+from typing import Any, ClassVar, Dict, Optional
+from loguru import logger
+
+
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "1000"))
+LOG_BODY_MAX_BYTES = int(os.getenv("LOG_BODY_MAX_BYTES", "2048"))
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", "1.0"))
+
+
+def truncate(body: Optional[bytes], limit: int = LOG_BODY_MAX_BYTES) -> str:
+    """
+    Decodes at most `limit` bytes of a body, noting the full size when it is cut.
+
+    Args:
+        body (Optional[bytes]): The body.
+        limit (int, optional): Bytes kept. Defaults to LOG_BODY_MAX_BYTES.
+
+    Returns:
+        str: The (head of the) body.
+    """
+    if not body:
+        return ""
+    if len(body) <= limit:
+        return body.decode(errors="replace")
+    return body[:limit].decode(errors="replace") + f"... [{len(body)} bytes]"
+
+
+def should_log(status: int, sampled: bool) -> bool:
+    """
+    Decides whether a request is logged: errors always, other requests if they were sampled.
+
+    Args:
+        status (int): The status code of the response.
+        sampled (bool): Whether the request was picked by sampling.
+
+    Returns:
+        bool: Whether to log it.
+    """
+    return sampled or status >= 400
+
+
+def sample(rate: float = LOG_SAMPLE_RATE) -> bool:
+    """
+    Picks a request for logging with probability `rate`.
+    """
+    return rate >= 1 or random.random() < rate
+
+
+class RequestLog:
+    """
+    Queues request records for a background writer thread.
+
+    The queue and the thread are created on the first record.
+    """
+
+    _queue: ClassVar[Optional[queue.Queue]] = None
+    _thread: ClassVar[Optional[threading.Thread]] = None
+    _lock: ClassVar[threading.Lock] = threading.Lock()
+    _counts: ClassVar[Dict[str, int]] = {"written": 0, "dropped": 0}
+
+    @classmethod
+    def get_queue(cls) -> queue.Queue:
+        if cls._queue is None:
+            with cls._lock:
+                if cls._queue is None:
+                    cls._queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+        if cls._thread is None or not cls._thread.is_alive():
+            with cls._lock:
+                if cls._thread is None or not cls._thread.is_alive():
+                    cls._thread = threading.Thread(
+                        target=cls._write, args=(cls._queue,), name="request-log", daemon=True
+                    )
+                    cls._thread.start()
+        return cls._queue
+
+    @classmethod
+    def submit(cls, record: Dict[str, Any]) -> bool:
+        """
+        Hands a record to the writer without waiting.
+
+        Args:
+            record (Dict[str, Any]): The record; values must be JSON serializable.
+
+        Returns:
+            bool: False if the queue was full and the record was dropped.
+        """
+        try:
+            cls.get_queue().put_nowait(record)
+        except queue.Full:
+            cls._counts["dropped"] += 1
+            return False
+        return True
+
+    @classmethod
+    def _write(cls, records: queue.Queue) -> None:
+        while True:
+            record = records.get()
+            try:
+                logger.info("Request: {entry}", entry=json.dumps(record))
+                cls._counts["written"] += 1
+            except Exception as e:
+                logger.warning("Could not write request record: {error}", error=e)
+            finally:
+                records.task_done()
+
+    @classmethod
+    def flush(cls) -> None:
+        """
+        Waits until every queued record is written.
+        """
+        if cls._queue is not None:
+            cls._queue.join()
+
+    @classmethod
+    def stats(cls) -> Dict[str, int]:
+        """
+        Returns the written and dropped record counts and the current queue length.
+        """
+        pending = cls._queue.qsize() if cls._queue is not None else 0
+        return dict(cls._counts, pending=pending)
+
+    @classmethod
+    def reset(cls) -> None:
+        """
+        Replaces the queue (and the writer of the old one) and clears the counts.
+        """
+        with cls._lock:
+            cls._queue = None
+            cls._thread = None
+            cls._counts = {"written": 0, "dropped": 0}
@@ -0,0 +1,140 @@
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Benchmarks the gibberish classifier backends of engine.classifier_backends.
+
+Each backend is loaded in its own process so the resident memory it adds is measured in isolation, then
+the fixture inputs are classified one at a time and in batches. The labels of every backend are compared
+with the full-precision "torch" pipeline.
+
+The "onnx" backend needs an exported model: python -m data_preparation.export_gibberish_onnx
+
+Usage:
+    python -m benchmarks.gibberish_backends [--backends torch int8 onnx] [--threads 1] [--rounds 20]
+"""
+import argparse
+import multiprocessing
+import os
+import statistics
+import time
+
+import psutil
+
+from engine.classifier_backends import load_backend
+
+FIXTURES = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    "tests",
+    "fixtures",
+    "gibberish_inputs.txt",
+)
+
+
+def read_fixtures(path: str = FIXTURES) -> list:
+    with open(path, encoding="UTF-8") as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+def percentile(samples: list, q: float) -> float:
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+
+def measure(name: str, threads: int, rounds: int, batch_size: int, results) -> None:
+    try:
+        results.put(run_backend(name, threads, rounds, batch_size))
+    except Exception as e:
+        results.put({"backend": name, "error": repr(e)})
+
+
+def run_backend(name: str, threads: int, rounds: int, batch_size: int) -> dict:
+    process = psutil.Process()
+    texts = read_fixtures()
+    before = process.memory_info().rss
+    start = time.perf_counter()
+    backend = load_backend(name, threads=threads)
+    load_seconds = time.perf_counter() - start
+    labels = backend.classify(texts)
+
+    single = []
+    batched = []
+    for _ in range(rounds):
+        for text in texts:
+            start = time.perf_counter()
+            backend.classify([text])
+            single.append(time.perf_counter() - start)
+        for i in range(0, len(texts), batch_size):
+            start = time.perf_counter()
+            backend.classify(texts[i : i + batch_size])
+            batched.append((time.perf_counter() - start) / len(texts[i : i + batch_size]))
+
+    return {
+        "backend": name,
+        "load_s": load_seconds,
+        "rss_mb": (process.memory_info().rss - before) / 2**20,
+        "single_p50_ms": 1000 * statistics.median(single),
+        "single_p95_ms": 1000 * percentile(single, 0.95),
+        "batched_per_item_ms": 1000 * statistics.median(batched),
+        "labels": labels,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--backends", nargs="+", default=["torch", "int8", "onnx"])
+    parser.add_argument("--threads", type=int, default=1)
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--batch-size", type=int, default=16)
+    args = parser.parse_args()
+
+    context = multiprocessing.get_context("spawn")
+    reports = []
+    for name in args.backends:
+        results = context.Queue()
+        worker = context.Process(
+            target=measure, args=(name, args.threads, args.rounds, args.batch_size, results)
+        )
+        worker.start()
+        reports.append(results.get())
+        worker.join()
+
+    for report in [r for r in reports if "error" in r]:
+        print(f"{report['backend']}: failed with {report['error']}")
+    reports = [r for r in reports if "error" not in r]
+
+    texts = read_fixtures()
+    reference = next((r["labels"] for r in reports if r["backend"] == "torch"), None)
+    print(
+        f"{'backend':<8} {'load s':>7} {'rss MB':>8} {'p50 ms':>8} {'p95 ms':>8} "
+        f"{'batch ms/item':>14} {'agreement':>10}"
+    )
+    for report in reports:
+        agreement = (
+            sum(a == b for a, b in zip(reference, report["labels"])) / len(texts)
+            if reference is not None
+            else float("nan")
+        )
+        print(
+            f"{report['backend']:<8} {report['load_s']:>7.2f} {report['rss_mb']:>8.1f} "
+            f"{report['single_p50_ms']:>8.2f} {report['single_p95_ms']:>8.2f} "
+            f"{report['batched_per_item_ms']:>14.2f} {agreement:>10.1%}"
+        )
+        if reference is not None:
+            for text, want, got in zip(texts, reference, report["labels"]):
+                if want != got:
+                    print(f"    {text!r}: torch={want} {report['backend']}={got}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Benchmarks per-call `sqlite3.connect` against the pooled connections of engine.data_handler.
+
+A throwaway database with the same schema as data/merged/metadata.db is filled with synthetic
+episodes, then the same point lookups are timed with a fresh connection per query and with
+ConnectionPool.
+
+Usage:
+    python -m benchmarks.sqlite_pool [--episodes 200] [--queries 5000]
+"""
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import time
+
+from engine.constants import Podcast
+from engine.data_handler.pool import ConnectionPool
+
+QUERY = "SELECT Title FROM merged_data WHERE Number = ? AND Podcast_Name = ?"
+
+
+def make_database(path: str, episodes: int) -> None:
+    conn = sqlite3.connect(path)
+    conn.execute(
+        """
+    CREATE TABLE merged_data (
+        Number TEXT NOT NULL,
+        Title TEXT NOT NULL,
+        Text TEXT,
+        Summary TEXT,
+        URL TEXT,
+        Podcast_Name TEXT,
+        PRIMARY KEY (Number, Title)
+    )
+    """
+    )
+    conn.executemany(
+        "INSERT INTO merged_data VALUES (?, ?, ?, ?, ?, ?)",
+        [
+            (
+                str(i),
+                f"Episode {i}",
+                "lorem ipsum " * 4000,
+                "summary " * 50,
+                f"https://example.com/{i}",
+                Podcast.PHILOSOPHIZE_THIS.value,
+            )
+            for i in range(1, episodes + 1)
+        ],
+    )
+    conn.commit()
+    conn.close()
+
+
+def per_call(path: str, keys) -> float:
+    start = time.perf_counter()
+    for key in keys:
+        conn = sqlite3.connect(path)
+        cursor = conn.cursor()
+        cursor.execute(QUERY, key)
+        cursor.fetchall()
+        cursor.close()
+        conn.close()
+    return time.perf_counter() - start
+
+
+def pooled(path: str, keys) -> float:
+    pool = ConnectionPool(path)
+    start = time.perf_counter()
+    for key in keys:
+        cursor = pool.get().cursor()
+        cursor.execute(QUERY, key)
+        cursor.fetchall()
+        cursor.close()
+    elapsed = time.perf_counter() - start
+    pool.close_all()
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--episodes", type=int, default=200)
+    parser.add_argument("--queries", type=int, default=5000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "metadata.db")
+        make_database(path, args.episodes)
+        keys = [
+            (str(random.randint(1, args.episodes)), Podcast.PHILOSOPHIZE_THIS.value)
+            for _ in range(args.queries)
+        ]
+
+        for name, bench in (("per-call connect", per_call), ("pooled", pooled)):
+            elapsed = bench(path, keys)
+            print(
+                f"{name:>16}: {elapsed:.3f}s total, "
+                f"{elapsed / args.queries * 1e6:.1f}us/query"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -10,102 +10,319 @@
 
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+Builds a new version of the vector index from the episode transcripts.
+
+The build writes into a new directory under data/vectorDB/versions/ and finishes it with a manifest;
+the version is then activated, and running servers swap to it on their own. With VECTOR_BACKEND=numpy, the
+NumPy export of the version is written before it is activated. The previous version stays on disk, so
+`python -m data_preparation.manage_index rollback` restores it.
+
+With --incremental, the build starts from a copy of the active version and only touches what changed
+since: transcripts whose content hash is new or different are (re-)embedded, the chunks of changed and
+removed transcripts are deleted, and every other chunk is kept as is.
+
+Transcripts stream through a pipeline (see data_preparation.ingest): a process pool loads and chunks
+them, and the chunks of many transcripts are embedded together in batches sized by a token budget, under
+a token-bucket rate limit, while earlier batches are written. The achieved chunks/sec is logged and
+recorded in the manifest.
+
+Every build keeps a journal of the chunk batches and episodes it committed. With --resume, the newest
+interrupted build continues from its journal: committed chunks are neither embedded nor written again.
+
+Usage:
+    python -m data_preparation.build_database [--incremental] [--no-activate] [--resume]
+"""
+import argparse
+import functools
 import os
 import shutil
-import time
+from typing import Dict, List, Optional, Tuple
 from langchain.document_loaders import TextLoader
+from langchain.schema.document import Document
+from langchain.schema.embeddings import Embeddings
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain.embeddings import OpenAIEmbeddings
 from langchain.vectorstores import Chroma
 from loguru import logger
 from dotenv import load_dotenv
 from engine.constants import Podcast
+from engine.index_versions import (
+    MANIFEST_FILE,
+    NUMPY_SUBDIR,
+    activate,
+    content_hash,
+    create_version,
+    diff_files,
+    file_hash,
+    list_unfinished,
+    read_manifest,
+    resolve_index,
+    version_path,
+    write_manifest,
+)
+from engine.similiarty_retrieval import DB_PATH, VECTOR_BACKEND
+from engine.vector_engine import export_chroma
+from data_preparation.ingest import JOURNAL_FILE, Chunk, IngestJournal, ingest, make_chunks
 
 load_dotenv()
 
+TRANSCRIPTS_PATH = os.sep.join("./data/philosophize_this/episode_transcripts".split("/"))
+CHUNK_SIZE = 2000
+CHUNK_OVERLAP = 300
 
-def remove_old_data():
-    # Ask user for confirmation before proceeding
-    user_response = input(
-        "Are you sure you want to remove all contents in the vectorDB folder? (yes/no): "
-    )
-    if user_response.lower() != "yes":
-        print("Operation aborted.")
-        exit()
 
-    # Delete contents of the vectorDB folder
-    db_path = os.sep.join("./data/vectorDB".split("/"))
-    if os.path.exists(db_path):
-        shutil.rmtree(db_path)
-    os.makedirs(db_path)  # Recreate the empty folder
+def list_transcripts(path: str = TRANSCRIPTS_PATH) -> List[str]:
+    """
+    Lists the transcript files of a directory.
+    """
+    return sorted(f"{path}{os.sep}{f}" for f in os.listdir(path) if ".txt" in f)
 
 
-def build_new_db():
-    db_path = os.sep.join("./data/vectorDB".split("/"))
-    PT_episodes_path = os.sep.join(
-        "./data/philosophize_this/episode_transcripts".split("/")
-    )
-    PT_episodes = [
-        f"{PT_episodes_path}{os.sep}{f}"
-        for f in os.listdir(PT_episodes_path)
-        if ".txt" in f
-    ]
-
-    # PB_episodes_path = os.sep.join("./data/philosophy_bites/episode_transcripts_merged".split("/"))
-    # PB_episodes = [f"{PB_episodes_path}{os.sep}{f}" for f in os.listdir(PB_episodes_path) if ".txt" in f]
-
-    episodes = []
-
-    # episodes = episodes.extend(PB_episodes)
-    episodes.extend(PT_episodes)
-
-    text_splitter = RecursiveCharacterTextSplitter(chunk_size=2000, chunk_overlap=300)
-    logger.info(f"total of {len(episodes)} episodes")
-    for idx, epi in enumerate(episodes):
-        logger.info(f"Starting on episode {idx}, {epi}")
-        time.sleep(3)
-        loader = TextLoader(epi.replace(os.sep, "/"), encoding="UTF-8")
-
-        data = loader.load()
-
-        all_splits = text_splitter.split_documents(data)
-        for doc in all_splits:
-            podcast_title = (
-                Podcast.PHILOSOPHIZE_THIS
-                if "philosophize_this" in doc.metadata["source"]
-                else "Philosophy Bites"
-            )
+def split_transcript(path: str, text_splitter: RecursiveCharacterTextSplitter) -> List[Document]:
+    """
+    Loads a transcript, splits it into chunks and tags them with the episode and the transcript file.
+    """
+    loader = TextLoader(path.replace(os.sep, "/"), encoding="UTF-8")
+    all_splits = text_splitter.split_documents(loader.load())
+    for doc in all_splits:
+        podcast_title = (
+            Podcast.PHILOSOPHIZE_THIS
+            if "philosophize_this" in doc.metadata["source"]
+            else "Philosophy Bites"
+        )
 
-            if podcast_title == Podcast.PHILOSOPHIZE_THIS:
-                epi_num = int(doc.metadata["source"][-10:][3:6])
-            else:
-                episode_name_ind = doc.metadata["source"].rfind("/")
-                episode_name = doc.metadata["source"][episode_name_ind + 1 :]
-                first_ = episode_name.find("_")
-                epi_num = episode_name[:first_]
-
-            doc.metadata["epi_num"] = epi_num
-            doc.metadata["podcast"] = podcast_title
-
-        if len(all_splits) == 0:
-            logger.warning(f"{idx}:{epi} has an empty text file")
-            continue
-
-        try:
-            vector_storage = Chroma.from_documents(
-                documents=all_splits,
-                embedding=OpenAIEmbeddings(),
-                persist_directory=db_path,
-            )
-        except Exception as e:
-            logger.warning(
-                "Failed Vectorizing Episode with id, title: {idx} - {epi} Error: {error}",
-                idx=idx,
-                epi=epi,
-                error=e,
+        if podcast_title == Podcast.PHILOSOPHIZE_THIS:
+            epi_num = int(doc.metadata["source"][-10:][3:6])
+        else:
+            episode_name_ind = doc.metadata["source"].rfind("/")
+            episode_name = doc.metadata["source"][episode_name_ind + 1 :]
+            first_ = episode_name.find("_")
+            epi_num = episode_name[:first_]
+
+        doc.metadata["epi_num"] = epi_num
+        # Chroma only stores plain metadata values
+        doc.metadata["podcast"] = (
+            podcast_title.value if isinstance(podcast_title, Podcast) else podcast_title
+        )
+        # lets an incremental build find the chunks of a transcript
+        doc.metadata["file"] = os.path.basename(path)
+    return all_splits
+
+
+def load_episode(path: str, chunk_size: int, chunk_overlap: int) -> List[Chunk]:
+    """
+    Loads and chunks a transcript; runs in the worker processes of the ingestion pipeline.
+    """
+    text_splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    return make_chunks(os.path.basename(path), split_transcript(path, text_splitter))
+
+
+def _base_version(root: str, embedding_model: str) -> Optional[Dict]:
+    """
+    Returns the manifest of the active version if an incremental build can start from it.
+
+    That needs the file hashes of the version, and chunks made with the same model and splitter settings.
+    """
+    version, _ = resolve_index(root)
+    manifest = read_manifest(root, version) if version else None
+    if manifest is None or "files" not in manifest:
+        logger.warning("No versioned index with file hashes to update; building from scratch")
+        return None
+    if (manifest["embedding_model"], manifest["chunk_size"], manifest["chunk_overlap"]) != (
+        embedding_model,
+        CHUNK_SIZE,
+        CHUNK_OVERLAP,
+    ):
+        logger.warning("The active index was built with other settings; building from scratch")
+        return None
+    return manifest
+
+
+def _interrupted_build(root: str) -> Optional[Tuple[str, str, Dict]]:
+    """
+    Returns the newest build that was interrupted after it started ingesting.
+
+    Returns:
+        Optional[Tuple[str, str, Dict]]: Its version id, directory and replayed journal, or None.
+    """
+    for version in reversed(list_unfinished(root)):
+        path = version_path(root, version)
+        state = IngestJournal.read(os.path.join(path, JOURNAL_FILE))
+        if state["start"] is not None:
+            return version, path, state
+    return None
+
+
+def build_new_db(
+    root: str = DB_PATH,
+    activate_version: bool = True,
+    incremental: bool = False,
+    transcripts_path: str = TRANSCRIPTS_PATH,
+    embeddings: Optional[Embeddings] = None,
+    resume: bool = False,
+) -> str:
+    """
+    Builds a new index version.
+
+    Args:
+        root (str, optional): The index root. Defaults to DB_PATH.
+        activate_version (bool, optional): Whether the finished build becomes the active version.
+            Defaults to True.
+        incremental (bool, optional): Whether to update a copy of the active version instead of embedding
+            every transcript. Defaults to False.
+        transcripts_path (str, optional): The transcript directory. Defaults to TRANSCRIPTS_PATH.
+        embeddings (Embeddings, optional): The embedding client. Defaults to OpenAIEmbeddings.
+        resume (bool, optional): Whether to continue the newest interrupted build, from its journal,
+            instead of starting a new one. Defaults to False.
+
+    Returns:
+        str: The version id of the build.
+
+    Raises:
+        ValueError: If the interrupted build used other settings or the transcripts changed since.
+    """
+    # rate limit responses are retried by embed_batch, which also pauses the other requests
+    embeddings = embeddings if embeddings is not None else OpenAIEmbeddings(max_retries=0)
+    embedding_model = getattr(embeddings, "model", type(embeddings).__name__)
+    episodes = list_transcripts(transcripts_path)
+    files = {os.path.basename(epi): file_hash(epi) for epi in episodes}
+
+    interrupted = _interrupted_build(root) if resume else None
+    if resume and interrupted is None:
+        logger.warning("No interrupted build to resume; starting a new one")
+    if interrupted is not None:
+        version, db_path, state = interrupted
+        start = state["start"]
+        if (start["embedding_model"], start["chunk_size"], start["chunk_overlap"]) != (
+            embedding_model,
+            CHUNK_SIZE,
+            CHUNK_OVERLAP,
+        ):
+            raise ValueError(f"Build {version} used other settings; start a new build instead")
+        if start["files"] != files:
+            raise ValueError(f"The transcripts changed since build {version}; start a new build instead")
+        base_version = start["base_version"]
+        to_embed = set(start["to_embed"]) - state["episodes"]
+        committed = state["chunks"]
+        logger.info(
+            "Resuming vector index version {version}: {done} of {total} episodes committed",
+            version=version,
+            done=len(start["to_embed"]) - len(to_embed),
+            total=len(start["to_embed"]),
+        )
+        db = Chroma(persist_directory=db_path, embedding_function=embeddings)
+        collection = db._collection
+        journal = IngestJournal(os.path.join(db_path, JOURNAL_FILE))
+    else:
+        base = _base_version(root, embedding_model) if incremental else None
+        base_version = base["version"] if base is not None else None
+        version, db_path = create_version(root)
+        logger.info("Building vector index version {version}", version=version)
+        if base is not None:
+            # the old chunks are kept; the served version itself is never modified
+            _, base_path = resolve_index(root)
+            shutil.copytree(
+                base_path,
+                db_path,
+                dirs_exist_ok=True,
+                ignore=shutil.ignore_patterns(MANIFEST_FILE, NUMPY_SUBDIR, JOURNAL_FILE),
             )
+            added, changed, removed = diff_files(base["files"], files)
+            retry = [name for name in base.get("failed_episodes", []) if name in files]
+        else:
+            added, changed, removed = sorted(files), [], []
+            retry = []
+        to_embed = set(added) | set(changed) | set(retry)
+        committed = set()
+        logger.info(
+            "total of {total} episodes: {added} new, {changed} changed, {removed} removed",
+            total=len(episodes),
+            added=len(added),
+            changed=len(changed),
+            removed=len(removed),
+        )
+
+        db = Chroma(persist_directory=db_path, embedding_function=embeddings)
+        collection = db._collection
+        for name in sorted(set(changed) | set(removed)):
+            stale = collection.get(where={"file": name}, include=[])["ids"]
+            if stale:
+                collection.delete(ids=stale)
+        # from here on, the build can be resumed
+        journal = IngestJournal(os.path.join(db_path, JOURNAL_FILE))
+        journal.record(
+            "start",
+            files=files,
+            to_embed=sorted(to_embed),
+            base_version=base_version,
+            embedding_model=embedding_model,
+            chunk_size=CHUNK_SIZE,
+            chunk_overlap=CHUNK_OVERLAP,
+        )
+
+    load = functools.partial(load_episode, chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+    paths = [epi for epi in episodes if os.path.basename(epi) in to_embed]
+    try:
+        stats = ingest(paths, load, embeddings, collection, journal=journal, skip=committed)
+    finally:
+        journal.close()
+    failed = stats["failed"]
+    # an episode is either complete or absent; it is embedded again by the next incremental build
+    for name in sorted(failed):
+        partial = collection.get(where={"file": name}, include=[])["ids"]
+        if partial:
+            collection.delete(ids=partial)
+    logger.info(
+        "Embedded {chunks} chunks in {seconds:.1f}s ({rate:.1f} chunks/s)",
+        chunks=stats["chunks"],
+        seconds=stats["seconds"],
+        rate=stats["chunks_per_second"],
+    )
+
+    if VECTOR_BACKEND == "numpy":
+        # servers on the NumPy backend load <version>/numpy as soon as the version is activated
+        export_chroma(db, os.path.join(db_path, NUMPY_SUBDIR))
+
+    write_manifest(
+        root,
+        version,
+        {
+            "content_hash": content_hash(episodes),
+            "files": files,
+            "chunk_count": collection.count(),
+            "episode_count": len(episodes),
+            "failed_episodes": sorted(failed),
+            "chunks_per_second": round(stats["chunks_per_second"], 2),
+            "embedding_model": embedding_model,
+            "chunk_size": CHUNK_SIZE,
+            "chunk_overlap": CHUNK_OVERLAP,
+            "base_version": base_version,
+        },
+    )
+    if activate_version:
+        activate(root, version)
+    return version
 
 
 if __name__ == "__main__":
-    remove_old_data()
-    build_new_db()
+    parser = argparse.ArgumentParser(description="Builds a new version of the vector index.")
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="only embed new and changed transcripts, starting from the active version",
+    )
+    parser.add_argument(
+        "--no-activate",
+        action="store_true",
+        help="build the version without serving it; activate it later with manage_index",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="continue the newest interrupted build from its journal",
+    )
+    args = parser.parse_args()
+    build_new_db(
+        activate_version=not args.no_activate, incremental=args.incremental, resume=args.resume
+    )
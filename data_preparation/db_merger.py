@@ -12,6 +12,7 @@
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 import sqlite3
 from engine.constants import Podcast
+from engine.data_handler.pool import enable_wal
 
 
 def merge():
@@ -62,6 +63,9 @@ def merge():
     conn_pz.close()
     conn_merged.close()
 
+    # the servers only open read-only connections, which cannot change the journal mode
+    enable_wal(merged_path)
+
 
 if __name__ == "__main__":
     merge()
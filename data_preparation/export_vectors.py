@@ -0,0 +1,34 @@
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+import os
+from langchain.embeddings import OpenAIEmbeddings
+from langchain.vectorstores import Chroma
+from dotenv import load_dotenv
+
+from engine.index_versions import NUMPY_SUBDIR, resolve_index
+from engine.similiarty_retrieval import DB_PATH, NUMPY_INDEX_PATH
+from engine.vector_engine import export_chroma
+
+load_dotenv()
+
+
+def export():
+    # a versioned index is exported next to its Chroma files, a legacy one to NUMPY_INDEX_PATH
+    version, path = resolve_index(DB_PATH)
+    target = os.path.join(path, NUMPY_SUBDIR) if version else NUMPY_INDEX_PATH
+    db = Chroma(persist_directory=path, embedding_function=OpenAIEmbeddings())
+    export_chroma(db, target)
+
+
+if __name__ == "__main__":
+    export()
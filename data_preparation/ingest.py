@@ -0,0 +1,525 @@
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+Embeds transcript chunks for the index build in large, rate-limited batches, in a streaming pipeline.
+
+The build streams through three concurrent stages connected by bounded queues: a process pool loads and
+chunks transcripts across cores, embedding threads embed packed batches, and one writer thread upserts
+them into the collection. Only a few episodes and batches are in flight at any time, so memory stays
+bounded however many transcripts there are.
+
+An IngestJournal next to the collection records every batch and episode once it is written, so an
+interrupted build can be resumed without embedding the committed chunks again; chunk ids are deterministic
+and written with upserts, so a chunk written twice is still stored once.
+
+Chunks of many episodes are packed into batches bounded by a token budget and a size, so each embedding
+request carries as much as the API accepts. A token bucket keeps the build under the tokens-per-minute
+limit of the embedding API; when the API still answers with a rate limit, the bucket is paused for as long
+as the response asks (or with exponential backoff) and the batch is retried.
+
+Constants:
+- EMBED_BATCH_TOKENS: Token budget of one embedding request (environment variable EMBED_BATCH_TOKENS).
+- EMBED_BATCH_SIZE: Chunks per embedding request (environment variable EMBED_BATCH_SIZE).
+- EMBED_TOKENS_PER_MINUTE: Tokens per minute the build may send (environment variable EMBED_TOKENS_PER_MINUTE).
+- EMBED_MAX_RETRIES: Attempts per batch after rate limit responses (environment variable EMBED_MAX_RETRIES).
+- INGEST_WORKERS: Processes loading and chunking transcripts (environment variable INGEST_WORKERS).
+- INGEST_EMBED_WORKERS: Threads sending embedding requests (environment variable INGEST_EMBED_WORKERS).
+- INGEST_QUEUE_SIZE: Batches waiting between two stages (environment variable INGEST_QUEUE_SIZE).
+- JOURNAL_FILE: The journal file name inside a version directory.
+
+Classes:
+- TokenBucket: A thread-safe token bucket that can be paused.
+- Chunk: A chunk to embed, with its id and token count.
+- IngestJournal: A durable, append-only record of the committed batches and episodes of a build.
+
+Functions:
+- make_chunks: Gives the chunks of a transcript their ids and token counts.
+- pack_batches: Packs chunks into batches bounded by tokens and size.
+- embed_batch: Embeds one batch under the rate limit, retrying on rate limit responses.
+- write_batch: Upserts an embedded batch into a Chroma collection.
+- ingest: Streams transcripts through the load, embed and write stages.
+"""
+import collections
+import json
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+from langchain.schema.document import Document
+from langchain.schema.embeddings import Embeddings
+from loguru import logger
+
+from engine.context import count_tokens
+
+
+EMBED_BATCH_TOKENS = int(os.getenv("EMBED_BATCH_TOKENS", "50000"))
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "512"))
+EMBED_TOKENS_PER_MINUTE = int(os.getenv("EMBED_TOKENS_PER_MINUTE", "1000000"))
+EMBED_MAX_RETRIES = int(os.getenv("EMBED_MAX_RETRIES", "6"))
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", str(os.cpu_count() or 1)))
+INGEST_EMBED_WORKERS = int(os.getenv("INGEST_EMBED_WORKERS", "2"))
+INGEST_QUEUE_SIZE = int(os.getenv("INGEST_QUEUE_SIZE", "4"))
+JOURNAL_FILE = "journal.jsonl"
+
+# marks the end of a stage's input
+_DONE = object()
+
+
+class TokenBucket:
+    """
+    Hands out tokens at a fixed rate, up to a burst capacity.
+
+    Attributes:
+        rate (float): Tokens added per second.
+        capacity (float): The most tokens the bucket holds.
+    """
+
+    def __init__(self, tokens_per_minute: float = EMBED_TOKENS_PER_MINUTE, capacity: float = None) -> None:
+        self.rate = tokens_per_minute / 60
+        self.capacity = capacity if capacity is not None else tokens_per_minute
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, tokens: float) -> float:
+        """
+        Takes tokens from the bucket, waiting until they are available and any pause is over.
+
+        A request larger than the capacity waits for a full bucket and takes all of it.
+
+        Args:
+            tokens (float): The tokens to take.
+
+        Returns:
+            float: The seconds spent waiting.
+        """
+        tokens = min(tokens, self.capacity)
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                delay = max(self._paused_until - now, 0.0)
+                if delay == 0 and self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return waited
+                if delay == 0:
+                    delay = (tokens - self._tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+    def pause(self, seconds: float) -> None:
+        """
+        Stops handing out tokens for a while, e.g. after a rate limit response, and empties the bucket.
+        """
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            self._tokens = 0.0
+
+
+class Chunk:
+    """
+    A chunk to embed.
+
+    Attributes:
+        id (str): The id of the chunk in the collection.
+        document (Document): The text and metadata of the chunk.
+        tokens (int): The token count of the text.
+    """
+
+    __slots__ = ("id", "document", "tokens")
+
+    def __init__(self, id: str, document: Document, tokens: int) -> None:
+        self.id = id
+        self.document = document
+        self.tokens = tokens
+
+
+class IngestJournal:
+    """
+    A durable, append-only record of a build: its plan, then every committed batch and episode.
+
+    Each record is one JSON line, flushed and fsynced before the call returns; a line torn by a crash is
+    ignored when the journal is read.
+
+    Attributes:
+        path (str): The file path of the journal.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = open(path, "a", encoding="UTF-8")
+
+    def record(self, event: str, **fields: Any) -> None:
+        """
+        Appends a record and waits until it is on disk.
+
+        Args:
+            event (str): "start", "batch", "episode" or "failed".
+            **fields (Any): The JSON-serializable content of the record.
+        """
+        line = json.dumps(dict(fields, event=event, time=time.time()))
+        with self._lock:
+            self._file.write(line + "\n")
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def close(self) -> None:
+        with self._lock:
+            self._file.close()
+
+    @staticmethod
+    def read(path: str) -> Dict[str, Any]:
+        """
+        Replays a journal.
+
+        Args:
+            path (str): The file path of the journal.
+
+        Returns:
+            Dict[str, Any]: The `start` record (None if the build never started), the ids of the committed
+                `chunks` and the names of the committed `episodes`. The chunks of an episode that failed are
+                not counted as committed: the build deletes them.
+        """
+        state = {"start": None, "chunks": set(), "episodes": set()}
+        try:
+            with open(path, encoding="UTF-8") as f:
+                lines = f.readlines()
+        except FileNotFoundError:
+            return state
+        for line in lines:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                logger.warning("Ignoring a torn journal record in {path}", path=path)
+                continue
+            if entry["event"] == "start":
+                state["start"] = entry
+            elif entry["event"] == "batch":
+                state["chunks"].update(entry["ids"])
+            elif entry["event"] == "episode":
+                state["episodes"].add(entry["file"])
+            elif entry["event"] == "failed":
+                state["episodes"].discard(entry["file"])
+                state["chunks"] = {
+                    id for id in state["chunks"] if id.rpartition(":")[0] != entry["file"]
+                }
+        return state
+
+
+def make_chunks(name: str, documents: List[Document]) -> List[Chunk]:
+    """
+    Gives the chunks of a transcript their ids (`<file name>:<index>`) and token counts.
+
+    Args:
+        name (str): The transcript file name.
+        documents (List[Document]): Its chunks, in order.
+
+    Returns:
+        List[Chunk]: The chunks.
+    """
+    return [
+        Chunk(f"{name}:{i}", doc, count_tokens(doc.page_content)) for i, doc in enumerate(documents)
+    ]
+
+
+def pack_batches(
+    chunks: Iterable[Chunk],
+    max_tokens: int = EMBED_BATCH_TOKENS,
+    max_size: int = EMBED_BATCH_SIZE,
+) -> Iterator[List[Chunk]]:
+    """
+    Packs chunks, in order, into batches of at most `max_tokens` tokens and `max_size` chunks.
+
+    A chunk larger than the token budget gets a batch of its own.
+
+    Args:
+        chunks (Iterable[Chunk]): The chunks, possibly of many transcripts.
+        max_tokens (int, optional): The token budget of a batch. Defaults to EMBED_BATCH_TOKENS.
+        max_size (int, optional): The most chunks in a batch. Defaults to EMBED_BATCH_SIZE.
+
+    Yields:
+        List[Chunk]: The batches.
+    """
+    batch, tokens = [], 0
+    for chunk in chunks:
+        if batch and (tokens + chunk.tokens > max_tokens or len(batch) >= max_size):
+            yield batch
+            batch, tokens = [], 0
+        batch.append(chunk)
+        tokens += chunk.tokens
+    if batch:
+        yield batch
+
+
+def _retry_after(error: Exception) -> Optional[float]:
+    """
+    Returns how long a rate limit response asks to wait, or None if the error is not a rate limit.
+    """
+    status = getattr(error, "status_code", None) or getattr(error, "http_status", None)
+    if status != 429 and "rate limit" not in str(error).lower():
+        return None
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or getattr(error, "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def embed_batch(
+    embeddings: Embeddings,
+    batch: List[Chunk],
+    bucket: TokenBucket,
+    max_retries: int = EMBED_MAX_RETRIES,
+) -> List[List[float]]:
+    """
+    Embeds a batch with one request, within the rate limit of the bucket.
+
+    Rate limit responses pause the bucket for the time the response asks for, or with exponential
+    backoff, and the batch is sent again; other errors are raised.
+
+    Args:
+        embeddings (Embeddings): The embedding client; its own retries should be disabled.
+        batch (List[Chunk]): The chunks.
+        bucket (TokenBucket): The shared rate limiter.
+        max_retries (int, optional): Retries after rate limit responses. Defaults to EMBED_MAX_RETRIES.
+
+    Returns:
+        List[List[float]]: The vectors, in the order of the chunks.
+    """
+    texts = [chunk.document.page_content for chunk in batch]
+    tokens = sum(chunk.tokens for chunk in batch)
+    for attempt in range(max_retries + 1):
+        bucket.acquire(tokens)
+        try:
+            return embeddings.embed_documents(texts)
+        except Exception as e:
+            wait = _retry_after(e)
+            if wait is None or attempt == max_retries:
+                raise
+            wait = wait or min(2**attempt, 60)
+            logger.warning(
+                "Embedding rate limited, pausing {wait:.1f}s (attempt {attempt})",
+                wait=wait,
+                attempt=attempt + 1,
+            )
+            bucket.pause(wait)
+
+
+def write_batch(collection: Any, batch: List[Chunk], vectors: List[List[float]]) -> None:
+    """
+    Upserts an embedded batch into a Chroma collection; writing the same chunk twice keeps one copy.
+
+    Args:
+        collection (chromadb.Collection): The collection of the index version.
+        batch (List[Chunk]): The chunks.
+        vectors (List[List[float]]): Their embeddings.
+    """
+    collection.upsert(
+        ids=[chunk.id for chunk in batch],
+        embeddings=vectors,
+        documents=[chunk.document.page_content for chunk in batch],
+        metadatas=[chunk.document.metadata for chunk in batch],
+    )
+
+
+def _load_all(
+    paths: List[str], load: Callable[[str], List[Chunk]], workers: int
+) -> Iterator[Tuple[str, Optional[List[Chunk]]]]:
+    """
+    Loads transcripts in a process pool, in order, with at most two per worker loaded ahead.
+
+    Yields:
+        Tuple[str, Optional[List[Chunk]]]: The path and its chunks, or None if loading failed.
+    """
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = collections.deque()
+        paths = iter(paths)
+        while True:
+            for path in paths:
+                pending.append((path, pool.submit(load, path)))
+                if len(pending) >= 2 * workers:
+                    break
+            if not pending:
+                return
+            path, future = pending.popleft()
+            try:
+                yield path, future.result()
+            except Exception as e:
+                logger.warning("Failed loading {path}: {error}", path=path, error=e)
+                yield path, None
+
+
+def ingest(
+    paths: List[str],
+    load: Callable[[str], List[Chunk]],
+    embeddings: Embeddings,
+    collection: Any,
+    bucket: Optional[TokenBucket] = None,
+    workers: int = INGEST_WORKERS,
+    embed_workers: int = INGEST_EMBED_WORKERS,
+    queue_size: int = INGEST_QUEUE_SIZE,
+    batch_tokens: int = EMBED_BATCH_TOKENS,
+    batch_size: int = EMBED_BATCH_SIZE,
+    journal: Optional[IngestJournal] = None,
+    skip: Optional[Set[str]] = None,
+) -> Dict[str, Any]:
+    """
+    Streams transcripts through the load, embed and write stages.
+
+    With a journal, every written batch is recorded, and every episode once all its chunks are written.
+
+    Args:
+        paths (List[str]): The transcripts.
+        load (Callable[[str], List[Chunk]]): Loads and chunks one transcript; runs in the process pool, so
+            it must be a picklable, module-level function. Chunks carry their file name in the `file`
+            metadata.
+        embeddings (Embeddings): The embedding client.
+        collection (chromadb.Collection): The collection to write to.
+        bucket (TokenBucket, optional): The rate limiter. Defaults to a new TokenBucket.
+        workers (int, optional): Processes loading transcripts. Defaults to INGEST_WORKERS.
+        embed_workers (int, optional): Threads embedding batches. Defaults to INGEST_EMBED_WORKERS.
+        queue_size (int, optional): Batches waiting between two stages. Defaults to INGEST_QUEUE_SIZE.
+        batch_tokens (int, optional): The token budget of a batch. Defaults to EMBED_BATCH_TOKENS.
+        batch_size (int, optional): The most chunks in a batch. Defaults to EMBED_BATCH_SIZE.
+        journal (IngestJournal, optional): Records the committed batches and episodes. Defaults to None.
+        skip (Set[str], optional): Ids of chunks already committed, e.g. by an interrupted build; they are
+            not embedded again. Defaults to None.
+
+    Returns:
+        Dict[str, Any]: `chunks` written, the `failed` file names (some of their chunks may be written),
+            the `seconds` taken and the achieved `chunks_per_second`.
+    """
+    bucket = bucket if bucket is not None else TokenBucket()
+    to_embed: queue.Queue = queue.Queue(maxsize=queue_size)
+    to_write: queue.Queue = queue.Queue(maxsize=queue_size)
+    failed: Set[str] = set()
+    lock = threading.Lock()
+    running = [embed_workers]
+    written = 0
+    skip = skip or set()
+    # chunks of an episode still to be written, once it is loaded
+    remaining: Dict[str, int] = {}
+
+    def fail(names: Iterable[str]) -> None:
+        names = set(names)
+        with lock:
+            new = names - failed
+            failed.update(names)
+        if journal is not None:
+            for name in sorted(new):
+                journal.record("failed", file=name)
+
+    def written_chunks(name: str, count: int) -> None:
+        with lock:
+            remaining[name] -= count
+            complete = remaining[name] == 0 and name not in failed
+        if complete and journal is not None:
+            journal.record("episode", file=name)
+
+    def produce() -> None:
+        def chunks() -> Iterator[Chunk]:
+            for idx, (path, loaded) in enumerate(_load_all(paths, load, workers)):
+                logger.info(f"Loaded episode {idx}, {path}")
+                name = os.path.basename(path)
+                if loaded is None:
+                    fail([name])
+                    continue
+                if len(loaded) == 0:
+                    logger.warning(f"{idx}:{path} has an empty text file")
+                loaded = [chunk for chunk in loaded if chunk.id not in skip]
+                with lock:
+                    remaining[name] = len(loaded)
+                if not loaded:
+                    written_chunks(name, 0)
+                yield from loaded
+
+        try:
+            for batch in pack_batches(chunks(), batch_tokens, batch_size):
+                to_embed.put(batch)
+        except Exception as e:
+            logger.error("Loading transcripts failed: {error}", error=e)
+            fail(os.path.basename(path) for path in paths)
+        finally:
+            for _ in range(embed_workers):
+                to_embed.put(_DONE)
+
+    def embed() -> None:
+        while True:
+            batch = to_embed.get()
+            if batch is _DONE:
+                break
+            try:
+                to_write.put((batch, embed_batch(embeddings, batch, bucket)))
+            except Exception as e:
+                names = sorted({chunk.document.metadata["file"] for chunk in batch})
+                fail(names)
+                logger.warning(
+                    "Failed vectorizing a batch of {size} chunks of {names}: {error}",
+                    size=len(batch),
+                    names=names,
+                    error=e,
+                )
+        with lock:
+            running[0] -= 1
+            last = running[0] == 0
+        if last:
+            to_write.put(_DONE)
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=produce, name="ingest-load", daemon=True)]
+    threads += [
+        threading.Thread(target=embed, name=f"ingest-embed-{i}", daemon=True)
+        for i in range(embed_workers)
+    ]
+    for thread in threads:
+        thread.start()
+
+    # the writer runs here: the collection is only ever written from one thread
+    while True:
+        item = to_write.get()
+        if item is _DONE:
+            break
+        batch, vectors = item
+        try:
+            write_batch(collection, batch, vectors)
+        except Exception as e:
+            fail({chunk.document.metadata["file"] for chunk in batch})
+            logger.warning("Failed writing a batch of {size} chunks: {error}", size=len(batch), error=e)
+            continue
+        written += len(batch)
+        if journal is not None:
+            journal.record("batch", ids=[chunk.id for chunk in batch])
+        for name, count in collections.Counter(
+            chunk.document.metadata["file"] for chunk in batch
+        ).items():
+            written_chunks(name, count)
+    for thread in threads:
+        thread.join()
+
+    seconds = time.perf_counter() - start
+    return {
+        "chunks": written,
+        "failed": failed,
+        "seconds": seconds,
+        "chunks_per_second": written / seconds if seconds > 0 else 0.0,
+    }
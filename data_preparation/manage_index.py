@@ -0,0 +1,55 @@
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+Lists, activates and rolls back versions of the vector index.
+
+Running servers pick up the change within INDEX_CHECK_INTERVAL seconds.
+
+Usage:
+    python -m data_preparation.manage_index list
+    python -m data_preparation.manage_index activate <version>
+    python -m data_preparation.manage_index rollback
+"""
+import argparse
+import json
+
+from engine.index_versions import activate, current_version, list_versions, rollback
+from engine.similiarty_retrieval import DB_PATH
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--root", default=DB_PATH, help="the index root")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("list", help="list the finished builds")
+    activate_parser = commands.add_parser("activate", help="serve a finished build")
+    activate_parser.add_argument("version")
+    commands.add_parser("rollback", help="serve the previously active build again")
+    args = parser.parse_args()
+
+    if args.command == "list":
+        current = current_version(args.root)
+        for manifest in list_versions(args.root):
+            marker = "*" if manifest["version"] == current else " "
+            print(
+                f"{marker} {manifest['version']}  chunks={manifest.get('chunk_count')}  "
+                f"model={manifest.get('embedding_model')}  hash={manifest.get('content_hash', '')[:12]}"
+            )
+    elif args.command == "activate":
+        print(json.dumps(activate(args.root, args.version), indent=2))
+    else:
+        print(json.dumps(rollback(args.root), indent=2))
+
+
+if __name__ == "__main__":
+    main()
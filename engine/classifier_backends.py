@@ -0,0 +1,239 @@
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+This module provides CPU inference backends for the gibberish classifier.
+
+- "torch": the full-precision transformers pipeline (the reference, and what GibberishDetector serves by
+  default).
+- "int8": the same PyTorch model with its Linear layers dynamically quantized to int8.
+- "onnx": an ONNX Runtime session over an export of the model, optionally int8-quantized; it needs
+  neither PyTorch nor the full-precision weights at serving time.
+
+Every backend takes an explicit intra-op thread count, so several workers on one box do not each spin up
+one inference thread per core.
+
+Constants:
+- GIBBERISH_MODEL: The Hugging Face model of the classifier.
+- GIBBERISH_ONNX_PATH: The exported ONNX model (environment variable GIBBERISH_ONNX_PATH).
+- GIBBERISH_THREADS: Intra-op threads of the backend, 0 for the library default (environment variable
+  GIBBERISH_THREADS).
+- GIBBERISH_MAX_LENGTH: Tokens kept of every input.
+
+Classes:
+- PipelineBackend: Classifies with a transformers pipeline, optionally over an int8-quantized model.
+- OnnxBackend: Classifies with an ONNX Runtime session.
+
+Functions:
+- classify_with_pipeline: Labels texts with a text-classification pipeline, truncated like every backend.
+- load_backend: Builds a backend by name.
+- export_onnx: Exports the classifier to ONNX, optionally quantizing it to int8.
+- parity_report: Compares the labels of two backends on a set of texts.
+"""
+import os
+from typing import Any, Dict, List
+import numpy as np
+from loguru import logger
+
+
+GIBBERISH_MODEL = "wajidlinux99/gibberish-text-detector"
+GIBBERISH_ONNX_PATH = os.getenv(
+    "GIBBERISH_ONNX_PATH", os.sep.join("./data/models/gibberish-int8.onnx".split("/"))
+)
+GIBBERISH_THREADS = int(os.getenv("GIBBERISH_THREADS", "0"))
+GIBBERISH_MAX_LENGTH = 128
+
+
+class PipelineBackend:
+    """
+    Classifies texts with a transformers text-classification pipeline.
+
+    Attributes:
+        pipe (Pipeline): The pipeline.
+    """
+
+    def __init__(
+        self, model: str = GIBBERISH_MODEL, quantize: bool = False, threads: int = GIBBERISH_THREADS
+    ) -> None:
+        import torch
+        from transformers import AutoModelForSequenceClassification, AutoTokenizer, pipeline
+
+        if threads > 0:
+            torch.set_num_threads(threads)
+        network = AutoModelForSequenceClassification.from_pretrained(model)
+        if quantize:
+            network = torch.quantization.quantize_dynamic(
+                network, {torch.nn.Linear}, dtype=torch.qint8
+            )
+        self.pipe = pipeline(
+            "text-classification",
+            model=network,
+            tokenizer=AutoTokenizer.from_pretrained(model),
+        )
+
+    def classify(self, texts: List[str]) -> List[str]:
+        return classify_with_pipeline(self.pipe, texts)
+
+
+def classify_with_pipeline(pipe: Any, texts: List[str]) -> List[str]:
+    """
+    Labels texts with a text-classification pipeline in one batch, keeping GIBBERISH_MAX_LENGTH tokens of each.
+
+    Args:
+        pipe (Pipeline): The pipeline.
+        texts (List[str]): The texts to classify.
+
+    Returns:
+        List[str]: The label of every text, in order.
+    """
+    results = pipe(texts, batch_size=len(texts), truncation=True, max_length=GIBBERISH_MAX_LENGTH)
+    return [result["label"] for result in results]
+
+
+class OnnxBackend:
+    """
+    Classifies texts with an ONNX Runtime session over an exported classifier.
+
+    Attributes:
+        session (onnxruntime.InferenceSession): The inference session.
+        tokenizer (PreTrainedTokenizer): The tokenizer of the exported model.
+        labels (Dict[int, str]): Maps output indices to label names.
+    """
+
+    def __init__(
+        self,
+        path: str = GIBBERISH_ONNX_PATH,
+        model: str = GIBBERISH_MODEL,
+        threads: int = GIBBERISH_THREADS,
+    ) -> None:
+        import onnxruntime
+        from transformers import AutoConfig, AutoTokenizer
+
+        options = onnxruntime.SessionOptions()
+        if threads > 0:
+            options.intra_op_num_threads = threads
+        # batches are single forward passes; parallelism between operators does not help
+        options.inter_op_num_threads = 1
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = onnxruntime.InferenceSession(
+            path, sess_options=options, providers=["CPUExecutionProvider"]
+        )
+        self.tokenizer = AutoTokenizer.from_pretrained(model)
+        self.labels = AutoConfig.from_pretrained(model).id2label
+        self._inputs = [i.name for i in self.session.get_inputs()]
+
+    def classify(self, texts: List[str]) -> List[str]:
+        encoded = self.tokenizer(
+            texts,
+            padding=True,
+            truncation=True,
+            max_length=GIBBERISH_MAX_LENGTH,
+            return_tensors="np",
+        )
+        feeds = {name: encoded[name].astype(np.int64) for name in self._inputs}
+        logits = self.session.run(None, feeds)[0]
+        return [self.labels[int(i)] for i in np.argmax(logits, axis=-1)]
+
+
+def load_backend(name: str, threads: int = GIBBERISH_THREADS) -> Any:
+    """
+    Builds a gibberish classifier backend.
+
+    Args:
+        name (str): "torch", "int8" or "onnx".
+        threads (int, optional): Intra-op threads, 0 for the library default. Defaults to GIBBERISH_THREADS.
+
+    Returns:
+        Any: A backend with a `classify(texts) -> labels` method.
+
+    Raises:
+        ValueError: If the backend name is unknown.
+    """
+    logger.info("Loading gibberish classifier backend {name}", name=name)
+    if name == "torch":
+        return PipelineBackend(threads=threads)
+    if name == "int8":
+        return PipelineBackend(quantize=True, threads=threads)
+    if name == "onnx":
+        return OnnxBackend(threads=threads)
+    raise ValueError(f"Unknown gibberish backend: {name}")
+
+
+def export_onnx(
+    path: str = GIBBERISH_ONNX_PATH, model: str = GIBBERISH_MODEL, quantize: bool = True
+) -> str:
+    """
+    Exports the classifier to ONNX.
+
+    Args:
+        path (str, optional): The output file. Defaults to GIBBERISH_ONNX_PATH.
+        model (str, optional): The Hugging Face model to export. Defaults to GIBBERISH_MODEL.
+        quantize (bool, optional): Whether the weights are dynamically quantized to int8. Defaults to True.
+
+    Returns:
+        str: The path of the written model.
+    """
+    import torch
+    from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tokenizer = AutoTokenizer.from_pretrained(model)
+    network = AutoModelForSequenceClassification.from_pretrained(model).eval()
+    sample = tokenizer(["an example question", "asdf qwer"], padding=True, return_tensors="pt")
+    names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in sample]
+    axes = {name: {0: "batch", 1: "sequence"} for name in names}
+    axes["logits"] = {0: "batch"}
+
+    target = path + ".fp32" if quantize else path
+    with torch.no_grad():
+        torch.onnx.export(
+            network,
+            tuple(sample[name] for name in names),
+            target,
+            input_names=names,
+            output_names=["logits"],
+            dynamic_axes=axes,
+            opset_version=14,
+        )
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        quantize_dynamic(target, path, weight_type=QuantType.QInt8)
+        os.remove(target)
+    logger.info("Exported {model} to {path}", model=model, path=path)
+    return path
+
+
+def parity_report(reference: Any, candidate: Any, texts: List[str]) -> Dict[str, Any]:
+    """
+    Compares the labels two backends give to the same texts.
+
+    Args:
+        reference (Any): The reference backend, normally "torch".
+        candidate (Any): The backend under test.
+        texts (List[str]): The fixture texts.
+
+    Returns:
+        Dict[str, Any]: The agreement ratio and the (text, reference label, candidate label) mismatches.
+    """
+    expected = reference.classify(texts)
+    actual = candidate.classify(texts)
+    mismatches = [
+        (text, want, got) for text, want, got in zip(texts, expected, actual) if want != got
+    ]
+    return {
+        "agreement": 1 - len(mismatches) / len(texts) if texts else 1.0,
+        "mismatches": mismatches,
+    }
@@ -0,0 +1,507 @@
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+This module builds LLM prompts that fit the model's context window.
+
+Episode transcripts can exceed the window of the chat model. Instead of sending the whole text and
+failing, callers either keep the transcript chunks most relevant to a question (for relevance checks),
+or summarize the transcript with a parallel map-reduce (for summaries). Every LLM call made through
+this module has its token usage logged and counted.
+
+Constants:
+- CONTEXT_WINDOW: Tokens the chat model accepts (environment variable LLM_CONTEXT_WINDOW).
+- MAX_OUTPUT_TOKENS: Tokens reserved for the model's answer (environment variable LLM_MAX_OUTPUT_TOKENS).
+- CHUNK_TOKENS: Size of the transcript chunks used for selection and map-reduce.
+- MAP_CONCURRENCY: Map calls run at the same time during a map-reduce summary.
+
+Classes:
+- TokenUsage: Process-wide counters of prompt and completion tokens per call site.
+
+Functions:
+- count_tokens: Counts the tokens of a text for the chat model.
+- split_tokens: Splits a text into chunks of at most a given number of tokens.
+- prompt_budget: Tokens left for the inserted text once a prompt template and the answer are accounted for.
+- select_relevant_chunks: Keeps the chunks of a text most relevant to a query within a token budget.
+- run_llm: Runs a prompt template on the shared chat model and records its token usage.
+- stream_llm: Like run_llm, but yields the answer's tokens as the model produces them.
+- map_reduce_summary: Summarizes a text of any length with parallel map calls and a final reduce call.
+- stream_map_reduce_summary: Like map_reduce_summary, but streams the tokens of the final reduce call.
+- arun_llm, astream_llm, amap_reduce_summary, astream_map_reduce_summary: Async counterparts of the above
+  for the ASGI server; they await the model instead of holding a thread.
+"""
+import asyncio
+import functools
+import math
+import os
+import re
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, ClassVar, Dict, Iterator, List, Optional, Tuple
+from langchain.chains.llm import LLMChain
+from langchain.prompts import PromptTemplate
+from loguru import logger
+
+from engine.llm import ChatLLM, MODEL_NAME
+
+
+CONTEXT_WINDOW = int(os.getenv("LLM_CONTEXT_WINDOW", "16385"))
+MAX_OUTPUT_TOKENS = int(os.getenv("LLM_MAX_OUTPUT_TOKENS", "1024"))
+CHUNK_TOKENS = 1000
+MAP_CONCURRENCY = int(os.getenv("MAP_CONCURRENCY", "4"))
+# absorbs re-tokenization drift where chunks are joined back together
+SAFETY_MARGIN_TOKENS = 32
+MAX_REDUCE_DEPTH = 3
+
+_WORD = re.compile(r"\w+")
+
+
+@functools.lru_cache(maxsize=None)
+def _encoding():
+    """
+    Returns the tiktoken encoding of the chat model, or None if it cannot be loaded (e.g. offline).
+    """
+    try:
+        import tiktoken
+
+        return tiktoken.encoding_for_model(MODEL_NAME)
+    except Exception as e:
+        logger.warning(
+            "tiktoken encoding unavailable, estimating tokens from characters: {error}",
+            error=e,
+        )
+        return None
+
+
+def count_tokens(text: str) -> int:
+    """
+    Counts the tokens of a text for the chat model.
+
+    Without tiktoken the count is a conservative estimate of one token per three characters.
+
+    Args:
+        text (str): The text to measure.
+
+    Returns:
+        int: The number of tokens.
+    """
+    encoding = _encoding()
+    if encoding is None:
+        return math.ceil(len(text) / 3)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def split_tokens(text: str, chunk_tokens: int = CHUNK_TOKENS) -> List[str]:
+    """
+    Splits a text into consecutive chunks of at most chunk_tokens tokens.
+
+    Args:
+        text (str): The text to split.
+        chunk_tokens (int, optional): Maximum tokens per chunk. Defaults to CHUNK_TOKENS.
+
+    Returns:
+        List[str]: The chunks, in order.
+    """
+    chunk_tokens = max(1, chunk_tokens)
+    encoding = _encoding()
+    if encoding is None:
+        size = chunk_tokens * 3
+        return [text[i : i + size] for i in range(0, len(text), size)]
+    tokens = encoding.encode(text, disallowed_special=())
+    return [
+        encoding.decode(tokens[i : i + chunk_tokens])
+        for i in range(0, len(tokens), chunk_tokens)
+    ]
+
+
+def prompt_budget(template: str) -> int:
+    """
+    Returns how many tokens of inserted text a prompt template can take.
+
+    Args:
+        template (str): The prompt with its placeholders left empty.
+
+    Returns:
+        int: CONTEXT_WINDOW minus MAX_OUTPUT_TOKENS minus the tokens of the template itself.
+    """
+    return (
+        CONTEXT_WINDOW - MAX_OUTPUT_TOKENS - SAFETY_MARGIN_TOKENS - count_tokens(template)
+    )
+
+
+def select_relevant_chunks(
+    text: str, query: str, budget: int, chunk_tokens: int = CHUNK_TOKENS
+) -> str:
+    """
+    Reduces a text to the chunks most relevant to a query, within a token budget.
+
+    Texts that already fit are returned unchanged. Otherwise the text is split into chunks that are
+    ranked with BM25 against the query and packed best first until the budget is used; the kept
+    chunks are joined in their original order.
+
+    Args:
+        text (str): The text to reduce.
+        query (str): The question the chunks should be relevant to.
+        budget (int): Maximum tokens of the returned text.
+        chunk_tokens (int, optional): Size of the chunks. Defaults to CHUNK_TOKENS.
+
+    Returns:
+        str: A text of at most `budget` tokens.
+    """
+    if count_tokens(text) <= budget:
+        return text
+    if budget <= 0:
+        return ""
+
+    chunk_tokens = min(chunk_tokens, budget)
+    chunks = split_tokens(text, chunk_tokens)
+    scores = _bm25(chunks, query)
+    ranked = sorted(range(len(chunks)), key=lambda i: (-scores[i], i))
+
+    separator = "\n...\n"
+    separator_tokens = count_tokens(separator)
+    kept = []
+    used = 0
+    for i in ranked:
+        size = count_tokens(chunks[i]) + (separator_tokens if kept else 0)
+        if used + size > budget:
+            continue
+        kept.append(i)
+        used += size
+
+    return separator.join(chunks[i] for i in sorted(kept))
+
+
+def _bm25(chunks: List[str], query: str, k1: float = 1.5, b: float = 0.75) -> List[float]:
+    """
+    Scores every chunk against the query with Okapi BM25.
+    """
+    terms = set(_WORD.findall(query.lower()))
+    documents = [Counter(_WORD.findall(chunk.lower())) for chunk in chunks]
+    lengths = [sum(doc.values()) for doc in documents]
+    average = sum(lengths) / len(lengths) if lengths else 0.0
+
+    scores = [0.0] * len(chunks)
+    for term in terms:
+        frequency = sum(1 for doc in documents if term in doc)
+        if frequency == 0:
+            continue
+        idf = math.log(1 + (len(chunks) - frequency + 0.5) / (frequency + 0.5))
+        for i, doc in enumerate(documents):
+            tf = doc.get(term, 0)
+            if tf:
+                norm = k1 * (1 - b + b * lengths[i] / max(average, 1e-9))
+                scores[i] += idf * tf * (k1 + 1) / (tf + norm)
+    return scores
+
+
+class TokenUsage:
+    """
+    Counts the tokens sent to and received from the chat model, per call site.
+
+    Class Attributes:
+        _usage: A private class-level mapping of call site name to its counters.
+        _lock: A private class-level lock guarding _usage.
+    """
+
+    _usage: ClassVar[Dict[str, Dict[str, int]]] = {}
+    _lock: ClassVar[threading.Lock] = threading.Lock()
+
+    @classmethod
+    def record(cls, name: str, prompt_tokens: int, completion_tokens: int) -> None:
+        """
+        Logs and counts the token usage of one LLM call.
+
+        Args:
+            name (str): The call site, e.g. "is_related" or "make_summary.map".
+            prompt_tokens (int): Tokens of the prompt.
+            completion_tokens (int): Tokens of the answer.
+        """
+        with cls._lock:
+            usage = cls._usage.setdefault(
+                name, {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0}
+            )
+            usage["calls"] += 1
+            usage["prompt_tokens"] += prompt_tokens
+            usage["completion_tokens"] += completion_tokens
+        logger.info(
+            "[TOKENS] {name}: prompt={prompt}, completion={completion}",
+            name=name,
+            prompt=prompt_tokens,
+            completion=completion_tokens,
+        )
+
+    @classmethod
+    def stats(cls) -> Dict[str, Dict[str, int]]:
+        """
+        Returns a copy of the counters of every call site.
+        """
+        with cls._lock:
+            return {name: dict(usage) for name, usage in cls._usage.items()}
+
+
+def run_llm(name: str, template: str, **values: str) -> str:
+    """
+    Runs a prompt template on the shared chat model and records its token usage.
+
+    Args:
+        name (str): The call site name used for token accounting.
+        template (str): The prompt template.
+        **values (str): Values of the template's placeholders.
+
+    Returns:
+        str: The model's answer.
+    """
+    prompt = PromptTemplate.from_template(template)
+    llm_chain = LLMChain(llm=ChatLLM.get_llm(), prompt=prompt)
+    output = llm_chain.run(**values)
+    TokenUsage.record(
+        name,
+        prompt_tokens=count_tokens(prompt.format(**values)),
+        completion_tokens=count_tokens(output),
+    )
+    return output
+
+
+async def arun_llm(name: str, template: str, **values: str) -> str:
+    """
+    Async counterpart of run_llm.
+
+    Args:
+        name (str): The call site name used for token accounting.
+        template (str): The prompt template.
+        **values (str): Values of the template's placeholders.
+
+    Returns:
+        str: The model's answer.
+    """
+    prompt = PromptTemplate.from_template(template)
+    llm_chain = LLMChain(llm=ChatLLM.get_llm(), prompt=prompt)
+    output = await llm_chain.arun(**values)
+    TokenUsage.record(
+        name,
+        prompt_tokens=count_tokens(prompt.format(**values)),
+        completion_tokens=count_tokens(output),
+    )
+    return output
+
+
+def stream_llm(name: str, template: str, **values: str) -> Iterator[str]:
+    """
+    Runs a prompt template on the shared chat model and yields its answer as it is generated.
+
+    Token usage is recorded once the answer is complete.
+
+    Args:
+        name (str): The call site name used for token accounting.
+        template (str): The prompt template.
+        **values (str): Values of the template's placeholders.
+
+    Yields:
+        str: The pieces of the model's answer, in order.
+    """
+    prompt = PromptTemplate.from_template(template).format(**values)
+    pieces = []
+    for chunk in ChatLLM.get_llm().stream(prompt):
+        # chat models yield message chunks, plain LLMs yield strings
+        piece = getattr(chunk, "content", chunk)
+        if piece:
+            pieces.append(piece)
+            yield piece
+    TokenUsage.record(
+        name,
+        prompt_tokens=count_tokens(prompt),
+        completion_tokens=count_tokens("".join(pieces)),
+    )
+
+
+async def astream_llm(name: str, template: str, **values: str) -> AsyncIterator[str]:
+    """
+    Async counterpart of stream_llm.
+
+    Args:
+        name (str): The call site name used for token accounting.
+        template (str): The prompt template.
+        **values (str): Values of the template's placeholders.
+
+    Yields:
+        str: The pieces of the model's answer, in order.
+    """
+    prompt = PromptTemplate.from_template(template).format(**values)
+    pieces = []
+    async for chunk in ChatLLM.get_llm().astream(prompt):
+        piece = getattr(chunk, "content", chunk)
+        if piece:
+            pieces.append(piece)
+            yield piece
+    TokenUsage.record(
+        name,
+        prompt_tokens=count_tokens(prompt),
+        completion_tokens=count_tokens("".join(pieces)),
+    )
+
+
+MAP_TEMPLATE = """Write a concise summary of the following part of a podcast episode{focus}:
+        "{text}"
+        CONCISE SUMMARY: """
+
+REDUCE_TEMPLATE = """The following are summaries of consecutive parts of one podcast episode. Combine them into a single concise summary{focus}, do not include any dash - or other unnecessary signs at the end:
+        "{text}"
+        CONCISE SUMMARY: """
+
+
+def _map_reduce_templates(hint: str, budget: Optional[int]) -> Tuple[str, str, int]:
+    """
+    Builds the map and reduce templates for a hint, and the text budget of one call.
+    """
+    focus = f' with respect to the following hint/question "{hint}"' if hint else ""
+    # the hint ends up in the template; escape it for PromptTemplate
+    focus = focus.replace("{", "{{").replace("}", "}}")
+    map_template = MAP_TEMPLATE.replace("{focus}", focus)
+    reduce_template = REDUCE_TEMPLATE.replace("{focus}", focus)
+    if budget is None:
+        budget = min(
+            prompt_budget(map_template.replace("{text}", "")),
+            prompt_budget(reduce_template.replace("{text}", "")),
+        )
+    return map_template, reduce_template, budget
+
+
+def _map_reduce_input(
+    text: str, hint: str, budget: Optional[int], name: str, _depth: int = 0
+) -> Tuple[str, str]:
+    """
+    Runs the map calls of a map-reduce summary.
+
+    Returns:
+        Tuple[str, str]: The reduce template and the partial summaries it should combine.
+    """
+    map_template, reduce_template, budget = _map_reduce_templates(hint, budget)
+
+    chunks = split_tokens(text, budget)
+    with ThreadPoolExecutor(max_workers=MAP_CONCURRENCY) as executor:
+        partials = list(
+            executor.map(
+                lambda chunk: run_llm(f"{name}.map", map_template, text=chunk), chunks
+            )
+        )
+
+    combined = "\n\n".join(partials)
+    if count_tokens(combined) > budget:
+        if len(chunks) > 1 and _depth < MAX_REDUCE_DEPTH:
+            return _map_reduce_input(combined, hint, budget, name, _depth + 1)
+        combined = split_tokens(combined, budget)[0]
+    return reduce_template, combined
+
+
+def map_reduce_summary(
+    text: str,
+    hint: str = "",
+    budget: Optional[int] = None,
+    name: str = "make_summary",
+) -> str:
+    """
+    Summarizes a text that does not fit the context window.
+
+    The text is split into chunks that are summarized in parallel (map); the partial summaries are then
+    combined by one more call (reduce). If the partial summaries are still too long, they are reduced
+    recursively.
+
+    Args:
+        text (str): The text to summarize.
+        hint (str, optional): A question the summary should focus on. Defaults to an empty string.
+        budget (int, optional): Maximum tokens of text per call. Defaults to what the map prompt allows.
+        name (str, optional): The call site name used for token accounting. Defaults to "make_summary".
+
+    Returns:
+        str: The summary.
+    """
+    reduce_template, combined = _map_reduce_input(text, hint, budget, name)
+    return run_llm(f"{name}.reduce", reduce_template, text=combined)
+
+
+def stream_map_reduce_summary(
+    text: str,
+    hint: str = "",
+    budget: Optional[int] = None,
+    name: str = "make_summary",
+) -> Iterator[str]:
+    """
+    Summarizes a text that does not fit the context window, streaming the final summary.
+
+    The map calls run as in map_reduce_summary; only the tokens of the reduce call are streamed.
+
+    Args:
+        text (str): The text to summarize.
+        hint (str, optional): A question the summary should focus on. Defaults to an empty string.
+        budget (int, optional): Maximum tokens of text per call. Defaults to what the map prompt allows.
+        name (str, optional): The call site name used for token accounting. Defaults to "make_summary".
+
+    Yields:
+        str: The pieces of the summary, in order.
+    """
+    reduce_template, combined = _map_reduce_input(text, hint, budget, name)
+    yield from stream_llm(f"{name}.reduce", reduce_template, text=combined)
+
+
+async def _amap_reduce_input(
+    text: str, hint: str, budget: Optional[int], name: str, _depth: int = 0
+) -> Tuple[str, str]:
+    """
+    Async counterpart of _map_reduce_input; at most MAP_CONCURRENCY map calls are awaited at once.
+    """
+    map_template, reduce_template, budget = _map_reduce_templates(hint, budget)
+
+    chunks = split_tokens(text, budget)
+    semaphore = asyncio.Semaphore(MAP_CONCURRENCY)
+
+    async def _map(chunk: str) -> str:
+        async with semaphore:
+            return await arun_llm(f"{name}.map", map_template, text=chunk)
+
+    partials = await asyncio.gather(*(_map(chunk) for chunk in chunks))
+
+    combined = "\n\n".join(partials)
+    if count_tokens(combined) > budget:
+        if len(chunks) > 1 and _depth < MAX_REDUCE_DEPTH:
+            return await _amap_reduce_input(combined, hint, budget, name, _depth + 1)
+        combined = split_tokens(combined, budget)[0]
+    return reduce_template, combined
+
+
+async def amap_reduce_summary(
+    text: str,
+    hint: str = "",
+    budget: Optional[int] = None,
+    name: str = "make_summary",
+) -> str:
+    """
+    Async counterpart of map_reduce_summary.
+    """
+    reduce_template, combined = await _amap_reduce_input(text, hint, budget, name)
+    return await arun_llm(f"{name}.reduce", reduce_template, text=combined)
+
+
+async def astream_map_reduce_summary(
+    text: str,
+    hint: str = "",
+    budget: Optional[int] = None,
+    name: str = "make_summary",
+) -> AsyncIterator[str]:
+    """
+    Async counterpart of stream_map_reduce_summary.
+    """
+    reduce_template, combined = await _amap_reduce_input(text, hint, budget, name)
+    async for piece in astream_llm(f"{name}.reduce", reduce_template, text=combined):
+        yield piece
@@ -0,0 +1,91 @@
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+This module gives the async server non-blocking access to the podcast database.
+
+sqlite3 has no asynchronous API, so queries run on a small dedicated thread pool, each thread using its
+own pooled read-only connection from DataBase; the event loop only awaits their results.
+
+Constants:
+- SQLITE_THREADS: Threads running database queries for the event loop (environment variable SQLITE_THREADS).
+
+Functions:
+- run_in_db_thread: Runs a blocking database call on the database threads.
+- aget_text: Async counterpart of get_text.
+- aget_episodes_bulk: Async counterpart of get_episodes_bulk.
+"""
+import asyncio
+import contextvars
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Sequence, Tuple, Union
+
+from engine.constants import Podcast
+from engine.data_handler.get import get_episodes_bulk, get_text
+
+
+SQLITE_THREADS = int(os.getenv("SQLITE_THREADS", "4"))
+
+
+@functools.lru_cache(maxsize=None)
+def _executor() -> ThreadPoolExecutor:
+    return ThreadPoolExecutor(max_workers=SQLITE_THREADS, thread_name_prefix="sqlite")
+
+
+async def run_in_db_thread(function: Callable, *args: Any, **kwargs: Any) -> Any:
+    """
+    Runs a blocking database call on the database threads and awaits its result.
+
+    Args:
+        function (Callable): The blocking call, e.g. one of the getters of engine.data_handler.get.
+        *args (Any): Positional arguments of the call.
+        **kwargs (Any): Keyword arguments of the call.
+
+    Returns:
+        Any: What the call returned.
+    """
+    loop = asyncio.get_running_loop()
+    # run in a copy of the caller's context, so the request's stage timings see the query
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(
+        _executor(), functools.partial(context.run, function, *args, **kwargs)
+    )
+
+
+async def aget_text(ep_num: int, podcast_name: str) -> List:
+    """
+    Retrieves the text of a specified podcast episode without blocking the event loop.
+
+    Args:
+        ep_num (int): The episode number.
+        podcast_name (str): The name of the podcast.
+
+    Returns:
+        list: A list containing the text of the specified episode,
+              or an empty list if no text is found.
+    """
+    return await run_in_db_thread(get_text, ep_num, podcast_name)
+
+
+async def aget_episodes_bulk(
+    keys: Iterable[Tuple[Union[int, str], Union[Podcast, str]]],
+    columns: Sequence[str] = ("Title", "Summary", "URL"),
+) -> Dict[Tuple[str, str], Dict[str, Any]]:
+    """
+    Retrieves the requested columns of many podcast episodes without blocking the event loop.
+
+    See get_episodes_bulk for the arguments and the returned mapping.
+    """
+    return await run_in_db_thread(get_episodes_bulk, list(keys), columns)
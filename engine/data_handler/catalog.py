@@ -0,0 +1,186 @@
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+This module keeps the small, rarely changing episode metadata in memory.
+
+Titles, URLs and summaries of every episode are loaded once into compact records keyed by
+(podcast name, episode number). The large transcript (`Text` column) is never held by the catalog;
+it is read from the database on demand. The catalog reloads itself when the database file changes.
+
+Classes:
+- EpisodeRecord: A slotted record holding the metadata of one episode.
+- EpisodeCatalog: An in-memory, self-refreshing index of EpisodeRecord instances.
+"""
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+from loguru import logger
+
+
+class EpisodeRecord:
+    """
+    Metadata of a single episode, without its transcript.
+    """
+
+    __slots__ = ("number", "title", "summary", "url", "podcast_name")
+
+    def __init__(
+        self, number: str, title: str, summary: str, url: str, podcast_name: str
+    ) -> None:
+        self.number = number
+        self.title = title
+        self.summary = summary
+        self.url = url
+        self.podcast_name = podcast_name
+
+    def __repr__(self) -> str:
+        return f"EpisodeRecord({self.podcast_name!r}, {self.number!r}, {self.title!r})"
+
+
+class EpisodeCatalog:
+    """
+    An in-memory catalog of episode metadata backed by the merged SQLite database.
+
+    The catalog watches the database file (and its WAL file) for changes in mtime, size or inode at most
+    once every `check_interval` seconds, and reloads the records when one is seen. The check is a couple
+    of stat calls, so it is cheap enough for the request thread; a file that is touched without being
+    modified costs one extra reload.
+
+    Attributes:
+        path (str): The file path to the SQLite database.
+        check_interval (float): Minimum number of seconds between two file change checks.
+    """
+
+    METADATA_QUERY = "SELECT Number, Title, Summary, URL, Podcast_Name FROM merged_data"
+    TEXT_QUERY = "SELECT Text FROM merged_data WHERE Number = ? AND Podcast_Name = ?"
+
+    def __init__(
+        self,
+        path: str,
+        query: Callable[[str, Tuple], List],
+        check_interval: float = 1.0,
+    ) -> None:
+        self.path = path
+        self.check_interval = check_interval
+        self._query = query
+        self._records: Dict[Tuple[str, str], EpisodeRecord] = {}
+        self._stamp: Optional[Tuple] = None
+        self._checked_at = float("-inf")
+        self._lock = threading.Lock()
+
+    def _file_stamp(self) -> Optional[Tuple]:
+        """
+        Returns the (mtime, size, inode) of the database file and its WAL file, or None if the database is
+        missing. The inode tells a database replaced by a rename apart from the old one.
+        """
+        stamp = []
+        for path in (self.path, f"{self.path}-wal"):
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                if path == self.path:
+                    return None
+                stamp.append(None)
+                continue
+            stamp.append((stat.st_mtime_ns, stat.st_size, stat.st_ino))
+        return tuple(stamp)
+
+    def load(self) -> None:
+        """
+        (Re)loads the metadata of every episode from the database.
+
+        Failures are logged and leave the previously loaded records in place.
+        """
+        # stamp the snapshot before reading it, a concurrent write then only causes one extra reload
+        stamp = self._file_stamp()
+        try:
+            rows = self._query(self.METADATA_QUERY, ())
+        except Exception as e:
+            logger.warning(
+                "Failed loading episode catalog from {path}: {error}",
+                path=self.path,
+                error=e,
+            )
+            return
+
+        records = {}
+        for number, title, summary, url, podcast_name in rows:
+            records[(podcast_name, str(number))] = EpisodeRecord(
+                str(number), title, summary, url, podcast_name
+            )
+        # swap the whole dict at once so readers never see a half loaded catalog
+        self._records = records
+        self._stamp = stamp
+        logger.info(
+            "Loaded episode catalog with {n} episodes from {path}",
+            n=len(records),
+            path=self.path,
+        )
+
+    def refresh_if_changed(self) -> bool:
+        """
+        Reloads the catalog if the database file changed since the last load.
+
+        Returns:
+            bool: True if the catalog was reloaded, False otherwise.
+        """
+        now = time.monotonic()
+        if now - self._checked_at < self.check_interval:
+            return False
+
+        with self._lock:
+            if now - self._checked_at < self.check_interval:
+                return False
+            self._checked_at = now
+
+            stamp = self._file_stamp()
+            if stamp is not None and stamp == self._stamp:
+                return False
+
+            self.load()
+            return True
+
+    def get(self, ep_num, podcast_name: str) -> Optional[EpisodeRecord]:
+        """
+        Looks up the metadata of an episode.
+
+        Args:
+            ep_num (Union[int, str]): The episode number.
+            podcast_name (str): The name of the podcast.
+
+        Returns:
+            Optional[EpisodeRecord]: The episode record, or None if the episode is not in the catalog.
+        """
+        self.refresh_if_changed()
+        return self._records.get((podcast_name, str(ep_num)))
+
+    def get_text(self, ep_num, podcast_name: str) -> Optional[str]:
+        """
+        Reads the transcript of an episode from the database.
+
+        Args:
+            ep_num (Union[int, str]): The episode number.
+            podcast_name (str): The name of the podcast.
+
+        Returns:
+            Optional[str]: The transcript, or None if the episode does not exist.
+        """
+        results = self._query(self.TEXT_QUERY, (str(ep_num), podcast_name))
+        if len(results) == 0:
+            return None
+        return results[0][0]
+
+    def __len__(self) -> int:
+        return len(self._records)
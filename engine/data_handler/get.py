@@ -25,25 +25,50 @@ insert new data or update existing records in the database.
 Constants:
 - DATA_BASE_PATH: The file path to the SQLite database.
 - TABLE_NAME: The name of the main table in the database containing podcast data.
+- SQLITE_MMAP_SIZE, SQLITE_CACHE_SIZE: Pragmas of the pooled connections,
+  overridable through environment variables of the same name.
+- EPISODE_CATALOG: Whether the getters serve episode metadata from the in-memory EpisodeCatalog
+  (environment variable EPISODE_CATALOG, enabled by default).
+
+Classes:
+- DataBase: Holds the shared connection pool and episode catalog used by every getter.
 
 Functions:
-- database_connection: Establishes a connection to the database.
+- run_query: Runs a query on the calling thread's pooled connection.
 - get_text: Retrieves text content of a specified podcast episode.
 - get_episode: Fetches all data for a specified podcast episode.
 - get_summary: Obtains the summary of a specified podcast episode.
 - get_link: Retrieves the URL link of a specified podcast episode.
 - get_title: Fetches the title of a specified podcast episode.
+- get_episodes_bulk: Fetches selected columns of many episodes in a single query.
 - replace_summary: Updates the summary of a specified podcast episode.
 - insert_episode: Inserts a new episode record into the database.
 """
-import sqlite3
 import os
-from typing import List, Union, Tuple
+import sqlite3
+from typing import Any, ClassVar, Dict, Iterable, List, Sequence, Union, Tuple
 from loguru import logger
 
+from engine.constants import Podcast
+from engine.data_handler.catalog import EpisodeCatalog, EpisodeRecord
+from engine.data_handler.pool import ConnectionPool
+from engine.metrics import timed
+
 
 DATA_BASE_PATH = os.sep.join("./data/merged/metadata.db".split("/"))
 TABLE_NAME = "merged_data"
+EPISODE_COLUMNS = ("Number", "Title", "Text", "Summary", "URL", "Podcast_Name")
+_RECORD_FIELDS = {
+    "Number": lambda r: r.number,
+    "Title": lambda r: r.title,
+    "Summary": lambda r: r.summary,
+    "URL": lambda r: r.url,
+    "Podcast_Name": lambda r: r.podcast_name,
+}
+
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+SQLITE_CACHE_SIZE = int(os.getenv("SQLITE_CACHE_SIZE", "-16000"))
+EPISODE_CATALOG = os.getenv("EPISODE_CATALOG", "1") == "1"
 
 # def database_connection():
 #     """
@@ -53,9 +78,88 @@ TABLE_NAME = "merged_data"
 #     return sqlite3.connect(DATA_BASE_PATH)
 
 
+class DataBase:
+    """
+    Holds the connection pool and the episode catalog shared by all getters of this module.
+
+    Both are created on first use and recreated if DATA_BASE_PATH is pointed at another file.
+
+    Class Attributes:
+        _pool: A private class-level attribute that holds the ConnectionPool instance.
+        _catalog: A private class-level attribute that holds the EpisodeCatalog instance.
+    """
+
+    _pool: ClassVar[ConnectionPool] = None
+    _catalog: ClassVar[EpisodeCatalog] = None
+
+    @classmethod
+    def get_pool(cls) -> ConnectionPool:
+        """
+        Retrieves or initializes the connection pool for DATA_BASE_PATH.
+
+        Returns:
+            ConnectionPool: The shared pool of read-only connections.
+        """
+        if cls._pool is None or cls._pool.path != DATA_BASE_PATH:
+            if cls._pool is not None:
+                cls._pool.close_all()
+            cls._pool = ConnectionPool(
+                DATA_BASE_PATH,
+                mmap_size=SQLITE_MMAP_SIZE,
+                cache_size=SQLITE_CACHE_SIZE,
+            )
+        return cls._pool
+
+    @classmethod
+    def get_catalog(cls) -> EpisodeCatalog:
+        """
+        Retrieves or initializes the episode catalog for DATA_BASE_PATH, loading it on first use.
+
+        Returns:
+            EpisodeCatalog: The shared in-memory catalog of episode metadata.
+        """
+        if cls._catalog is None or cls._catalog.path != DATA_BASE_PATH:
+            # open a connection first: switching the file to WAL would otherwise look like a change
+            try:
+                cls.get_pool().get()
+            except sqlite3.Error:
+                pass
+            cls._catalog = EpisodeCatalog(
+                DATA_BASE_PATH,
+                query=lambda query, parameters: run_query(query, parameters),
+            )
+            cls._catalog.refresh_if_changed()
+        return cls._catalog
+
+    @classmethod
+    def close(cls) -> None:
+        """
+        Closes all pooled connections and drops the episode catalog.
+        """
+        if cls._pool is not None:
+            cls._pool.close_all()
+            cls._pool = None
+        cls._catalog = None
+
+
+def _catalog_record(ep_num: int, podcast_name: Union[Podcast, str]) -> EpisodeRecord:
+    """
+    Looks up an episode in the catalog.
+
+    Returns:
+        EpisodeRecord: The record of the episode, or None if the catalog is disabled or misses it,
+            in which case callers fall back to querying the database.
+    """
+    if not EPISODE_CATALOG:
+        return None
+    if isinstance(podcast_name, Podcast):
+        podcast_name = podcast_name.value
+    return DataBase.get_catalog().get(ep_num, podcast_name)
+
+
 def run_query(query: str, parameters: Tuple) -> any:
     """
-    Runs query
+    Runs query on the calling thread's pooled connection.
 
     Args:
         query (str): query text.
@@ -64,11 +168,12 @@ def run_query(query: str, parameters: Tuple) -> any:
     Returns:
         Returns the queries output with no modifications             
     """
-    conn = sqlite3.connect(DATA_BASE_PATH)
-    cursor = conn.cursor()
-    cursor.execute(query, parameters)
-    results = cursor.fetchall()
-    cursor.close()
+    conn = DataBase.get_pool().get()
+    with timed("sqlite"):
+        cursor = conn.cursor()
+        cursor.execute(query, parameters)
+        results = cursor.fetchall()
+        cursor.close()
     return results
 
 
@@ -110,6 +215,20 @@ def get_episode(
         list: A list of tuples containing all data fields for the specified episode.
               Each tuple represents one row in the database.
     """
+    record = _catalog_record(ep_num, podcast_name)
+    if record is not None:
+        text = DataBase.get_catalog().get_text(record.number, record.podcast_name)
+        return [
+            (
+                record.number,
+                record.title,
+                text,
+                record.summary,
+                record.url,
+                record.podcast_name,
+            )
+        ]
+
     query = "SELECT * FROM merged_data WHERE Number = ? AND Podcast_Name = ?"
     # conn = conn if conn is not None else database_connection()
     # cursor = conn.cursor()
@@ -133,14 +252,19 @@ def get_summary(
         Union[List[Tuple[str]], List[str]]: A list containing a tuple with the episode's summary.
             Returns a single-item list with a default message if the summary is not found.
     """
-    query = "SELECT Summary FROM merged_data WHERE Number = ? AND Podcast_Name = ?"
-    # conn = conn if conn is not None else database_connection()
-    # cursor = conn.cursor()
-    # cursor.execute(query, (ep_num, podcast_name.value))
-    # results = cursor.fetchall()
-    # cursor.close()
-    results = run_query(query=query, parameters=(ep_num, podcast_name.value))
-    if len(results) == 0:
+    record = _catalog_record(ep_num, podcast_name)
+    if record is not None:
+        results = [(record.summary,)]
+    else:
+        query = "SELECT Summary FROM merged_data WHERE Number = ? AND Podcast_Name = ?"
+        # conn = conn if conn is not None else database_connection()
+        # cursor = conn.cursor()
+        # cursor.execute(query, (ep_num, podcast_name.value))
+        # results = cursor.fetchall()
+        # cursor.close()
+        results = run_query(query=query, parameters=(ep_num, podcast_name.value))
+    # an episode without a summary gets the same default as a missing one
+    if len(results) == 0 or results[0][0] is None:
         logger.warning(f"Summary not found: {ep_num}, {podcast_name}")
         return [
             ("summary didn't exists!"),
@@ -161,6 +285,10 @@ def get_link(
         List[Tuple[str]]: A list containing a tuple with the URL link of the episode.
                           Each tuple represents one row in the database.
     """
+    record = _catalog_record(ep_num, podcast_name)
+    if record is not None:
+        return [(record.url,)]
+
     query = "SELECT URL FROM merged_data WHERE Number = ? AND Podcast_Name = ?"
     # conn = conn if conn is not None else database_connection()
     # cursor = conn.cursor()
@@ -181,6 +309,10 @@ def get_title(ep_num: int, podcast_name: str) -> str:
     Returns:
         str: The title of the specified podcast episode.
     """
+    record = _catalog_record(ep_num, podcast_name)
+    if record is not None:
+        return record.title
+
     query = "SELECT Title FROM merged_data WHERE Number = ? AND Podcast_Name = ?"
     # conn = conn if conn is not None else database_connection()
     # cursor = conn.cursor()
@@ -189,3 +321,68 @@ def get_title(ep_num: int, podcast_name: str) -> str:
     # cursor.close()
     results = run_query(query=query, parameters=(str(ep_num), podcast_name.value))
     return results[0][0]
+
+
+def get_episodes_bulk(
+    keys: Iterable[Tuple[Union[int, str], Union[Podcast, str]]],
+    columns: Sequence[str] = ("Title", "Summary", "URL"),
+) -> Dict[Tuple[str, str], Dict[str, Any]]:
+    """
+    Retrieves the requested columns of many podcast episodes with a single query.
+
+    Args:
+        keys (Iterable[Tuple[Union[int, str], Union[Podcast, str]]]): (episode number, podcast name) pairs.
+            Podcast names may be given as Podcast enum instances or plain strings.
+        columns (Sequence[str], optional): Columns of the merged_data table to fetch.
+            Defaults to ("Title", "Summary", "URL").
+
+    When the episode catalog is enabled and `Text` is not requested, episodes are served from memory
+    and only catalog misses are queried.
+
+    Returns:
+        Dict[Tuple[str, str], Dict[str, Any]]: Maps (episode number, podcast name), both as strings,
+            to a dictionary of column name to value. Episodes missing from the database are left out.
+
+    Raises:
+        ValueError: If one of the columns is not part of the merged_data table.
+    """
+    unknown = [c for c in columns if c not in EPISODE_COLUMNS]
+    if unknown:
+        raise ValueError(f"Unknown columns: {unknown}")
+
+    normalized = list(
+        dict.fromkeys(
+            (str(num), podcast.value if isinstance(podcast, Podcast) else podcast)
+            for num, podcast in keys
+        )
+    )
+    results = {}
+    if EPISODE_CATALOG and "Text" not in columns:
+        missing = []
+        for num, podcast in normalized:
+            record = DataBase.get_catalog().get(num, podcast)
+            if record is None:
+                missing.append((num, podcast))
+                continue
+            results[(num, podcast)] = {
+                column: _RECORD_FIELDS[column](record) for column in columns
+            }
+        normalized = missing
+
+    if len(normalized) == 0:
+        return results
+
+    selected = ", ".join(columns)
+    # stay well below SQLITE_MAX_VARIABLE_NUMBER (999 on older builds)
+    batch_size = 400
+    for start in range(0, len(normalized), batch_size):
+        batch = normalized[start : start + batch_size]
+        values = ", ".join(["(?, ?)"] * len(batch))
+        query = (
+            f"SELECT Number, Podcast_Name, {selected} FROM {TABLE_NAME} "
+            f"WHERE (Number, Podcast_Name) IN (VALUES {values})"
+        )
+        parameters = tuple(item for key in batch for item in key)
+        for row in run_query(query=query, parameters=parameters):
+            results[(str(row[0]), row[1])] = dict(zip(columns, row[2:]))
+    return results
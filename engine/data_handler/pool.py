@@ -0,0 +1,126 @@
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+This module provides a thread-safe pool of read-only SQLite connections.
+
+Each thread gets its own connection, opened once in read-only URI mode and tuned with
+`mmap_size` and `cache_size` pragmas, so repeated queries skip the connect cost and do not
+leak file handles. The pool never writes to the database, not even its journal mode: enable_wal is
+run once by the job that builds the database.
+
+Classes:
+- ConnectionPool: Hands out one reusable read-only connection per thread for a database file.
+
+Functions:
+- enable_wal: Switches a database file to WAL journal mode.
+"""
+import os
+import sqlite3
+import threading
+from pathlib import Path
+from typing import List
+from loguru import logger
+
+
+class ConnectionPool:
+    """
+    A per-thread pool of read-only SQLite connections.
+
+    Connections are created lazily the first time a thread asks for one and are reused by that
+    thread afterwards. The pool keeps track of every connection it opened so they can all be closed
+    at shutdown.
+
+    Attributes:
+        path (str): The file path to the SQLite database.
+        mmap_size (int): Bytes of the database file SQLite may memory-map. 0 disables mmap.
+        cache_size (int): SQLite page cache size; negative values are in KiB, positive in pages.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        mmap_size: int = 256 * 1024 * 1024,
+        cache_size: int = -16000,
+    ) -> None:
+        self.path = path
+        self.mmap_size = mmap_size
+        self.cache_size = cache_size
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections: List[sqlite3.Connection] = []
+
+    def _connect(self) -> sqlite3.Connection:
+        """
+        Opens a new read-only connection and applies the configured pragmas.
+
+        Returns:
+            sqlite3.Connection: A connection to the database in read-only mode.
+        """
+        uri = f"{Path(os.path.abspath(self.path)).as_uri()}?mode=ro"
+        # each connection is only used by the thread that opened it; the flag is relaxed
+        # so that close_all() can run from any thread at shutdown.
+        conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+        conn.execute(f"PRAGMA mmap_size={int(self.mmap_size)}")
+        conn.execute(f"PRAGMA cache_size={int(self.cache_size)}")
+        conn.execute("PRAGMA query_only=ON")
+
+        with self._lock:
+            self._connections.append(conn)
+        return conn
+
+    def get(self) -> sqlite3.Connection:
+        """
+        Returns the calling thread's connection, opening it on first use.
+
+        Returns:
+            sqlite3.Connection: A read-only connection owned by the calling thread.
+        """
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._connect()
+            self._local.conn = conn
+        return conn
+
+    def close_all(self) -> None:
+        """
+        Closes every connection opened by the pool.
+
+        Threads that ask for a connection afterwards get a fresh one.
+        """
+        with self._lock:
+            connections, self._connections = self._connections, []
+            self._local = threading.local()
+        for conn in connections:
+            conn.close()
+
+
+def enable_wal(path: str) -> None:
+    """
+    Switches a database file to WAL journal mode.
+
+    The journal mode is stored in the database file, so this is done once, by the job that writes the
+    database; the read-only connections of ConnectionPool inherit it. Failures are logged and ignored,
+    the pool works in any journal mode.
+
+    Args:
+        path (str): The file path to the SQLite database.
+    """
+    try:
+        conn = sqlite3.connect(path)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+        finally:
+            conn.close()
+    except sqlite3.Error as e:
+        logger.warning("Could not enable WAL on {path}: {error}", path=path, error=e)
@@ -0,0 +1,232 @@
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+This module caches query embeddings so repeated prompts skip the embedding API call.
+
+The cache has two tiers: a bounded in-process LRU, and a SQLite file shared by every worker on the
+machine which survives restarts. Entries are keyed by the normalized prompt and the embedding model.
+
+Constants:
+- EMBEDDING_CACHE_PATH: The file path of the on-disk cache (environment variable EMBEDDING_CACHE_PATH).
+- EMBEDDING_CACHE_SIZE: The number of embeddings held by the in-process tier (environment variable
+  EMBEDDING_CACHE_SIZE).
+
+Classes:
+- EmbeddingCache: The two-tier store with hit/miss counters.
+- CachedEmbeddings: A LangChain Embeddings wrapper that answers `embed_query` from an EmbeddingCache.
+
+Functions:
+- normalize_prompt: Normalizes a prompt into a cache key.
+"""
+import asyncio
+import os
+import sqlite3
+import time
+import unicodedata
+from array import array
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+from loguru import logger
+from langchain.schema.embeddings import Embeddings
+
+from engine.metrics import instrument
+from engine.sqlite_store import SQLiteStore
+
+
+EMBEDDING_CACHE_PATH = os.getenv(
+    "EMBEDDING_CACHE_PATH", os.sep.join("./data/cache/embeddings.db".split("/"))
+)
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", "4096"))
+
+
+def normalize_prompt(prompt: str) -> str:
+    """
+    Normalizes a prompt so trivially different spellings share a cache entry.
+
+    Applies unicode NFKC normalization, case folding and whitespace collapsing.
+
+    Args:
+        prompt (str): The prompt text.
+
+    Returns:
+        str: The normalized prompt.
+    """
+    prompt = unicodedata.normalize("NFKC", prompt)
+    return " ".join(prompt.casefold().split())
+
+
+class EmbeddingCache(SQLiteStore):
+    """
+    A two-tier cache of query embeddings.
+
+    Lookups hit the in-process LRU first, then the SQLite file. Vectors found on disk are promoted
+    to the LRU. The SQLite file runs in WAL mode so several worker processes can share it.
+
+    Attributes:
+        path (str): The file path of the SQLite tier, or None to disable it.
+        max_size (int): Maximum number of embeddings held in memory.
+    """
+
+    def __init__(
+        self, path: Optional[str] = EMBEDDING_CACHE_PATH, max_size: int = EMBEDDING_CACHE_SIZE
+    ) -> None:
+        super().__init__(path)
+        self.max_size = max_size
+        self._memory: "OrderedDict[Tuple[str, str], List[float]]" = OrderedDict()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        if self.path is not None:
+            conn = self._connection()
+            conn.execute(
+                """
+            CREATE TABLE IF NOT EXISTS embeddings (
+                model TEXT NOT NULL,
+                prompt TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                created REAL NOT NULL,
+                PRIMARY KEY (model, prompt)
+            )
+            """
+            )
+            conn.commit()
+
+    def _remember(self, key: Tuple[str, str], vector: List[float]) -> None:
+        with self._lock:
+            self._memory[key] = vector
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_size:
+                self._memory.popitem(last=False)
+
+    def get(self, prompt: str, model: str) -> Optional[List[float]]:
+        """
+        Looks up the embedding of a prompt.
+
+        Args:
+            prompt (str): The prompt text; it is normalized before the lookup.
+            model (str): The name of the embedding model.
+
+        Returns:
+            Optional[List[float]]: The cached embedding, or None on a miss.
+        """
+        key = (model, normalize_prompt(prompt))
+        with self._lock:
+            vector = self._memory.get(key)
+            if vector is not None:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return vector
+
+        if self.path is not None:
+            try:
+                row = (
+                    self._connection()
+                    .execute(
+                        "SELECT vector FROM embeddings WHERE model = ? AND prompt = ?", key
+                    )
+                    .fetchone()
+                )
+            except sqlite3.Error as e:
+                logger.warning("Embedding cache read failed: {error}", error=e)
+                row = None
+            if row is not None:
+                vector = array("d", row[0]).tolist()
+                self._remember(key, vector)
+                with self._lock:
+                    self.disk_hits += 1
+                return vector
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, prompt: str, model: str, vector: List[float]) -> None:
+        """
+        Stores the embedding of a prompt in both tiers.
+
+        Args:
+            prompt (str): The prompt text; it is normalized before being stored.
+            model (str): The name of the embedding model.
+            vector (List[float]): The embedding.
+        """
+        key = (model, normalize_prompt(prompt))
+        self._remember(key, vector)
+        if self.path is None:
+            return
+        try:
+            conn = self._connection()
+            conn.execute(
+                "INSERT OR REPLACE INTO embeddings (model, prompt, vector, created) VALUES (?, ?, ?, ?)",
+                (model, key[1], array("d", vector).tobytes(), time.time()),
+            )
+            conn.commit()
+        except sqlite3.Error as e:
+            logger.warning("Embedding cache write failed: {error}", error=e)
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Returns the hit/miss counters of the cache.
+
+        Returns:
+            Dict[str, float]: memory_hits, disk_hits, misses and the overall hit_rate.
+        """
+        with self._lock:
+            total = self.memory_hits + self.disk_hits + self.misses
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": (self.memory_hits + self.disk_hits) / total if total else 0.0,
+            }
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Wraps an Embeddings instance and serves query embeddings from an EmbeddingCache.
+
+    Document embeddings are passed through uncached; they are only computed while building the index.
+    On a miss the prompt is embedded as given, so the first spelling seen for a normalized key is
+    the one whose embedding is stored.
+
+    Attributes:
+        embeddings (Embeddings): The underlying embedding client.
+        cache (EmbeddingCache): The cache used for query embeddings.
+        model (str): The embedding model name used in the cache key.
+    """
+
+    def __init__(self, embeddings: Embeddings, cache: EmbeddingCache, model: str) -> None:
+        self.embeddings = embeddings
+        self.cache = cache
+        self.model = model
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embeddings.embed_documents(texts)
+
+    @instrument("embedding")
+    def embed_query(self, text: str) -> List[float]:
+        vector = self.cache.get(text, self.model)
+        if vector is None:
+            vector = self.embeddings.embed_query(text)
+            self.cache.put(text, self.model, vector)
+        return vector
+
+    @instrument("embedding")
+    async def aembed_query(self, text: str) -> List[float]:
+        # the SQLite tier is read and written off the event loop; the client call itself is awaited
+        vector = await asyncio.to_thread(self.cache.get, text, self.model)
+        if vector is None:
+            vector = await self.embeddings.aembed_query(text)
+            await asyncio.to_thread(self.cache.put, text, self.model, vector)
+        return vector
@@ -0,0 +1,302 @@
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+This module manages versioned builds of the vector index.
+
+Every build writes a new directory under `<root>/versions/` and finishes it with a manifest (content hash
+of the transcripts and of every transcript file, chunk count, embedding model and splitter settings). Nothing is served from a version
+until it is activated: the `CURRENT` file names the active version and is replaced atomically, and the
+`HISTORY` file lists the activated versions so the previous one can be restored with a single rollback.
+Running servers poll `CURRENT` and swap to the new version on their own (see VectorDB).
+
+An index root without a `CURRENT` file is a legacy, unversioned index and is served as is.
+
+Layout:
+    <root>/CURRENT                      the active version id
+    <root>/HISTORY                      activated version ids, oldest first
+    <root>/versions/<id>/manifest.json  the manifest of a finished build
+    <root>/versions/<id>/...            the Chroma files of the build
+
+Constants:
+- MANIFEST_FILE: The manifest file name inside a version directory.
+- NUMPY_SUBDIR: Where export_vectors writes the NumPy export of a version.
+- CURRENT_FILE: The file naming the active version.
+- HISTORY_FILE: The file listing the activated versions.
+
+Functions:
+- file_hash: Hashes the content of one transcript.
+- content_hash: Hashes the transcripts an index is built from.
+- diff_files: Compares the transcript hashes of two builds.
+- create_version: Creates the directory of a new build.
+- version_path: Returns the directory of a build.
+- write_manifest: Finishes a build by writing its manifest.
+- read_manifest: Reads the manifest of a version.
+- list_versions: Lists the finished builds.
+- list_unfinished: Lists the builds that never wrote a manifest.
+- current_version: Returns the active version.
+- resolve_index: Returns the active version and the directory to serve.
+- activate: Makes a finished build the active version.
+- rollback: Re-activates the previously active version.
+"""
+import hashlib
+import json
+import os
+import secrets
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+from loguru import logger
+
+
+MANIFEST_FILE = "manifest.json"
+NUMPY_SUBDIR = "numpy"
+CURRENT_FILE = "CURRENT"
+HISTORY_FILE = "HISTORY"
+
+
+def _versions_path(root: str) -> str:
+    return os.path.join(root, "versions")
+
+
+def _write_atomically(path: str, text: str) -> None:
+    # readers see either the old or the new file, never a partial one
+    temporary = f"{path}.{secrets.token_hex(4)}.tmp"
+    with open(temporary, "w", encoding="UTF-8") as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporary, path)
+
+
+def file_hash(path: str) -> str:
+    """
+    Hashes the content of a transcript.
+
+    Returns:
+        str: A SHA-256 hex digest.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def content_hash(paths: Iterable[str]) -> str:
+    """
+    Hashes the names and contents of the transcripts an index is built from.
+
+    Args:
+        paths (Iterable[str]): The transcript files.
+
+    Returns:
+        str: A SHA-256 hex digest, independent of the order of the paths.
+    """
+    digest = hashlib.sha256()
+    for path in sorted(paths, key=os.path.basename):
+        digest.update(os.path.basename(path).encode("UTF-8") + b"\0")
+        digest.update(bytes.fromhex(file_hash(path)))
+    return digest.hexdigest()
+
+
+def diff_files(
+    old: Dict[str, str], new: Dict[str, str]
+) -> Tuple[List[str], List[str], List[str]]:
+    """
+    Compares the transcript hashes of two builds.
+
+    Args:
+        old (Dict[str, str]): File name to content hash, of the base build.
+        new (Dict[str, str]): File name to content hash, of the transcripts now on disk.
+
+    Returns:
+        Tuple[List[str], List[str], List[str]]: The added, changed and removed file names, sorted.
+    """
+    added = sorted(name for name in new if name not in old)
+    changed = sorted(name for name in new if name in old and old[name] != new[name])
+    removed = sorted(name for name in old if name not in new)
+    return added, changed, removed
+
+
+def create_version(root: str) -> Tuple[str, str]:
+    """
+    Creates the directory of a new build.
+
+    Args:
+        root (str): The index root.
+
+    Returns:
+        Tuple[str, str]: The version id (UTC build time plus a random suffix) and its directory.
+    """
+    version = time.strftime("%Y%m%dT%H%M%SZ", time.gmtime()) + "-" + secrets.token_hex(3)
+    path = version_path(root, version)
+    os.makedirs(path)
+    return version, path
+
+
+def version_path(root: str, version: str) -> str:
+    """
+    Returns the directory of a build.
+    """
+    return os.path.join(_versions_path(root), version)
+
+
+def write_manifest(root: str, version: str, manifest: Dict) -> Dict:
+    """
+    Finishes a build by writing its manifest; a version without one is never activated.
+
+    Args:
+        root (str): The index root.
+        version (str): The version id.
+        manifest (Dict): The build description, e.g. content_hash, chunk_count and embedding_model.
+
+    Returns:
+        Dict: The written manifest, with its version and creation time added.
+    """
+    manifest = dict(manifest, version=version, created=time.time())
+    path = os.path.join(_versions_path(root), version, MANIFEST_FILE)
+    _write_atomically(path, json.dumps(manifest, indent=2, sort_keys=True))
+    return manifest
+
+
+def read_manifest(root: str, version: str) -> Optional[Dict]:
+    """
+    Reads the manifest of a version.
+
+    Returns:
+        Optional[Dict]: The manifest, or None if the version does not exist or its build did not finish.
+    """
+    path = os.path.join(_versions_path(root), version, MANIFEST_FILE)
+    try:
+        with open(path, encoding="UTF-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def list_versions(root: str) -> List[Dict]:
+    """
+    Lists the finished builds, oldest first.
+
+    Returns:
+        List[Dict]: Their manifests.
+    """
+    if not os.path.isdir(_versions_path(root)):
+        return []
+    manifests = [read_manifest(root, version) for version in os.listdir(_versions_path(root))]
+    return sorted((m for m in manifests if m is not None), key=lambda m: m["created"])
+
+
+def list_unfinished(root: str) -> List[str]:
+    """
+    Lists the builds that never wrote a manifest, e.g. because they were interrupted, oldest first.
+
+    Returns:
+        List[str]: Their version ids.
+    """
+    if not os.path.isdir(_versions_path(root)):
+        return []
+    return sorted(
+        version
+        for version in os.listdir(_versions_path(root))
+        if read_manifest(root, version) is None
+    )
+
+
+def current_version(root: str) -> Optional[str]:
+    """
+    Returns the active version, or None for a legacy, unversioned index.
+    """
+    try:
+        with open(os.path.join(root, CURRENT_FILE), encoding="UTF-8") as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def resolve_index(root: str) -> Tuple[Optional[str], str]:
+    """
+    Returns the active version and the directory to serve.
+
+    Returns:
+        Tuple[Optional[str], str]: The version id and its directory, or (None, root) for a legacy index.
+    """
+    version = current_version(root)
+    if version is None:
+        return None, root
+    return version, version_path(root, version)
+
+
+def _history(root: str) -> List[str]:
+    try:
+        with open(os.path.join(root, HISTORY_FILE), encoding="UTF-8") as f:
+            return [line.strip() for line in f if line.strip()]
+    except FileNotFoundError:
+        return []
+
+
+def _set_current(root: str, version: str, history: List[str]) -> None:
+    _write_atomically(os.path.join(root, HISTORY_FILE), "".join(f"{v}\n" for v in history))
+    _write_atomically(os.path.join(root, CURRENT_FILE), version + "\n")
+
+
+def activate(root: str, version: str) -> Dict:
+    """
+    Makes a finished build the active version.
+
+    Args:
+        root (str): The index root.
+        version (str): The version id.
+
+    Returns:
+        Dict: The manifest of the activated version.
+
+    Raises:
+        ValueError: If the version does not exist or its build did not finish.
+    """
+    manifest = read_manifest(root, version)
+    if manifest is None:
+        raise ValueError(f"No finished index build {version} in {root}")
+    history = _history(root)
+    if not history or history[-1] != version:
+        history.append(version)
+    _set_current(root, version, history)
+    logger.info("Activated vector index {version}", version=version)
+    return manifest
+
+
+def rollback(root: str) -> Dict:
+    """
+    Re-activates the version that was active before the current one.
+
+    Args:
+        root (str): The index root.
+
+    Returns:
+        Dict: The manifest of the re-activated version.
+
+    Raises:
+        ValueError: If there is no earlier version to roll back to.
+    """
+    history = _history(root)
+    current = current_version(root)
+    while history and history[-1] == current:
+        history.pop()
+    while history and read_manifest(root, history[-1]) is None:
+        history.pop()
+    if not history:
+        raise ValueError(f"No earlier index version to roll back to in {root}")
+    version = history[-1]
+    _set_current(root, version, history)
+    logger.info("Rolled vector index back to {version}", version=version)
+    return read_manifest(root, version)
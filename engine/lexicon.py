@@ -0,0 +1,73 @@
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+This module holds a small English vocabulary used by the gibberish pre-filter.
+
+It covers the most frequent English words and the vocabulary of philosophy questions (thinkers, schools
+and concepts discussed on the podcasts), which is enough to recognize a typical search as real English
+and to train a character bigram model.
+
+Constants:
+- QUESTION_WORDS: Words a search question typically starts with.
+- COMMON_WORDS: The vocabulary, lower case.
+"""
+
+QUESTION_WORDS = frozenset(
+    """
+    what who whom whose which why how when where is are was were do does did can could should would
+    will shall may might has have had tell explain describe compare define
+    """.split()
+)
+
+COMMON_WORDS = frozenset(
+    """
+    a about above according across act action actually after again against age ago all almost alone
+    along already also although always am among an and another answer any anyone anything appear are
+    argue argument around as ask at away back bad based be beautiful beauty because become been before
+    began begin behind being belief believe believed best better between beyond big body book both bring
+    but by call called came can cannot care case cause certain certainty change choice choose city claim
+    close come common concept concern consider could country course create created culture day dead death
+    decide deep did die difference different do does doing done down during each early earth easy either
+    else end enough even event ever every everyone everything evil exactly example exist existence
+    experience explain eye face fact fall false family far fear feel few find first follow for force form
+    found free freedom friend from full future gave get give given go god gods goes going good got great
+    group grow had half happen happiness happy hard has have having he head hear heart held help her here
+    high him himself his history hold home hope human humans idea ideas if important in inside instead
+    into is it its itself just justice keep kind knew know knowledge known land language large last late
+    later law lead learn least leave left less let life light like line little live living long look lot
+    love made make man many matter may me mean meaning means meant might mind moral morality more most
+    much must my myself name nature near need never new next no nor not nothing now number of off often
+    old on once one only open or order other others our out over own part people perhaps person place
+    play point political politics possible power problem public put question rather real reality really
+    reason right role rule said same saw say says see seem seen self sense set shall she should show side
+    since small so social society some someone something soul speak state still story student such
+    suffering system take taken talk teach tell than that the their them themselves then theory there
+    these they thing things think thinking this those though thought through time to today together told
+    too took toward true truth try turn under understand understanding until up upon us use used value
+    values very view virtue want war was way we well went were what whatever when where whether which
+    while who whole why will wisdom with within without word words work world would write wrong year yes
+    yet you young your
+    absurd absurdism aesthetics agnostic anarchism ancient argument aristotle atheism authentic
+    authenticity autonomy beauvoir being bentham berkeley buddhism buddhist camus capitalism categorical
+    causality christian christianity cicero confucius consciousness contract critique cynic cynics
+    democracy derrida descartes determinism dialectic diogenes dualism duty empiricism enlightenment
+    epicurean epicurus epistemology essence ethics existentialism existentialist faith fichte foucault
+    freud hegel heidegger heraclitus hobbes hume husserl idealism imperative kant kierkegaard leibniz
+    liberty locke logic marx marxism materialism metaphysics mill modern monism nietzsche nihilism
+    ontology parmenides phenomenology philosopher philosophers philosophy physics plato platonism
+    plotinus pragmatism rationalism relativism religion renaissance republic rousseau russell sartre
+    schopenhauer science seneca skepticism socrates sophists spinoza stoic stoicism stoics sublime
+    thales theology utilitarianism utopia will wittgenstein zeno
+    """.split()
+)
@@ -0,0 +1,57 @@
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+This module holds the chat model shared by the engine.
+
+Classes:
+- ChatLLM: A singleton accessor for the chat model, which tests can replace with a local stub.
+"""
+from typing import ClassVar
+from langchain.chat_models import ChatOpenAI
+from langchain.schema.language_model import BaseLanguageModel
+
+MODEL_NAME = "gpt-3.5-turbo-16k"
+
+
+class ChatLLM:
+    """
+    Provides the language model used for relevance checks and summaries.
+
+    Class Attributes:
+        _llm: A private class-level attribute that holds the language model instance.
+    """
+
+    _llm: ClassVar[BaseLanguageModel] = None
+
+    @classmethod
+    def get_llm(cls) -> BaseLanguageModel:
+        """
+        Retrieves or initializes the language model.
+
+        Returns:
+            BaseLanguageModel: The shared language model.
+        """
+        if cls._llm is None:
+            cls._llm = ChatOpenAI(temperature=0, model_name=MODEL_NAME)
+        return cls._llm
+
+    @classmethod
+    def set_llm(cls, llm: BaseLanguageModel) -> None:
+        """
+        Replaces the shared language model, e.g. with a local stub in tests.
+
+        Args:
+            llm (BaseLanguageModel): The language model to use from now on, or None to restore the default.
+        """
+        cls._llm = llm
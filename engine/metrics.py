@@ -0,0 +1,241 @@
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+This module measures the stages of a search or summary request.
+
+Every instrumented stage (gibberish check, query embedding, vector search, is_related, SQLite queries,
+summary generation) records its latency in a Prometheus histogram and counts its failures. Caches register
+a function returning their hit and miss counts, which are read when the metrics are scraped.
+
+While a request is being served, the stage timings are also added up per request, so the servers can
+report them in a `Server-Timing` header. Stages that run concurrently (e.g. the is_related checks) are
+summed, so their total can exceed the wall time of the request.
+
+Constants:
+- STAGE_BUCKETS: Histogram buckets of the stage latencies, in seconds.
+- STAGE_SECONDS: Histogram of the stage latencies, labelled by stage.
+- STAGE_ERRORS: Counter of the stage calls that raised, labelled by stage.
+
+Classes:
+- StageTimings: The stage timings of one request.
+
+Functions:
+- start_request: Starts collecting the stage timings of the current request.
+- timed: Context manager measuring a stage.
+- instrument: Decorator measuring every call of a function or coroutine function as a stage.
+- register_cache: Registers the hit and miss counts of a cache.
+- lru_counts: Reads the hit and miss counts of an lru_cache, an alru_cache or a MemoryResultCache.
+- render: Returns the metrics in the Prometheus text format.
+"""
+import contextlib
+import contextvars
+import functools
+import inspect
+import threading
+import time
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Histogram, REGISTRY, generate_latest
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+
+STAGE_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+STAGE_SECONDS = Histogram(
+    "podcast_stage_seconds",
+    "Latency of the stages of a request.",
+    ["stage"],
+    buckets=STAGE_BUCKETS,
+)
+STAGE_ERRORS = Counter(
+    "podcast_stage_errors", "Calls of a stage that raised an exception.", ["stage"]
+)
+
+_request_timings: contextvars.ContextVar = contextvars.ContextVar(
+    "request_timings", default=None
+)
+_caches: Dict[str, Callable[[], Optional[Tuple[int, int]]]] = {}
+
+
+class StageTimings:
+    """
+    Adds up the time a request spends in each stage.
+
+    Stages may be recorded from several threads at once (the verifier runs is_related concurrently).
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._totals: Dict[str, List[float]] = {}
+
+    def add(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            total = self._totals.setdefault(stage, [0.0, 0])
+            total[0] += seconds
+            total[1] += 1
+
+    def totals(self) -> Dict[str, Tuple[float, int]]:
+        """
+        Returns the summed seconds and the number of calls of every recorded stage.
+        """
+        with self._lock:
+            return {stage: (seconds, calls) for stage, (seconds, calls) in self._totals.items()}
+
+    def header(self) -> str:
+        """
+        Formats the timings as a `Server-Timing` header value, in milliseconds.
+        """
+        entries = []
+        for stage, (seconds, calls) in self.totals().items():
+            entry = f"{stage};dur={seconds * 1000:.1f}"
+            if calls > 1:
+                entry += f';desc="{calls} calls"'
+            entries.append(entry)
+        return ", ".join(entries)
+
+
+def start_request() -> StageTimings:
+    """
+    Starts collecting the stage timings of the current request.
+
+    The timings are kept in a context variable, so they follow the request into coroutines and tasks it
+    starts. Threads only see them if they run in a copy of the request's context.
+
+    Returns:
+        StageTimings: The timings the request's stages are added to.
+    """
+    timings = StageTimings()
+    _request_timings.set(timings)
+    return timings
+
+
+@contextlib.contextmanager
+def timed(stage: str) -> Iterator[None]:
+    """
+    Measures the wrapped block as one call of a stage.
+
+    Args:
+        stage (str): The stage name, used as the `stage` label and in the `Server-Timing` header.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        STAGE_ERRORS.labels(stage).inc()
+        raise
+    finally:
+        seconds = time.perf_counter() - start
+        STAGE_SECONDS.labels(stage).observe(seconds)
+        timings = _request_timings.get()
+        if timings is not None:
+            timings.add(stage, seconds)
+
+
+def instrument(stage: str) -> Callable:
+    """
+    Measures every call of the decorated function or coroutine function as a stage.
+
+    Placed under a cache decorator, only the calls that miss the cache are measured.
+
+    Args:
+        stage (str): The stage name.
+
+    Returns:
+        Callable: The decorator.
+    """
+
+    def decorator(function: Callable) -> Callable:
+        if inspect.iscoroutinefunction(function):
+
+            @functools.wraps(function)
+            async def async_wrapper(*args, **kwargs):
+                with timed(stage):
+                    return await function(*args, **kwargs)
+
+            return async_wrapper
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with timed(stage):
+                return function(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def register_cache(name: str, counts: Callable[[], Optional[Tuple[int, int]]]) -> None:
+    """
+    Registers a cache whose hit ratio is exported.
+
+    Args:
+        name (str): The `cache` label.
+        counts (Callable[[], Optional[Tuple[int, int]]]): Returns the (hits, misses) counts of the cache,
+            or None while it does not exist yet. Called on every scrape.
+    """
+    _caches[name] = counts
+
+
+def lru_counts(cached: Callable) -> Callable[[], Tuple[int, int]]:
+    """
+    Reads the hit and miss counts of an lru_cache or alru_cache wrapper, or of a MemoryResultCache.
+
+    Args:
+        cached (Callable): The cached function, or anything else with a `cache_info` method.
+
+    Returns:
+        Callable[[], Tuple[int, int]]: A function suitable for register_cache.
+    """
+
+    def counts() -> Tuple[int, int]:
+        info = cached.cache_info()
+        return info.hits, info.misses
+
+    return counts
+
+
+class _CacheCollector:
+    def collect(self):
+        hits = CounterMetricFamily("podcast_cache_hits", "Cache hits.", labels=["cache"])
+        misses = CounterMetricFamily("podcast_cache_misses", "Cache misses.", labels=["cache"])
+        ratio = GaugeMetricFamily(
+            "podcast_cache_hit_ratio", "Share of cache lookups that hit.", labels=["cache"]
+        )
+        for name, counts in list(_caches.items()):
+            try:
+                current = counts()
+            except Exception:
+                current = None
+            if current is None:
+                continue
+            hit, miss = current
+            hits.add_metric([name], hit)
+            misses.add_metric([name], miss)
+            ratio.add_metric([name], hit / (hit + miss) if hit + miss else 0.0)
+        yield hits
+        yield misses
+        yield ratio
+
+
+REGISTRY.register(_CacheCollector())
+
+
+def render() -> Tuple[bytes, str]:
+    """
+    Returns the metrics of this process in the Prometheus text format.
+
+    Returns:
+        Tuple[bytes, str]: The body and its content type.
+    """
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
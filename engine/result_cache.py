@@ -0,0 +1,270 @@
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+This module caches search results across worker processes and restarts.
+
+It is the second tier behind a per-process MemoryResultCache. Entries of both tiers are keyed by the
+normalized prompt, the search parameters and the version of the vector index that produced them, so a
+rebuilt index misses every old entry instead of serving stale results. Entries expire after a TTL and the
+least recently used ones are evicted once the stored results exceed a size limit.
+
+The backend is chosen with RESULT_CACHE_BACKEND: "sqlite" (a local file shared by all workers on the
+host) or "none". Other backends only need the `get`, `put` and `stats` methods of ResultCache.
+
+Constants:
+- RESULT_CACHE_BACKEND: "sqlite" or "none" (environment variable RESULT_CACHE_BACKEND).
+- RESULT_CACHE_PATH: The file path of the SQLite backend (environment variable RESULT_CACHE_PATH).
+- RESULT_CACHE_TTL: Seconds a result stays valid (environment variable RESULT_CACHE_TTL).
+- RESULT_CACHE_MAX_BYTES: Total size of stored results before eviction (environment variable
+  RESULT_CACHE_MAX_BYTES).
+- RESULT_MEMORY_SIZE: Number of results a MemoryResultCache holds (environment variable RESULT_MEMORY_SIZE).
+
+Classes:
+- ResultCache: The interface of a result cache backend.
+- MemoryResultCache: A small in-process LRU of results.
+- SQLiteResultCache: A result cache in a SQLite file.
+
+Functions:
+- result_key: Builds the key of a search.
+- load_result_cache: Builds the configured backend.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from collections import OrderedDict, namedtuple
+from typing import Any, Dict, Optional, Sequence
+from loguru import logger
+
+from engine.embedding_cache import normalize_prompt
+from engine.sqlite_store import SQLiteLRUStore
+
+
+RESULT_CACHE_BACKEND = os.getenv("RESULT_CACHE_BACKEND", "sqlite")
+RESULT_CACHE_PATH = os.getenv(
+    "RESULT_CACHE_PATH", os.sep.join("./data/cache/results.db".split("/"))
+)
+RESULT_CACHE_TTL = float(os.getenv("RESULT_CACHE_TTL", str(24 * 3600)))
+RESULT_CACHE_MAX_BYTES = int(os.getenv("RESULT_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+RESULT_MEMORY_SIZE = int(os.getenv("RESULT_MEMORY_SIZE", "4096"))
+
+CacheInfo = namedtuple("CacheInfo", ["hits", "misses", "maxsize", "currsize"])
+
+
+def result_key(prompt: str, parameters: Sequence[Any], index_version: str) -> str:
+    """
+    Builds the key of a search.
+
+    Args:
+        prompt (str): The search prompt; it is normalized first.
+        parameters (Sequence[Any]): The other arguments of the search, JSON serializable.
+        index_version (str): Identifies the vector index the search runs on.
+
+    Returns:
+        str: A SHA-256 hex digest.
+    """
+    payload = json.dumps([normalize_prompt(prompt), list(parameters), index_version])
+    return hashlib.sha256(payload.encode("UTF-8")).hexdigest()
+
+
+class ResultCache:
+    """
+    The interface of a result cache backend; this base class stores nothing.
+    """
+
+    def get(self, key: str) -> Optional[Any]:
+        """
+        Returns the cached value of a key, or None if it is missing or expired.
+        """
+        return None
+
+    def put(self, key: str, value: Any) -> None:
+        """
+        Stores a JSON-serializable value under a key.
+        """
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Returns the hit/miss counters of the cache.
+        """
+        return {"hits": 0, "misses": 0, "evictions": 0, "hit_rate": 0.0}
+
+
+class MemoryResultCache(ResultCache):
+    """
+    A small in-process LRU of results, in front of the shared cache.
+
+    Its keys are built by result_key, so entries of an index version that is no longer served are simply
+    never hit again; `clear` frees them early.
+
+    Attributes:
+        max_size (int): Maximum number of results held.
+    """
+
+    def __init__(self, max_size: int = RESULT_MEMORY_SIZE) -> None:
+        self.max_size = max_size
+        self._entries: "OrderedDict[str, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        """
+        Returns the result stored under a key, or None.
+        """
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: str, value: Any) -> None:
+        """
+        Stores a result, evicting the least recently used one if the cache is full.
+        """
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        """
+        Drops every entry; the counters are kept.
+        """
+        with self._lock:
+            self._entries.clear()
+
+    def cache_info(self) -> CacheInfo:
+        """
+        Returns the counters in the shape of functools.lru_cache's cache_info, for engine.metrics.lru_counts.
+        """
+        with self._lock:
+            return CacheInfo(self.hits, self.misses, self.max_size, len(self._entries))
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Returns the hit/miss counters of the cache.
+        """
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
+
+
+class SQLiteResultCache(SQLiteLRUStore, ResultCache):
+    """
+    A persistent, size-bounded result cache in a SQLite file shared by the workers of a host.
+
+    Attributes:
+        path (str): The file path of the SQLite file.
+        ttl (float): Seconds after which a result is considered stale.
+        max_bytes (int): Total size of the stored results above which the least recently used ones are evicted.
+    """
+
+    TABLE = "results"
+    KEY_COLUMNS = ("key",)
+    VALUE_COLUMN = "value"
+
+    def __init__(
+        self,
+        path: str = RESULT_CACHE_PATH,
+        ttl: float = RESULT_CACHE_TTL,
+        max_bytes: int = RESULT_CACHE_MAX_BYTES,
+    ) -> None:
+        super().__init__(path, ttl, max_bytes)
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        """
+        Looks up a result.
+
+        Args:
+            key (str): The key, as built by result_key.
+
+        Returns:
+            Optional[Any]: The decoded result, or None if it is missing or expired.
+        """
+        try:
+            value = self._read((key,))
+        except sqlite3.Error as e:
+            logger.warning("Result cache read failed: {error}", error=e)
+            value = None
+
+        with self._lock:
+            if value is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return json.loads(value)
+
+    def put(self, key: str, value: Any) -> None:
+        """
+        Stores a result and evicts expired and least recently used entries if needed.
+
+        Args:
+            key (str): The key, as built by result_key.
+            value (Any): The result, JSON serializable.
+        """
+        try:
+            self._write((key,), json.dumps(value))
+        except sqlite3.Error as e:
+            logger.warning("Result cache write failed: {error}", error=e)
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Returns the hit/miss counters of the cache.
+
+        Returns:
+            Dict[str, float]: hits, misses, evictions and the hit_rate.
+        """
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
+
+
+def load_result_cache(backend: str = RESULT_CACHE_BACKEND) -> ResultCache:
+    """
+    Builds a result cache backend.
+
+    Args:
+        backend (str, optional): "sqlite" or "none". Defaults to RESULT_CACHE_BACKEND.
+
+    Returns:
+        ResultCache: The backend.
+
+    Raises:
+        ValueError: If the backend name is unknown.
+    """
+    if backend == "sqlite":
+        return SQLiteResultCache()
+    if backend == "none":
+        return ResultCache()
+    raise ValueError(f"Unknown result cache backend: {backend}")
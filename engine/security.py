@@ -14,12 +14,322 @@
 """
 This module provides functionality to detect gibberish text using a pre-trained model.
 
+Concurrent `detect` calls are grouped by a micro-batcher: a background thread collects the inputs that
+arrive within a few milliseconds of each other and classifies them with one batched forward pass.
+
+The classifier runs on the full-precision PyTorch pipeline by default; GIBBERISH_BACKEND selects an int8
+or ONNX Runtime backend from engine.classifier_backends instead.
+
+Before the model, a heuristic pre-filter decides the obvious cases in microseconds from the dictionary-word
+ratio, a character bigram model and the character entropy of the input: well-formed English questions are
+clean, long keyboard-mash and repeated characters are gibberish, and everything else (short and name-like
+inputs included) goes to the model. Model verdicts are kept in a bounded LRU keyed by the normalized input.
+
+Constants:
+- GIBBERISH_BACKEND: "torch", "int8" or "onnx" (environment variable GIBBERISH_BACKEND).
+- GIBBERISH_BATCHING: Whether detect calls are micro-batched (environment variable GIBBERISH_BATCHING).
+- GIBBERISH_BATCH_WAIT_MS: How long the first input of a batch waits for more (environment variable
+  GIBBERISH_BATCH_WAIT_MS).
+- GIBBERISH_BATCH_SIZE: The largest batch sent to the model (environment variable GIBBERISH_BATCH_SIZE).
+- GIBBERISH_PREFILTER: Whether the heuristic pre-filter runs before the model (environment variable
+  GIBBERISH_PREFILTER).
+- GIBBERISH_CACHE_SIZE: Model verdicts kept in memory (environment variable GIBBERISH_CACHE_SIZE).
+
 Classes:
+- MicroBatcher: Groups concurrent calls into batches for a batch function and records batch metrics.
+- VerdictCache: A bounded LRU of model labels keyed by normalized input.
 - GibberishDetector: A class that encapsulates the functionality for detecting gibberish in text inputs.
+
+Functions:
+- char_entropy: Shannon entropy of the letters of a text.
+- bigram_score: Mean log-probability of the character bigrams of some words under an English model.
+- prefilter: Decides confident cases without the model.
 """
-from typing import ClassVar
+import functools
+import math
+import os
+import queue
+import re
+import threading
+import time
+from collections import Counter, OrderedDict
+from concurrent.futures import Future
+from typing import Any, Callable, ClassVar, Dict, List, Optional
 from loguru import logger
-from transformers import pipeline, Pipeline
+from transformers import Pipeline
+
+from engine.classifier_backends import (
+    GIBBERISH_THREADS,
+    PipelineBackend,
+    classify_with_pipeline,
+    load_backend,
+)
+from engine.embedding_cache import normalize_prompt
+from engine.lexicon import COMMON_WORDS, QUESTION_WORDS
+from engine.metrics import instrument, register_cache
+
+
+GIBBERISH_BACKEND = os.getenv("GIBBERISH_BACKEND", "torch")
+GIBBERISH_BATCHING = os.getenv("GIBBERISH_BATCHING", "1") == "1"
+GIBBERISH_BATCH_WAIT_MS = float(os.getenv("GIBBERISH_BATCH_WAIT_MS", "5"))
+GIBBERISH_BATCH_SIZE = int(os.getenv("GIBBERISH_BATCH_SIZE", "16"))
+GIBBERISH_PREFILTER = os.getenv("GIBBERISH_PREFILTER", "1") == "1"
+GIBBERISH_CACHE_SIZE = int(os.getenv("GIBBERISH_CACHE_SIZE", "10000"))
+
+_WORD = re.compile(r"[^\W\d_]+")
+# English questions score above -4.0 on tests/fixtures/gibberish_inputs.txt. Proper nouns of
+# philosophy (Zhuangzi, Xunzi, Nagarjuna sunyata) score down to -6.5, so only long inputs are ever
+# judged by spelling, and only well below -4.8 (keyboard-mash of three or more words scores -4.9 to -5.2)
+CLEAN_BIGRAM_SCORE = -4.0
+GIBBERISH_BIGRAM_SCORE = -4.8
+GIBBERISH_MIN_WORDS = 3
+GIBBERISH_MIN_LETTERS = 12
+
+
+@functools.lru_cache(maxsize=None)
+def _bigram_model() -> Dict[str, float]:
+    """
+    Trains an add-one smoothed character bigram model on the vocabulary of engine.lexicon.
+    """
+    pairs = Counter()
+    starts = Counter()
+    for word in COMMON_WORDS:
+        padded = f"^{word}$"
+        for a, b in zip(padded, padded[1:]):
+            pairs[a + b] += 1
+            starts[a] += 1
+    # 26 letters plus the end marker can follow any character
+    return {"pairs": dict(pairs), "starts": dict(starts), "symbols": 27}
+
+
+def bigram_score(words: List[str]) -> float:
+    """
+    Scores how English-like the spelling of some words is.
+
+    Args:
+        words (List[str]): Lower case words.
+
+    Returns:
+        float: The mean log2-probability of their character bigrams, word boundaries included; 0 without words.
+    """
+    model = _bigram_model()
+    total = 0.0
+    count = 0
+    for word in words:
+        padded = f"^{word}$"
+        for a, b in zip(padded, padded[1:]):
+            total += math.log2(
+                (model["pairs"].get(a + b, 0) + 1) / (model["starts"].get(a, 0) + model["symbols"])
+            )
+            count += 1
+    return total / count if count else 0.0
+
+
+def char_entropy(text: str) -> float:
+    """
+    Computes the Shannon entropy, in bits, of the letters of a text.
+
+    Args:
+        text (str): The text.
+
+    Returns:
+        float: The entropy; 0 for a text without letters.
+    """
+    letters = Counter(c for c in text if c.isalpha())
+    total = sum(letters.values())
+    return -sum(n / total * math.log2(n / total) for n in letters.values()) if total else 0.0
+
+
+def prefilter(text: str) -> Optional[bool]:
+    """
+    Decides whether a normalized input is gibberish when the answer is obvious.
+
+    Inputs are gibberish only on unambiguous signals: their letters repeat one or two characters, or
+    they are long (at least three words and twelve letters), mostly unknown and spelled very unlike English
+    (keyboard-mash). Short and name-like inputs, e.g. "Zhuangzi" or "Nagarjuna sunyata", always go to the
+    model. Inputs are clean when they read as a question (a question word first or a question mark last)
+    of at least three words, mostly known and spelled like English. Anything else is left to the model.
+
+    Args:
+        text (str): The input, normalized with engine.embedding_cache.normalize_prompt.
+
+    Returns:
+        Optional[bool]: True for gibberish, False for clean, None when the model has to decide.
+    """
+    words = _WORD.findall(text)
+    letters = sum(len(word) for word in words)
+    if letters < 4:
+        return None
+    known = sum(word in COMMON_WORDS for word in words) / len(words)
+    score = bigram_score(words)
+
+    if known < 0.25:
+        if char_entropy(text) < 1.0:
+            return True
+        if (
+            len(words) >= GIBBERISH_MIN_WORDS
+            and letters >= GIBBERISH_MIN_LETTERS
+            and score < GIBBERISH_BIGRAM_SCORE
+        ):
+            return True
+    if (
+        len(words) >= 3
+        and known >= 0.6
+        and score >= CLEAN_BIGRAM_SCORE
+        and (words[0] in QUESTION_WORDS or text.endswith("?"))
+    ):
+        return False
+    return None
+
+
+class MicroBatcher:
+    """
+    Collects items submitted from many threads and processes them in batches on one worker thread.
+
+    The worker takes the first waiting item, then keeps collecting until `max_batch` items are gathered
+    or `max_wait_ms` milliseconds have passed since it took the first one, calls `process` once on the
+    whole batch and hands every caller its own result.
+
+    Attributes:
+        process (Callable[[List[Any]], List[Any]]): Maps a batch of items to their results, in order.
+        max_batch (int): The largest batch passed to `process`.
+        max_wait_ms (float): How long the worker waits for a batch to fill.
+    """
+
+    def __init__(
+        self,
+        process: Callable[[List[Any]], List[Any]],
+        max_batch: int = GIBBERISH_BATCH_SIZE,
+        max_wait_ms: float = GIBBERISH_BATCH_WAIT_MS,
+        name: str = "micro-batcher",
+    ) -> None:
+        self.process = process
+        self.max_batch = max(1, max_batch)
+        self.max_wait_ms = max(0.0, max_wait_ms)
+        self._queue: "queue.Queue" = queue.Queue()
+        self._lock = threading.Lock()
+        self._batches = 0
+        self._items = 0
+        self._max_batch_seen = 0
+        self._batch_sizes: Dict[int, int] = {}
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._worker = threading.Thread(target=self._run, name=name, daemon=True)
+        self._worker.start()
+
+    def submit(self, item: Any, timeout: Optional[float] = None) -> Any:
+        """
+        Queues an item and blocks until its batch has been processed.
+
+        Args:
+            item (Any): The item to process.
+            timeout (float, optional): Seconds to wait for the result. Defaults to waiting forever.
+
+        Returns:
+            Any: The result `process` returned for this item.
+
+        Raises:
+            Exception: Whatever `process` raised for the batch holding this item.
+        """
+        future: Future = Future()
+        self._queue.put((item, future, time.monotonic()))
+        return future.result(timeout=timeout)
+
+    def _collect(self) -> List:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait_ms / 1000
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining <= 0:
+                    # take what is already waiting, but do not wait any longer
+                    batch.append(self._queue.get_nowait())
+                else:
+                    batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._collect()
+            started = time.monotonic()
+            waits = [started - queued for _, _, queued in batch]
+            self._record(len(batch), waits)
+            try:
+                results = self.process([item for item, _, _ in batch])
+                if len(results) != len(batch):
+                    raise RuntimeError(
+                        f"Batch of {len(batch)} items returned {len(results)} results"
+                    )
+            except Exception as e:
+                for _, future, _ in batch:
+                    future.set_exception(e)
+                continue
+            for (_, future, _), result in zip(batch, results):
+                future.set_result(result)
+
+    def _record(self, size: int, waits: List[float]) -> None:
+        with self._lock:
+            self._batches += 1
+            self._items += size
+            self._max_batch_seen = max(self._max_batch_seen, size)
+            self._batch_sizes[size] = self._batch_sizes.get(size, 0) + 1
+            self._wait_total += sum(waits)
+            self._wait_max = max(self._wait_max, max(waits))
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Returns the batch-size and queue-wait metrics.
+
+        Returns:
+            Dict[str, Any]: batches and items processed, mean_batch_size, max_batch_size, batch_sizes
+                (batch size -> number of batches), and mean_queue_wait_ms / max_queue_wait_ms, the time
+                items spent queued before their batch started.
+        """
+        with self._lock:
+            return {
+                "batches": self._batches,
+                "items": self._items,
+                "mean_batch_size": self._items / self._batches if self._batches else 0.0,
+                "max_batch_size": self._max_batch_seen,
+                "batch_sizes": dict(self._batch_sizes),
+                "mean_queue_wait_ms": 1000 * self._wait_total / self._items
+                if self._items
+                else 0.0,
+                "max_queue_wait_ms": 1000 * self._wait_max,
+            }
+
+
+class VerdictCache:
+    """
+    A thread-safe, bounded LRU of classifier labels keyed by normalized input.
+
+    Attributes:
+        max_size (int): Maximum number of labels kept.
+    """
+
+    def __init__(self, max_size: int = GIBBERISH_CACHE_SIZE) -> None:
+        self.max_size = max_size
+        self._labels: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            label = self._labels.get(key)
+            if label is not None:
+                self._labels.move_to_end(key)
+            return label
+
+    def put(self, key: str, label: str) -> None:
+        with self._lock:
+            self._labels[key] = label
+            self._labels.move_to_end(key)
+            while len(self._labels) > self.max_size:
+                self._labels.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._labels)
 
 
 class GibberishDetector:
@@ -31,40 +341,136 @@ class GibberishDetector:
 
     Class Attributes:
         _pipe: A private class-level attribute that holds the pipeline instance for text classification.
+        _backend: A private class-level attribute that holds the int8 or ONNX backend, if one is selected.
+        _batcher: A private class-level attribute that holds the micro-batcher feeding the pipeline.
+        _cache: A private class-level attribute that holds the verdict cache.
+        _counts: A private class-level attribute counting how each request was decided.
     """
 
     _pipe: ClassVar[Pipeline] = None
+    _backend: ClassVar[Any] = None
+    _batcher: ClassVar[MicroBatcher] = None
+    _batcher_lock: ClassVar[threading.Lock] = threading.Lock()
+    _cache: ClassVar[VerdictCache] = VerdictCache()
+    _counts: ClassVar[Dict[str, int]] = {"prefilter": 0, "cache": 0, "model": 0}
+    _counts_lock: ClassVar[threading.Lock] = threading.Lock()
 
     @classmethod
     def get_pipe(cls) -> Pipeline:
         """
         Retrieves or initializes the text classification pipeline.
 
-        This method ensures that the pipeline is instantiated only once and reused for subsequent calls.
+        This method ensures that the pipeline is instantiated only once and reused for subsequent calls. It
+        is the pipeline of the "torch" backend, so the parity checks of the other backends compare against
+        what is served.
 
         Returns:
             A pipeline object for text classification.
         """
         if cls._pipe is None:
-            cls._pipe = pipeline(
-                "text-classification", model="wajidlinux99/gibberish-text-detector"
-            )
+            cls._pipe = PipelineBackend(threads=GIBBERISH_THREADS).pipe
         return cls._pipe
 
     @classmethod
+    def get_backend(cls) -> Any:
+        """
+        Retrieves or loads the backend selected by GIBBERISH_BACKEND when it is not the reference pipeline.
+
+        Returns:
+            Any: A backend of engine.classifier_backends.
+        """
+        if cls._backend is None:
+            cls._backend = load_backend(GIBBERISH_BACKEND)
+        return cls._backend
+
+    @classmethod
+    def classify(cls, user_inputs: List[str]) -> List[str]:
+        """
+        Classifies several inputs with a single batched forward pass.
+
+        Args:
+            user_inputs (List[str]): The texts to classify.
+
+        Returns:
+            List[str]: The label of every input, in order.
+        """
+        if GIBBERISH_BACKEND != "torch":
+            return cls.get_backend().classify(user_inputs)
+        return classify_with_pipeline(cls.get_pipe(), user_inputs)
+
+    @classmethod
+    def get_batcher(cls) -> MicroBatcher:
+        """
+        Retrieves or starts the micro-batcher that groups concurrent detect calls.
+
+        Returns:
+            MicroBatcher: The shared batcher.
+        """
+        if cls._batcher is None:
+            with cls._batcher_lock:
+                if cls._batcher is None:
+                    cls._batcher = MicroBatcher(
+                        lambda user_inputs: cls.classify(user_inputs),
+                        name="gibberish-batcher",
+                    )
+        return cls._batcher
+
+    @classmethod
+    def _count(cls, stage: str) -> None:
+        with cls._counts_lock:
+            cls._counts[stage] += 1
+
+    @classmethod
+    def stats(cls) -> Dict[str, float]:
+        """
+        Returns how requests were decided.
+
+        Returns:
+            Dict[str, float]: prefilter, cache and model counts, and skip_rate, the fraction of requests
+                decided without running the model.
+        """
+        with cls._counts_lock:
+            counts = dict(cls._counts)
+        total = sum(counts.values())
+        counts["skip_rate"] = (counts["prefilter"] + counts["cache"]) / total if total else 0.0
+        return counts
+
+    @classmethod
+    @instrument("gibberish")
     def detect(cls, user_input: str) -> bool:
         """
         Determines if the given user input is gibberish.
 
+        Obvious cases are decided by the heuristic pre-filter and repeated inputs by the verdict cache;
+        only the rest run the model.
+
         Args:
             user_input (str): The text input to be analyzed.
 
         Returns:
             bool: True if the input is classified as 'noise' (gibberish), False otherwise.
         """
-        pipe: Pipeline = cls.get_pipe()
-        result = pipe(user_input)
-        label = result[0]["label"]
+        key = normalize_prompt(user_input)
+        verdict = prefilter(key) if GIBBERISH_PREFILTER else None
+        if verdict is not None:
+            cls._count("prefilter")
+            logger.info(
+                "[GIBBER CHECK] Request: {req} is {verdict} by the pre-filter",
+                req=user_input,
+                verdict="gibberish" if verdict else "clean",
+            )
+            return verdict
+
+        label = cls._cache.get(key)
+        if label is not None:
+            cls._count("cache")
+        else:
+            cls._count("model")
+            if GIBBERISH_BATCHING:
+                label = cls.get_batcher().submit(user_input)
+            else:
+                label = cls.classify([user_input])[0]
+            cls._cache.put(key, label)
         logger.info(
             "[GIBBER CHECK] Request: {req} is classified as {label}",
             req=user_input,
@@ -72,3 +478,11 @@ class GibberishDetector:
         )
         return label != "clean"
         # return label == "noise" or label == "mild gibberish"
+
+
+def _verdict_cache_counts() -> tuple:
+    counts = GibberishDetector.stats()
+    return counts["cache"], counts["model"]
+
+
+register_cache("gibberish_verdicts", _verdict_cache_counts)
@@ -18,48 +18,227 @@ summarize, and find podcast episodes based on user-provided prompts or questions
 
 Key Components and Functionalities:
 - Chroma Database: Utilizes Chroma, a vector store, for efficient similarity searches with podcast content.
+  Setting VECTOR_BACKEND=numpy swaps it for an exact NumPy search over an exported, memory-mapped matrix.
+  The index is served from the active version of engine.index_versions; when another version is activated, the
+  next search loads it and swaps it in while searches already running finish on the old one.
+- Query Embedding Cache: Serves repeated prompts' embeddings from a shared two-tier cache instead of the embedding API.
 - Large Language Models: Employs language models from OpenAI (like GPT-3.5-turbo-16k) for generating summaries and assessing content relevancy.
-- Episode Suggestion: Provides capabilities to suggest podcast episodes similar to a given prompt using similarity search.
+- Episode Suggestion: Provides capabilities to suggest podcast episodes similar to a given prompt using similarity search,
+  either from a fixed chunk window or (RETRIEVAL_MODE=episode) by widening the window until TOP_K episodes are found.
 - Summary Generation: Generates concise summaries of podcast episodes, tailored to specific hints or questions.
 - Relevancy Assessment: Determines the relevance of podcast episodes to a given prompt, ensuring suggested content is contextually appropriate.
+  All candidates are verified concurrently through engine.verifier.RelevanceVerifier.
 - Episode Retrieval: Retrieves detailed information about podcast episodes, including titles, text content, and links.
+- Field Projection: Callers can ask for a subset of the result fields (see SEARCH_FIELDS); only the database columns
+  those fields need are read.
+- Async Retrieval: afind_episodes and ais_related are the coroutine counterparts used by the ASGI server. They await
+  the embedding and LLM clients and the database, and run the CPU-bound vector search on an executor.
+- Result Cache: find_episodes results are cached in a store shared by all workers that survives restarts (see
+  engine.result_cache), behind a per-process one; entries are keyed by the version of the vector index.
+- Request Coalescing: Identical find_episodes and is_related calls (same normalized prompt) that arrive while one
+  is still running wait for its result instead of running the pipeline again (see engine.singleflight).
+- Metrics: The query embedding, vector search and is_related stages are timed, and the hit counts of the caches are
+  exported through engine.metrics.
 """
+import asyncio
+import hashlib
 import os
-from typing import List, Tuple
+import threading
+import time
+from typing import Callable, Iterable, List, Optional, Tuple, Union
 import functools
+from async_lru import alru_cache
 from langchain.embeddings import OpenAIEmbeddings
 from langchain.vectorstores import Chroma
-from langchain.chat_models import ChatOpenAI
 from langchain.schema.document import Document
-from langchain.chains.llm import LLMChain
-from langchain.chains.combine_documents.stuff import StuffDocumentsChain
-from langchain.prompts import PromptTemplate
 from dotenv import load_dotenv
+from loguru import logger
 
 from engine.constants import Podcast, LEAST_ACCEPTED_SIMILARITY
+from engine.embedding_cache import CachedEmbeddings, EmbeddingCache, normalize_prompt
+from engine.context import arun_llm, prompt_budget, run_llm, select_relevant_chunks
+from engine.verifier import RelevanceVerifier
+from engine.vector_engine import NumpyVectorIndex
 from engine.data_handler.get import get_text
-from engine.utils import attach_summaries, extract_episode_from_docs
-from engine.data_handler.get import get_link, get_title
+from engine.utils import aggregate_episode_scores, extract_episode_from_docs
+from engine.data_handler.get import get_episodes_bulk
+from engine.data_handler.aio import aget_episodes_bulk, aget_text, run_in_db_thread
+from engine.metrics import instrument, lru_counts, register_cache, timed
+from engine.singleflight import single_flight
+from engine.result_cache import MemoryResultCache, ResultCache, load_result_cache, result_key
+from engine.index_versions import NUMPY_SUBDIR, file_hash, resolve_index
 
 
 load_dotenv()
 DB_PATH = os.sep.join("./data/vectorDB".split("/"))
+NUMPY_INDEX_PATH = os.sep.join("./data/vectorNPY".split("/"))
+# "chroma" or "numpy" (exact search over the export written by data_preparation/export_vectors.py)
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "chroma")
+# "chunk" deduplicates the k nearest chunks, "episode" widens the chunk window until TOP_K episodes are found
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "chunk")
+# how chunk scores are combined per episode in "episode" mode: "max", "sum" or "rrf"
+EPISODE_AGGREGATION = os.getenv("EPISODE_AGGREGATION", "max")
+MAX_CHUNK_WINDOW = int(os.getenv("MAX_CHUNK_WINDOW", "256"))
+# seconds between checks for a newly activated index version
+INDEX_CHECK_INTERVAL = float(os.getenv("INDEX_CHECK_INTERVAL", "5"))
+# result field -> (short name accepted in `fields`, merged_data column it is read from)
+SEARCH_FIELDS = {
+    "episode_number": ("number", None),
+    "episode_title": ("title", "Title"),
+    "podcast_title": ("podcast", None),
+    "episode_text": ("text", "Summary"),
+    "episode_link": ("link", "URL"),
+}
+
+
+@functools.lru_cache(maxsize=64)
+def _file_digest(path: str, size: int, mtime_ns: int) -> str:
+    # keyed by size and mtime, so a file is only hashed again after it was written
+    return file_hash(path)
+
+
+def _index_fingerprint(path: str) -> str:
+    """
+    Identifies the content of a legacy, unversioned vector index.
+
+    A Chroma index is identified by its `chroma.sqlite3` alone: Chroma rewrites its HNSW segment files on
+    the first query after every open, while the SQLite file only changes with the data. Any other index
+    (a NumPy export) is identified by all of its files.
+    """
+    sqlite_path = os.path.join(path, "chroma.sqlite3")
+    if os.path.isfile(sqlite_path):
+        paths = [sqlite_path]
+    else:
+        paths = sorted(os.path.join(root, name) for root, _, files in os.walk(path) for name in files)
+    digest = hashlib.sha256()
+    for file_path in paths:
+        stat = os.stat(file_path)
+        relative = os.path.relpath(file_path, path)
+        content = _file_digest(file_path, stat.st_size, stat.st_mtime_ns)
+        digest.update(f"{relative}:{stat.st_size}:{content};".encode("UTF-8"))
+    return digest.hexdigest()[:16]
 
 
 class VectorDB:
     _db = None
+    _embeddings: CachedEmbeddings = None
+    # the version of the loaded index, and the active version as last read from disk and when
+    _version: str = None
+    _active: Tuple[str, str] = None
+    _checked: float = 0.0
+    # a version that failed to load, and when; it is retried every INDEX_CHECK_INTERVAL seconds
+    _failed: Tuple[str, float] = None
+    _lock = threading.Lock()
+    _swap_hooks: List[Callable[[], None]] = []
 
     @classmethod
-    def _get_db(cls) -> Chroma:
-        
-        if cls._db is None:
-            cls._db = Chroma(persist_directory=DB_PATH, embedding_function=OpenAIEmbeddings())
+    def _active_index(cls) -> Tuple[str, str]:
+        """
+        Returns the version and directory of the index to serve, re-read every INDEX_CHECK_INTERVAL seconds.
+        """
+        now = time.monotonic()
+        if cls._active is None or now - cls._checked >= INDEX_CHECK_INTERVAL:
+            version, path = resolve_index(DB_PATH)
+            if version is None:
+                # a legacy, unversioned index is identified by its files
+                path = NUMPY_INDEX_PATH if VECTOR_BACKEND == "numpy" else DB_PATH
+                version = f"{VECTOR_BACKEND}:{_index_fingerprint(path)}"
+            elif VECTOR_BACKEND == "numpy":
+                path = os.path.join(path, NUMPY_SUBDIR)
+            cls._active = (version, path)
+            cls._checked = now
+        return cls._active
+
+    @classmethod
+    def index_version(cls) -> str:
+        """
+        Returns an identifier of the vector index searches run on; it changes when another index is activated.
+        """
+        version = cls._active_index()[0]
+        if cls._db is not None and cls._failed is not None and cls._failed[0] == version:
+            # the activated version could not be loaded, searches still run on the loaded one
+            return cls._version
+        return version
+
+    @classmethod
+    def on_swap(cls, hook: Callable[[], None]) -> None:
+        """
+        Registers a function called after the served index is swapped for another version.
+        """
+        cls._swap_hooks.append(hook)
+
+    @classmethod
+    def get_embeddings(cls) -> CachedEmbeddings:
+        """
+        Returns the query embedding client, backed by the shared embedding cache.
+        """
+        if cls._embeddings is None:
+            embeddings = OpenAIEmbeddings()
+            cls._embeddings = CachedEmbeddings(
+                embeddings, cache=EmbeddingCache(), model=embeddings.model
+            )
+        return cls._embeddings
+
+    @classmethod
+    def _load(cls, path: str) -> Union[Chroma, NumpyVectorIndex]:
+        if VECTOR_BACKEND == "numpy":
+            return NumpyVectorIndex.load(path)
+        return Chroma(persist_directory=path, embedding_function=cls.get_embeddings())
+
+    @classmethod
+    def _get_db(cls) -> Union[Chroma, NumpyVectorIndex]:
+        """
+        Returns the index of the active version, loading it first if another version was activated.
+
+        While one thread loads a new version the others keep searching the loaded one, and searches that
+        already hold the old index finish on it. If the new version fails to load (e.g. its NumPy export is
+        missing), the loaded one keeps being served and the load is retried every INDEX_CHECK_INTERVAL
+        seconds; only the first load raises.
+        """
+        version, path = cls._active_index()
+        if cls._db is not None and cls._version == version:
+            return cls._db
+        if cls._db is not None and cls._failed is not None and cls._failed[0] == version:
+            if time.monotonic() - cls._failed[1] < INDEX_CHECK_INTERVAL:
+                return cls._db
+        if not cls._lock.acquire(blocking=cls._db is None):
+            return cls._db
+        try:
+            if cls._db is None or cls._version != version:
+                try:
+                    db = cls._load(path)
+                except Exception as e:
+                    if cls._db is None:
+                        raise
+                    cls._failed = (version, time.monotonic())
+                    logger.error(
+                        "Failed loading vector index {version}, still serving {served}: {error}",
+                        version=version,
+                        served=cls._version,
+                        error=e,
+                    )
+                    return cls._db
+                cls._failed = None
+                swapped = cls._db is not None
+                cls._db, cls._version = db, version
+                if swapped:
+                    logger.info("Swapped vector index to {version}", version=version)
+                    for hook in cls._swap_hooks:
+                        hook()
+        finally:
+            cls._lock.release()
         return cls._db
 
     @classmethod
     def similarity_search_with_score(cls, prompt, k):
+        embedding = cls.get_embeddings().embed_query(prompt)
+        return cls.similarity_search_by_vector(embedding, k)
+
+    @classmethod
+    def similarity_search_by_vector(cls, embedding, k):
         db = cls._get_db()
-        return db.similarity_search_with_score(prompt, k)
+        with timed("vector_search"):
+            return db.similarity_search_by_vector_with_relevance_scores(embedding, k)
 
 
 def get_similar_docs(prompt: str, k: int = 20) -> List[Tuple[Document, float]]:
@@ -77,7 +256,12 @@ def get_similar_docs(prompt: str, k: int = 20) -> List[Tuple[Document, float]]:
         List[Tuple[Document, float]]: A list of tuples, each containing a Document and its similarity score.
     """
 
-    docs_with_score = VectorDB.similarity_search_with_score(prompt, k)
+    embedding = VectorDB.get_embeddings().embed_query(prompt)
+    return _similar_docs_by_vector(embedding, k)
+
+
+def _similar_docs_by_vector(embedding: List[float], k: int) -> List[Tuple[Document, float]]:
+    docs_with_score = VectorDB.similarity_search_by_vector(embedding, k)
     docs = [
         (data, score)
         for data, score in docs_with_score
@@ -105,23 +289,70 @@ def suggest_me_episodes(prompt: str, k: int = 8) -> List:
     epis = extract_episode_from_docs(epis)
     return epis
 
-@functools.lru_cache(maxsize=4096)
-def is_related(episode: Tuple[int, str], prompt: str) -> bool:
+def suggest_episodes_adaptive(
+    prompt: str,
+    TOP_K: int = 6,
+    k: int = 12,
+    method: str = EPISODE_AGGREGATION,
+    max_k: int = MAX_CHUNK_WINDOW,
+) -> List:
     """
-    Determines if the content of a podcast episode is related to a given prompt.
+    Suggests up to TOP_K distinct episodes, widening the chunk window until enough are found.
 
-    This function uses a language model to assess whether the content of a specified
-    podcast episode is relevant to a given question or hint (prompt). It does so by
-    generating a response based on the episode content and the prompt.
+    The prompt is embedded once. Each round runs a single search for the k nearest chunks and stops
+    when TOP_K episodes have a chunk under LEAST_ACCEPTED_SIMILARITY, when the farthest returned
+    chunk is already over the threshold (a wider window cannot add passing chunks), when the index
+    is exhausted, or when k reaches max_k. Otherwise k is doubled.
 
     Args:
-        episode (Tuple[int, str]): A tuple containing the episode number and the podcast title.
-        prompt (str): The question or hint to be considered in relation to the episode content.
+        prompt (str): The text prompt used for finding similar episodes.
+        TOP_K (int, optional): The number of distinct episodes wanted. Defaults to 6.
+        k (int, optional): The size of the first chunk window. Defaults to 12.
+        method (str, optional): How chunk scores are aggregated per episode, see
+            engine.utils.aggregate_episode_scores. Defaults to EPISODE_AGGREGATION.
+        max_k (int, optional): The largest chunk window to search. Defaults to MAX_CHUNK_WINDOW.
 
     Returns:
-        bool: True if the episode content is related to the prompt, False otherwise.
+        List: (episode number, podcast name) tuples, best first.
     """
-    prompt_template = (
+    embedding = VectorDB.get_embeddings().embed_query(prompt)
+    return _suggest_adaptive_by_vector(embedding, TOP_K, k, method, max_k)
+
+
+def _suggest_adaptive_by_vector(
+    embedding: List[float], TOP_K: int, k: int, method: str, max_k: int
+) -> List:
+    k = max(k, 1)
+    while True:
+        docs_with_score = VectorDB.similarity_search_by_vector(embedding, k)
+        ranked = aggregate_episode_scores(
+            docs_with_score, threshold=LEAST_ACCEPTED_SIMILARITY, method=method
+        )
+        if (
+            len(ranked) >= TOP_K
+            or len(docs_with_score) < k
+            or docs_with_score[-1][1] >= LEAST_ACCEPTED_SIMILARITY
+            or k >= max_k
+        ):
+            break
+        k = min(k * 2, max_k)
+
+    return [episode for episode, _ in ranked[:TOP_K]]
+
+
+def _suggest_by_vector(embedding: List[float], k: int, TOP_K: int) -> List:
+    """
+    Runs the search of the configured RETRIEVAL_MODE for an embedded prompt.
+    """
+    if RETRIEVAL_MODE == "episode":
+        return _suggest_adaptive_by_vector(
+            embedding, TOP_K, k, EPISODE_AGGREGATION, MAX_CHUNK_WINDOW
+        )
+    return extract_episode_from_docs(_similar_docs_by_vector(embedding, k))
+
+
+def _is_related_template(prompt: str) -> str:
+    return (
         """ Look at the following content, and answer my question only based on this content.
         CONTENT: "{text}"
         """
@@ -133,88 +364,346 @@ def is_related(episode: Tuple[int, str], prompt: str) -> bool:
         Answer (Yes/No): """
     )
 
-    prompt = PromptTemplate.from_template(prompt_template)
-
-    llm = ChatOpenAI(temperature=0, model_name="gpt-3.5-turbo-16k")
-    llm_chain = LLMChain(llm=llm, prompt=prompt)
 
-    stuff_chain = StuffDocumentsChain(
-        llm_chain=llm_chain, document_variable_name="text"
+def _is_related_text(text: str, prompt: str, prompt_template: str) -> str:
+    # long transcripts are cut down to the chunks closest to the question so the prompt fits the window
+    return select_relevant_chunks(
+        text, query=prompt, budget=prompt_budget(prompt_template.replace("{text}", ""))
     )
-    
+
+
+@functools.lru_cache(maxsize=4096)
+@single_flight(
+    "is_related", key=lambda episode, prompt: (tuple(episode), normalize_prompt(prompt))
+)
+@instrument("is_related")
+def is_related(episode: Tuple[int, str], prompt: str) -> bool:
+    """
+    Determines if the content of a podcast episode is related to a given prompt.
+
+    This function uses a language model to assess whether the content of a specified
+    podcast episode is relevant to a given question or hint (prompt). It does so by
+    generating a response based on the episode content and the prompt.
+
+    Args:
+        episode (Tuple[int, str]): A tuple containing the episode number and the podcast title.
+        prompt (str): The question or hint to be considered in relation to the episode content.
+
+    Returns:
+        bool: True if the episode content is related to the prompt, False otherwise.
+    """
+    prompt_template = _is_related_template(prompt)
+
     podcast_title = episode[1]
 
     text = get_text(episode[0], podcast_title.value)[0][0]
-    docs = [Document(page_content=text)]
+    text = _is_related_text(text, prompt, prompt_template)
 
-    llm_output = stuff_chain.run(docs)
+    llm_output = run_llm("is_related", prompt_template, text=text)
     if "yes" in llm_output.lower():
         return True
 
     return False
 
-@functools.lru_cache(maxsize=4096)
-def find_episodes(prompt, k=12, TOP_K=6):
+
+@alru_cache(maxsize=4096)
+@instrument("is_related")
+async def ais_related(episode: Tuple[int, str], prompt: str) -> bool:
+    """
+    Async counterpart of is_related.
+
+    Args:
+        episode (Tuple[int, str]): A tuple containing the episode number and the podcast title.
+        prompt (str): The question or hint to be considered in relation to the episode content.
+
+    Returns:
+        bool: True if the episode content is related to the prompt, False otherwise.
+    """
+    prompt_template = _is_related_template(prompt)
+
+    text = (await aget_text(episode[0], episode[1].value))[0][0]
+    text = await asyncio.to_thread(_is_related_text, text, prompt, prompt_template)
+
+    llm_output = await arun_llm("is_related", prompt_template, text=text)
+    return "yes" in llm_output.lower()
+
+
+@functools.lru_cache(maxsize=None)
+def get_result_cache() -> ResultCache:
+    """
+    Returns the process-wide handle on the search result cache shared by all workers.
+    """
+    return load_result_cache()
+
+
+def _result_cache_key(prompt: str, k: int, TOP_K: int, fields: Optional[Tuple[str, ...]]) -> str:
+    return result_key(prompt, [k, TOP_K, fields], VectorDB.index_version())
+
+
+# the per-process tiers of find_episodes and afind_episodes, in front of the shared result cache
+_recent_results = MemoryResultCache()
+_arecent_results = MemoryResultCache()
+
+
+@functools.lru_cache(maxsize=None)
+def get_verifier() -> RelevanceVerifier:
+    """
+    Returns the process-wide verifier that runs is_related on candidate episodes concurrently.
+    """
+    return RelevanceVerifier(
+        check=lambda episode, prompt: is_related(episode, prompt),
+        acheck=lambda episode, prompt: ais_related(episode, prompt),
+    )
+
+
+def _clean_up(epis: List) -> List[Tuple[str, Podcast]]:
+    """
+    Maps the podcast names stored with the chunks to Podcast members.
+    """
+
+    def _convert(input_string):
+        return "".join([char.lower() for char in input_string if char.isalpha()])
+
+    return [
+        (
+            num,
+            Podcast.PHILOSOPHIZE_THIS
+            if _convert(p) == "philosophizethis"
+            else Podcast.UNKNOWN,
+        )
+        for num, p in epis
+    ]
+
+
+def parse_fields(fields: Union[None, str, Iterable[str]]) -> Optional[Tuple[str, ...]]:
+    """
+    Resolves a field selection into result field names.
+
+    Args:
+        fields (Union[None, str, Iterable[str]]): A comma separated string or a list of field names, either
+            short ("number", "title", "podcast", "text", "link") or full ("episode_title", ...).
+
+    Returns:
+        Optional[Tuple[str, ...]]: The selected result fields in SEARCH_FIELDS order, or None for all of them.
+
+    Raises:
+        ValueError: If a field is unknown.
+    """
+    if fields is None:
+        return None
+    if isinstance(fields, str):
+        fields = fields.split(",")
+    names = {short: field for field, (short, _) in SEARCH_FIELDS.items()}
+    names.update({field: field for field in SEARCH_FIELDS})
+    requested = [name.strip() for name in fields if name.strip()]
+    unknown = [name for name in requested if name not in names]
+    if unknown:
+        raise ValueError(f"Unknown fields: {unknown}")
+    selected = {names[name] for name in requested}
+    return tuple(field for field in SEARCH_FIELDS if field in selected) or None
+
+
+def _result_columns(fields: Optional[Tuple[str, ...]]) -> Tuple[str, ...]:
+    """
+    Returns the merged_data columns needed to build the selected result fields.
+    """
+    columns = tuple(
+        column
+        for field, (_, column) in SEARCH_FIELDS.items()
+        if column is not None and (fields is None or field in fields)
+    )
+    # episodes missing from the database are still dropped when no column is needed
+    return columns or ("Number",)
+
+
+def _episode_results(
+    episodes: List[Tuple[str, Podcast]], details: dict, fields: Optional[Tuple[str, ...]] = None
+) -> List[dict]:
+    """
+    Builds the search results of the verified episodes, with only the selected fields.
+    """
+    results = []
+    for epi_num, podcast in episodes:
+        row = details.get((str(epi_num), podcast.value))
+        if row is None:
+            logger.warning(f"Episode not found: {epi_num}, {podcast}")
+            continue
+        values = {
+            "episode_number": lambda: epi_num,
+            "episode_title": lambda: row["Title"],
+            "podcast_title": lambda: podcast.value,
+            "episode_text": lambda: row["Summary"] or "summary didn't exists!",
+            "episode_link": lambda: row["URL"],
+        }
+        results.append(
+            {
+                field: value()
+                for field, value in values.items()
+                if fields is None or field in fields
+            }
+        )
+    return results
+
+
+def find_episodes(prompt, k=12, TOP_K=6, fields=None):
     """
     Finds and returns podcast episodes related to a given prompt.
 
-    The function searches for episodes similar to the prompt, filters them based on relevance,
-    and then fetches their titles, texts, and links. It returns a list of dictionaries,
-    each containing information about a relevant episode.
+    The function searches for episodes similar to the prompt, keeps those an LLM verifies as relevant
+    (all candidates are checked concurrently), and then fetches their titles, summaries, and links
+    with a single query. It returns a list
+    of dictionaries, each containing information about a relevant episode.
 
     Args:
         prompt (str): The prompt or query to find related podcast episodes.
         k (int, optional): The number of episodes to initially fetch for similarity assessment. Defaults to 12.
         TOP_K (int, optional): The number of top relevant episodes to return. Defaults to 3.
+        fields (Tuple[str, ...], optional): The result fields to return, as returned by parse_fields.
+            Defaults to all of them.
+
+    Results are kept in a per-process cache and in the shared result cache, both keyed by the normalized
+    prompt, the arguments and the version of the vector index, so other workers and restarted ones reuse
+    them and an index swap misses the old ones. Results for which a relevance check failed or timed out
+    are not cached.
 
     Returns:
         List[Dict]: A list of dictionaries, each containing information about an episode
-                    (number, title, text, link, and podcast title).
+                    (number, title, text, link, and podcast title, or the selected fields).
     """
+    key = _result_cache_key(prompt, k, TOP_K, fields)
+    results = _recent_results.get(key)
+    if results is None:
+        results = _find_episodes(prompt, k, TOP_K, fields, key)
+    return results
 
-    most_common_epis = suggest_me_episodes(prompt, k=k)
-    # separate episode num, podcast name
-
-    def clean_up(epis):
-        def _convert(input_string):
-            return "".join([char.lower() for char in input_string if char.isalpha()])
 
-        return [
-            (
-                num,
-                Podcast.PHILOSOPHIZE_THIS
-                if _convert(p) == "philosophizethis"
-                else Podcast.UNKNOWN,
-            )
-            for num, p in epis
-        ]
+@single_flight("find_episodes", key=lambda prompt, k, TOP_K, fields, key: key)
+def _find_episodes(prompt, k, TOP_K, fields, key):
+    """
+    Reads the results of find_episodes through the shared result cache, searching on a miss.
+    """
+    cache = get_result_cache()
+    results = cache.get(key)
+    if results is None:
+        results, degraded = _search_episodes(prompt, k, TOP_K, fields)
+        # results of a search that straddled an index swap are not stored under either version
+        if degraded or _result_cache_key(prompt, k, TOP_K, fields) != key:
+            return results
+        cache.put(key, results)
+    _recent_results.put(key, results)
+    return results
+
+
+def _search_episodes(prompt, k, TOP_K, fields):
+    """
+    Runs the search of find_episodes.
 
+    Returns:
+        Tuple[List[Dict], bool]: The results, and whether any relevance check failed or timed out.
+    """
+    if RETRIEVAL_MODE == "episode":
+        most_common_epis = suggest_episodes_adaptive(prompt, TOP_K=TOP_K, k=k)
+    else:
+        most_common_epis = suggest_me_episodes(prompt, k=k)
     # most_common_epis = [i for i, _ in most_common_epis][:TOP_K]
     most_common_epis = most_common_epis[:TOP_K]
 
-    most_common_epis = clean_up(most_common_epis)
-
-    try:
-        if len(most_common_epis) == 0 or not is_related(
-            most_common_epis[0], prompt
-        ):  # NOTE: pick the first episode to checking only
-            return []
-    except Exception as e:
-        # fixme: if the document is too long we get an error, 
-        # hiding the error here. We have to figure out a systematic solution.
-        pass
-
-    most_common_epis = attach_summaries(most_common_epis, exclude_episodes=[])
-
-    episodes = [
-        {
-            "episode_number": epi_info[0],
-            "episode_title": get_title(epi_info[0], epi_info[1]),
-            "podcast_title": epi_info[1].value,
-            "episode_text": epi_text[0][0],
-            "episode_link": get_link(epi_info[0], epi_info[1]),
-        }
-        for epi_info, epi_text in most_common_epis
-    ]
+    # separate episode num, podcast name
+    most_common_epis = _clean_up(most_common_epis)
+
+    if len(most_common_epis) == 0:
+        return [], False
+
+    most_common_epis, degraded = get_verifier().verify_with_status(most_common_epis, prompt)
+
+    details = get_episodes_bulk(most_common_epis, columns=_result_columns(fields))
+
+    return _episode_results(most_common_epis, details, fields), degraded
+
+
+async def afind_episodes(prompt, k=12, TOP_K=6, fields=None):
+    """
+    Async counterpart of find_episodes.
+
+    The prompt is embedded with the async embedding client, the vector search runs on the default
+    executor, candidates are verified with ais_related, and their details are read off the event loop.
+
+    Args:
+        prompt (str): The prompt or query to find related podcast episodes.
+        k (int, optional): The number of episodes to initially fetch for similarity assessment. Defaults to 12.
+        TOP_K (int, optional): The number of top relevant episodes to return. Defaults to 6.
+        fields (Tuple[str, ...], optional): The result fields to return, as returned by parse_fields.
+            Defaults to all of them.
+
+    Returns:
+        List[Dict]: The same episode dictionaries as find_episodes.
+    """
+    key = await asyncio.to_thread(_result_cache_key, prompt, k, TOP_K, fields)
+    results = _arecent_results.get(key)
+    if results is None:
+        results = await _afind_episodes(prompt, k, TOP_K, fields, key)
+    return results
+
+
+@single_flight("afind_episodes", key=lambda prompt, k, TOP_K, fields, key: key)
+async def _afind_episodes(prompt, k, TOP_K, fields, key):
+    """
+    Coroutine counterpart of _find_episodes.
+    """
+    cache = get_result_cache()
+    results = await run_in_db_thread(cache.get, key)
+    if results is None:
+        results, degraded = await _asearch_episodes(prompt, k, TOP_K, fields)
+        if degraded or await asyncio.to_thread(_result_cache_key, prompt, k, TOP_K, fields) != key:
+            return results
+        await run_in_db_thread(cache.put, key, results)
+    _arecent_results.put(key, results)
+    return results
+
+
+async def _asearch_episodes(prompt, k, TOP_K, fields):
+    """
+    Runs the search of afind_episodes; returns the same as _search_episodes.
+    """
+    embedding = await VectorDB.get_embeddings().aembed_query(prompt)
+    # to_thread runs the search in a copy of the request's context, so its stage timings are kept
+    most_common_epis = await asyncio.to_thread(_suggest_by_vector, embedding, k, TOP_K)
+    most_common_epis = _clean_up(most_common_epis[:TOP_K])
+
+    if len(most_common_epis) == 0:
+        return [], False
+
+    most_common_epis, degraded = await get_verifier().averify_with_status(
+        most_common_epis, prompt
+    )
+
+    details = await aget_episodes_bulk(most_common_epis, columns=_result_columns(fields))
+
+    return _episode_results(most_common_epis, details, fields), degraded
+
+
+def _result_cache_counts() -> Optional[Tuple[int, int]]:
+    if get_result_cache.cache_info().currsize == 0:
+        return None
+    stats = get_result_cache().stats()
+    return stats["hits"], stats["misses"]
+
+
+def _embedding_cache_counts() -> Optional[Tuple[int, int]]:
+    cache = getattr(VectorDB._embeddings, "cache", None)
+    if cache is None:
+        return None
+    stats = cache.stats()
+    return stats["memory_hits"] + stats["disk_hits"], stats["misses"]
+
+
+register_cache("embedding", _embedding_cache_counts)
+# results of the old index are never hit again after a swap; this frees them
+VectorDB.on_swap(_recent_results.clear)
+VectorDB.on_swap(_arecent_results.clear)
 
-    return episodes
+register_cache("find_episodes", lru_counts(_recent_results))
+register_cache("search_results", _result_cache_counts)
+register_cache("afind_episodes", lru_counts(_arecent_results))
+register_cache("is_related", lru_counts(is_related))
+register_cache("ais_related", lru_counts(ais_related))
@@ -0,0 +1,216 @@
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+This module coalesces concurrent identical calls into one computation.
+
+An lru_cache only helps once a call has finished: while the first call for a popular prompt is still
+running, every copy of it misses the cache and runs the whole pipeline again. With single-flight semantics
+the first caller for a key runs the computation and the callers arriving before it finishes wait for its
+result (or its exception) instead.
+
+Coroutine functions are coalesced the same way, between the coroutines of one event loop.
+
+Constants:
+- COALESCED_CALLS: Counter of the calls that waited for another caller's computation, labelled by call.
+
+Classes:
+- SingleFlight: The in-progress computations of one function, by key.
+
+Functions:
+- single_flight: Decorator giving a function single-flight semantics.
+- stats: Returns the leader and coalesced call counts of every single-flight function.
+"""
+import asyncio
+import functools
+import inspect
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Hashable, Optional
+
+from prometheus_client import Counter
+
+
+COALESCED_CALLS = Counter(
+    "podcast_coalesced_calls",
+    "Calls that waited for an identical call already in progress instead of computing.",
+    ["call"],
+)
+
+_flights: Dict[str, "SingleFlight"] = {}
+
+
+class SingleFlight:
+    """
+    Tracks the in-progress computations of one function, so identical concurrent calls share one.
+
+    Attributes:
+        name (str): The name the counters are reported under.
+        leaders (int): Calls that ran the computation.
+        coalesced (int): Calls that waited for another caller's computation.
+    """
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.leaders = 0
+        self.coalesced = 0
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, Future] = {}
+        self._tasks: Dict[Hashable, asyncio.Future] = {}
+
+    def do(self, key: Hashable, function: Callable, *args: Any, **kwargs: Any) -> Any:
+        """
+        Runs the call, unless an identical one is in progress, in which case its result is awaited.
+
+        Args:
+            key (Hashable): Identifies identical calls.
+            function (Callable): The computation.
+            *args (Any): Positional arguments of the computation.
+            **kwargs (Any): Keyword arguments of the computation.
+
+        Returns:
+            Any: The result of the computation; the waiters get the same object as the leader.
+
+        Raises:
+            Exception: Whatever the computation raised, in the leader and in every waiter.
+        """
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._calls[key] = future
+                self.leaders += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            COALESCED_CALLS.labels(self.name).inc()
+            return future.result()
+
+        try:
+            result = function(*args, **kwargs)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+    async def ado(self, key: Hashable, function: Callable, *args: Any, **kwargs: Any) -> Any:
+        """
+        Coroutine counterpart of do: awaits the call, unless an identical one is in progress.
+
+        Args:
+            key (Hashable): Identifies identical calls.
+            function (Callable): The coroutine function of the computation.
+            *args (Any): Positional arguments of the computation.
+            **kwargs (Any): Keyword arguments of the computation.
+
+        Returns:
+            Any: The result of the computation; the waiters get the same object as the leader.
+
+        Raises:
+            Exception: Whatever the computation raised, in the leader and in every waiter.
+        """
+        with self._lock:
+            future = self._tasks.get(key)
+            leader = future is None
+            if leader:
+                future = asyncio.get_running_loop().create_future()
+                self._tasks[key] = future
+                self.leaders += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            COALESCED_CALLS.labels(self.name).inc()
+            # a waiter that is cancelled does not cancel the leader
+            return await asyncio.shield(future)
+
+        try:
+            result = await function(*args, **kwargs)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # marks the exception as retrieved when no coroutine waited for it
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._tasks[key]
+
+
+def single_flight(name: str, key: Optional[Callable[..., Hashable]] = None) -> Callable:
+    """
+    Gives the decorated function single-flight semantics.
+
+    Placed under an lru_cache, only the cache misses are coalesced. Coroutine functions are wrapped in a
+    coroutine function.
+
+    Args:
+        name (str): The name the coalesced calls are counted under.
+        key (Callable[..., Hashable], optional): Builds the key of a call from its arguments, with the
+            defaults filled in and passed by name. Defaults to the tuple of all argument values.
+
+    Returns:
+        Callable: The decorator.
+    """
+    flight = SingleFlight(name)
+    _flights[name] = flight
+
+    def decorator(function: Callable) -> Callable:
+        signature = inspect.signature(function)
+
+        def _key(args, kwargs):
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            return key(**bound.arguments) if key else tuple(bound.arguments.values())
+
+        if inspect.iscoroutinefunction(function):
+
+            @functools.wraps(function)
+            async def wrapper(*args, **kwargs):
+                return await flight.ado(_key(args, kwargs), function, *args, **kwargs)
+
+        else:
+
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                return flight.do(_key(args, kwargs), function, *args, **kwargs)
+
+        wrapper.flight = flight
+        return wrapper
+
+    return decorator
+
+
+def stats() -> Dict[str, Dict[str, int]]:
+    """
+    Returns the leader and coalesced call counts of every single-flight function.
+
+    Returns:
+        Dict[str, Dict[str, int]]: Maps the function name to its `leaders` and `coalesced` counts.
+    """
+    return {
+        name: {"leaders": flight.leaders, "coalesced": flight.coalesced}
+        for name, flight in _flights.items()
+    }
@@ -0,0 +1,200 @@
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+This module holds the SQLite plumbing shared by the on-disk caches.
+
+Each cache is a SQLite file shared by every worker process of a host. Every thread gets its own
+connection, and the file runs in WAL mode so readers do not block the writer.
+
+Entries of an SQLiteLRUStore expire after a TTL, and the least recently used ones are evicted once the
+stored values exceed a size limit. Every process keeps a running total of the stored bytes instead of
+summing them on each write: it is read from the file when the store is opened and grows with the writes
+of the process. Only when it exceeds the limit are expired and least recently used entries deleted, down
+to EVICT_TO of the limit, and the total is read again. Writes of other processes are counted from then
+on, so the file can exceed the limit by what the other workers wrote in between.
+
+Constants:
+- EVICT_TO: The share of max_bytes an eviction trims a store down to.
+
+Classes:
+- SQLiteStore: A SQLite file with one connection per thread.
+- SQLiteLRUStore: A table of values with TTL expiry and size-bounded LRU eviction.
+"""
+import os
+import sqlite3
+import threading
+import time
+from typing import ClassVar, Optional, Tuple
+
+
+EVICT_TO = 0.9
+
+
+class SQLiteStore:
+    """
+    A SQLite file shared by the worker processes of a host, with one connection per thread.
+
+    Attributes:
+        path (str): The file path of the SQLite file, or None for a store without one.
+    """
+
+    def __init__(self, path: Optional[str]) -> None:
+        self.path = path
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        if self.path is not None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+
+    def _connection(self) -> sqlite3.Connection:
+        """
+        Returns the calling thread's connection to the file.
+        """
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+
+class SQLiteLRUStore(SQLiteStore):
+    """
+    A table of text values with TTL expiry and size-bounded LRU eviction.
+
+    Subclasses name the table, its key columns and its value column. `_read` and `_write` raise
+    sqlite3.Error; the subclasses decide how a failing store degrades.
+
+    Attributes:
+        ttl (float): Seconds after which an entry is considered stale.
+        max_bytes (int): Total UTF-8 size of the stored values above which the least recently used
+            entries are evicted.
+        evictions (int): Entries this process deleted because they expired or to make room.
+    """
+
+    TABLE: ClassVar[str]
+    KEY_COLUMNS: ClassVar[Tuple[str, ...]]
+    VALUE_COLUMN: ClassVar[str]
+
+    def __init__(self, path: str, ttl: float, max_bytes: int) -> None:
+        super().__init__(path)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.evictions = 0
+        self._where = " AND ".join(f"{column} = ?" for column in self.KEY_COLUMNS)
+
+        conn = self._connection()
+        key_columns = "".join(f"{column} TEXT NOT NULL,\n" for column in self.KEY_COLUMNS)
+        conn.execute(
+            f"""
+        CREATE TABLE IF NOT EXISTS {self.TABLE} (
+            {key_columns}{self.VALUE_COLUMN} TEXT NOT NULL,
+            bytes INTEGER NOT NULL,
+            created REAL NOT NULL,
+            accessed REAL NOT NULL,
+            PRIMARY KEY ({", ".join(self.KEY_COLUMNS)})
+        )
+        """
+        )
+        conn.execute(
+            f"CREATE INDEX IF NOT EXISTS {self.TABLE}_accessed ON {self.TABLE} (accessed)"
+        )
+        conn.commit()
+        self._bytes = self._total(conn)
+
+    def _total(self, conn: sqlite3.Connection) -> int:
+        return conn.execute(f"SELECT COALESCE(SUM(bytes), 0) FROM {self.TABLE}").fetchone()[0]
+
+    def _read(self, key: Tuple[str, ...]) -> Optional[str]:
+        """
+        Reads a value by its key and marks it as used; an expired value is deleted instead.
+
+        Raises:
+            sqlite3.Error: If the file cannot be read.
+        """
+        now = time.time()
+        conn = self._connection()
+        row = conn.execute(
+            f"SELECT {self.VALUE_COLUMN}, created, bytes FROM {self.TABLE} WHERE {self._where}", key
+        ).fetchone()
+        if row is None:
+            return None
+        if now - row[1] > self.ttl:
+            conn.execute(f"DELETE FROM {self.TABLE} WHERE {self._where}", key)
+            conn.commit()
+            with self._lock:
+                self._bytes -= row[2]
+            return None
+        conn.execute(f"UPDATE {self.TABLE} SET accessed = ? WHERE {self._where}", (now,) + key)
+        conn.commit()
+        return row[0]
+
+    def _write(self, key: Tuple[str, ...], value: str) -> None:
+        """
+        Stores a value, then evicts entries if the running total exceeds max_bytes.
+
+        Raises:
+            sqlite3.Error: If the file cannot be written.
+        """
+        size = len(value.encode("UTF-8"))
+        now = time.time()
+        conn = self._connection()
+        columns = self.KEY_COLUMNS + (self.VALUE_COLUMN, "bytes", "created", "accessed")
+        conn.execute(
+            f"""INSERT OR REPLACE INTO {self.TABLE} ({", ".join(columns)})
+            VALUES ({", ".join("?" * len(columns))})""",
+            key + (value, size, now, now),
+        )
+        conn.commit()
+        with self._lock:
+            # a replaced value is counted twice until the next eviction re-reads the total
+            self._bytes += size
+            full = self._bytes > self.max_bytes
+        if full:
+            self._evict(conn, now)
+
+    def _evict(self, conn: sqlite3.Connection, now: float) -> None:
+        """
+        Deletes expired entries, then the least recently used ones until the table fits EVICT_TO of
+        max_bytes.
+        """
+        evicted = conn.execute(
+            f"DELETE FROM {self.TABLE} WHERE created < ?", (now - self.ttl,)
+        ).rowcount
+        total = self._total(conn)
+        if total > self.max_bytes:
+            target = self.max_bytes * EVICT_TO
+            doomed = []
+            cursor = conn.execute(f"SELECT rowid, bytes FROM {self.TABLE} ORDER BY accessed ASC")
+            for rowid, size in cursor:
+                if total <= target:
+                    break
+                doomed.append((rowid,))
+                total -= size
+            cursor.close()
+            conn.executemany(f"DELETE FROM {self.TABLE} WHERE rowid = ?", doomed)
+            evicted += len(doomed)
+        if evicted:
+            self._evicted(conn)
+        conn.commit()
+        with self._lock:
+            self._bytes = total
+            self.evictions += evicted
+
+    def _evicted(self, conn: sqlite3.Connection) -> None:
+        """
+        Called in the transaction of an eviction that deleted entries, e.g. to delete data kept about them.
+        """
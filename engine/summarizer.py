@@ -11,19 +11,67 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 import functools
-from langchain.chains.llm import LLMChain
-from langchain.prompts import PromptTemplate
-from langchain.chains.combine_documents.stuff import StuffDocumentsChain
-from langchain.schema.document import Document
-from langchain.chat_models import ChatOpenAI
+from typing import AsyncIterator, Awaitable, Callable, Iterator, List, Optional, Tuple
+from async_lru import alru_cache
+
+from engine.context import (
+    amap_reduce_summary,
+    arun_llm,
+    astream_llm,
+    astream_map_reduce_summary,
+    count_tokens,
+    map_reduce_summary,
+    prompt_budget,
+    run_llm,
+    stream_llm,
+    stream_map_reduce_summary,
+)
+from engine.data_handler.aio import run_in_db_thread
+from engine.llm import MODEL_NAME
+from engine.embedding_cache import normalize_prompt
+from engine.metrics import instrument, lru_counts, register_cache
+from engine.singleflight import single_flight
+from engine.similiarty_retrieval import VectorDB
+from engine.summary_store import SummaryStore
+
+# bump whenever the summary prompts change so stored summaries made with the old ones are not served
+PROMPT_VERSION = "1"
+
+
+def _summary_template(hint: str) -> str:
+    """
+    Builds the summary prompt, including the hint if one is given.
+    """
+    if len(hint) > 0:
+        prompt_template = (
+            f"""Write a concise summary of the following content with respect to the following hint/question "{hint}":
+        """
+            + """"{text}"
+        CONCISE SUMMARY: """
+        )
+    else:
+        prompt_template = """Write a concise summary of the following, do not include any dash - or other unnecessary signs at the end:
+        "{text}"
+        CONCISE SUMMARY: """
+    return prompt_template
+
+
+def _fits(episode_text: str, prompt_template: str) -> bool:
+    return count_tokens(episode_text) <= prompt_budget(prompt_template.replace("{text}", ""))
+
 
 @functools.lru_cache(maxsize=512)
+@single_flight(
+    "make_summary", key=lambda episode_text, hint: (episode_text, normalize_prompt(hint))
+)
+@instrument("make_summary")
 def make_summary(episode_text: str, hint: str = "") -> str:
     """
     Generates a concise summary of a podcast episode text, optionally considering a hint or question.
 
     This function creates a prompt for a language model (LLM), which is then used to summarize the episode text.
     If a hint is provided, it's included in the prompt to guide the summary generation.
+    Texts that do not fit the model's context window are summarized with a parallel map-reduce instead.
 
     Args:
         episode_text (str): The text content of the podcast episode to be summarized.
@@ -32,28 +80,251 @@ def make_summary(episode_text: str, hint: str = "") -> str:
     Returns:
         str: The generated summary of the episode.
     """
-    if len(hint) > 0:
-        prompt_template = (
-            f"""Write a concise summary of the following content with respect to the following hint/question "{hint}":
-        """
-            + """"{text}"
-        CONCISE SUMMARY: """
+    prompt_template = _summary_template(hint)
+    if not _fits(episode_text, prompt_template):
+        return map_reduce_summary(episode_text, hint=hint)
+
+    summary = run_llm("make_summary", prompt_template, text=episode_text)
+    return summary
+
+
+@functools.lru_cache(maxsize=None)
+def get_summary_store() -> SummaryStore:
+    """
+    Returns the process-wide handle on the summary store shared by all workers.
+    """
+    return SummaryStore()
+
+
+def stream_summary(episode_text: str, hint: str = "") -> Iterator[str]:
+    """
+    Generates the same summary as make_summary, yielding its tokens as the model produces them.
+
+    For texts that need a map-reduce, only the final reduce call is streamed.
+
+    Args:
+        episode_text (str): The text content of the podcast episode to be summarized.
+        hint (str, optional): An optional hint or question to tailor the summary. Defaults to an empty string.
+
+    Yields:
+        str: The pieces of the summary, in order.
+    """
+    prompt_template = _summary_template(hint)
+    if not _fits(episode_text, prompt_template):
+        yield from stream_map_reduce_summary(episode_text, hint=hint)
+    else:
+        yield from stream_llm("make_summary", prompt_template, text=episode_text)
+
+
+def _stored_summary(
+    store: SummaryStore, episode_number, podcast_title: str, hint: str
+) -> Tuple[Optional[str], Optional[List[float]]]:
+    """
+    Looks up a summary for the exact hint, then for a semantically close one.
+
+    Returns:
+        Tuple[Optional[str], Optional[List[float]]]: The stored summary or None, and the hint embedding
+            if one was computed.
+    """
+    return store.lookup(
+        podcast_title,
+        episode_number,
+        hint,
+        MODEL_NAME,
+        PROMPT_VERSION,
+        embed=VectorDB.get_embeddings().embed_query,
+    )
+
+
+def _store_summary(
+    store: SummaryStore,
+    episode_number,
+    podcast_title: str,
+    hint: str,
+    summary: str,
+    vector: Optional[List[float]],
+) -> None:
+    store.put(podcast_title, episode_number, hint, MODEL_NAME, PROMPT_VERSION, summary)
+    if vector is not None:
+        store.put_hint_vector(
+            podcast_title, episode_number, hint, MODEL_NAME, PROMPT_VERSION, vector
         )
+
+
+def summarize_episode(
+    episode_number, podcast_title: str, hint: str, load_text: Callable[[], str]
+) -> str:
+    """
+    Returns the summary of an episode for a hint, reading through the shared summary store.
+
+    The episode text is only loaded, and the LLM only called, when the store has no fresh summary for
+    (podcast, episode number, normalized hint, model, prompt version) and no summary of the same episode
+    made for a semantically close hint. Hints are embedded with the cached query embeddings of VectorDB.
+
+    Args:
+        episode_number (Union[int, str]): The episode number.
+        podcast_title (str): The name of the podcast.
+        hint (str): The hint or question the summary should focus on.
+        load_text (Callable[[], str]): Returns the episode text on a miss.
+
+    Returns:
+        str: The summary of the episode.
+    """
+    store = get_summary_store()
+    summary, vector = _stored_summary(store, episode_number, podcast_title, hint)
+    if summary is not None:
+        return summary
+
+    summary = make_summary(episode_text=load_text(), hint=hint)
+    _store_summary(store, episode_number, podcast_title, hint, summary, vector)
+    return summary
+
+
+def stream_episode_summary(
+    episode_number, podcast_title: str, hint: str, load_text: Callable[[], str]
+) -> Iterator[str]:
+    """
+    Streams the summary of an episode for a hint, reading through the shared summary store.
+
+    A stored summary is yielded in one piece. Otherwise the summary is streamed from the LLM and, once
+    complete, written to the store so later streamed and non-streamed requests are served from it. A
+    stream abandoned by the client is not stored.
+
+    Args:
+        episode_number (Union[int, str]): The episode number.
+        podcast_title (str): The name of the podcast.
+        hint (str): The hint or question the summary should focus on.
+        load_text (Callable[[], str]): Returns the episode text on a miss.
+
+    Yields:
+        str: The pieces of the summary, in order.
+    """
+    store = get_summary_store()
+    summary, vector = _stored_summary(store, episode_number, podcast_title, hint)
+    if summary is not None:
+        yield summary
+        return
+
+    pieces = []
+    for piece in stream_summary(episode_text=load_text(), hint=hint):
+        pieces.append(piece)
+        yield piece
+    _store_summary(store, episode_number, podcast_title, hint, "".join(pieces), vector)
+
+
+@alru_cache(maxsize=512)
+@instrument("make_summary")
+async def amake_summary(episode_text: str, hint: str = "") -> str:
+    """
+    Async counterpart of make_summary.
+
+    Args:
+        episode_text (str): The text content of the podcast episode to be summarized.
+        hint (str, optional): An optional hint or question to tailor the summary. Defaults to an empty string.
+
+    Returns:
+        str: The generated summary of the episode.
+    """
+    prompt_template = _summary_template(hint)
+    if not _fits(episode_text, prompt_template):
+        return await amap_reduce_summary(episode_text, hint=hint)
+    return await arun_llm("make_summary", prompt_template, text=episode_text)
+
+
+async def astream_summary(episode_text: str, hint: str = "") -> AsyncIterator[str]:
+    """
+    Async counterpart of stream_summary.
+    """
+    prompt_template = _summary_template(hint)
+    if not _fits(episode_text, prompt_template):
+        pieces = astream_map_reduce_summary(episode_text, hint=hint)
     else:
-        prompt_template = """Write a concise summary of the following, do not include any dash - or other unnecessary signs at the end:
-        "{text}"
-        CONCISE SUMMARY: """
-    prompt = PromptTemplate.from_template(prompt_template)
+        pieces = astream_llm("make_summary", prompt_template, text=episode_text)
+    async for piece in pieces:
+        yield piece
 
-    # Define LLM chain
-    llm = ChatOpenAI(temperature=0, model_name="gpt-3.5-turbo-16k")
-    llm_chain = LLMChain(llm=llm, prompt=prompt)
 
-    # Define StuffDocumentsChain
-    stuff_chain = StuffDocumentsChain(
-        llm_chain=llm_chain, document_variable_name="text"
+async def _astored_summary(
+    store: SummaryStore, episode_number, podcast_title: str, hint: str
+) -> Tuple[Optional[str], Optional[List[float]]]:
+    """
+    Async counterpart of _stored_summary; the store is read on the database threads.
+    """
+    return await store.alookup(
+        podcast_title,
+        episode_number,
+        hint,
+        MODEL_NAME,
+        PROMPT_VERSION,
+        aembed=VectorDB.get_embeddings().aembed_query,
     )
 
-    docs = [Document(page_content=episode_text)]
-    summary = stuff_chain.run(docs)
+
+async def asummarize_episode(
+    episode_number, podcast_title: str, hint: str, load_text: Callable[[], Awaitable[str]]
+) -> str:
+    """
+    Async counterpart of summarize_episode.
+
+    Args:
+        episode_number (Union[int, str]): The episode number.
+        podcast_title (str): The name of the podcast.
+        hint (str): The hint or question the summary should focus on.
+        load_text (Callable[[], Awaitable[str]]): Returns the episode text on a miss.
+
+    Returns:
+        str: The summary of the episode.
+    """
+    store = get_summary_store()
+    summary, vector = await _astored_summary(store, episode_number, podcast_title, hint)
+    if summary is not None:
+        return summary
+
+    summary = await amake_summary(episode_text=await load_text(), hint=hint)
+    await run_in_db_thread(
+        _store_summary, store, episode_number, podcast_title, hint, summary, vector
+    )
     return summary
+
+
+async def astream_episode_summary(
+    episode_number, podcast_title: str, hint: str, load_text: Callable[[], Awaitable[str]]
+) -> AsyncIterator[str]:
+    """
+    Async counterpart of stream_episode_summary.
+
+    Args:
+        episode_number (Union[int, str]): The episode number.
+        podcast_title (str): The name of the podcast.
+        hint (str): The hint or question the summary should focus on.
+        load_text (Callable[[], Awaitable[str]]): Returns the episode text on a miss.
+
+    Yields:
+        str: The pieces of the summary, in order.
+    """
+    store = get_summary_store()
+    summary, vector = await _astored_summary(store, episode_number, podcast_title, hint)
+    if summary is not None:
+        yield summary
+        return
+
+    pieces = []
+    async for piece in astream_summary(episode_text=await load_text(), hint=hint):
+        pieces.append(piece)
+        yield piece
+    await run_in_db_thread(
+        _store_summary, store, episode_number, podcast_title, hint, "".join(pieces), vector
+    )
+
+
+def _summary_store_counts() -> Optional[Tuple[int, int]]:
+    # the store is not opened just to be scraped
+    if get_summary_store.cache_info().currsize == 0:
+        return None
+    stats = get_summary_store().stats()
+    return stats["hits"] + stats["semantic_hits"], stats["misses"]
+
+
+register_cache("make_summary", lru_counts(make_summary))
+register_cache("amake_summary", lru_counts(amake_summary))
+register_cache("summary_store", _summary_store_counts)
@@ -0,0 +1,368 @@
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+This module stores generated episode summaries in a SQLite file shared by every worker.
+
+Summaries are keyed by (podcast, episode number, normalized hint, model, prompt version), so they survive
+deploys and are reused across processes, while a model or prompt change naturally misses the old entries.
+Entries expire after a TTL and the least recently used ones are evicted once the stored summaries exceed
+a size limit.
+
+The store also keeps the embedding of every summarized hint, so a new hint that is semantically close to
+one already summarized for the same episode (e.g. "who is Camus?" and "tell me about Camus") can reuse its
+summary. The lookup is a single vectorized cosine scan over the few hints stored for that episode. Callers
+look summaries up with `lookup` (or `alookup`), which tries the exact hint, then the close ones, and
+counts the lookup once: as an exact hit, a semantic hit or a miss.
+
+Constants:
+- SUMMARY_STORE_PATH: The file path of the store, next to metadata.db (environment variable SUMMARY_STORE_PATH).
+- SUMMARY_TTL: Seconds a summary stays valid (environment variable SUMMARY_TTL).
+- SUMMARY_STORE_MAX_BYTES: Total size of stored summaries before eviction (environment variable
+  SUMMARY_STORE_MAX_BYTES).
+- SEMANTIC_HINT_THRESHOLD: Cosine similarity above which two hints share a summary (environment variable
+  SEMANTIC_HINT_THRESHOLD); values above 1 disable semantic reuse.
+
+Classes:
+- SummaryStore: The shared store with hit/miss counters.
+"""
+import os
+import sqlite3
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+import numpy as np
+from loguru import logger
+
+from engine.data_handler.aio import run_in_db_thread
+from engine.data_handler.get import DATA_BASE_PATH
+from engine.embedding_cache import normalize_prompt
+from engine.sqlite_store import SQLiteLRUStore
+
+
+SUMMARY_STORE_PATH = os.getenv(
+    "SUMMARY_STORE_PATH", os.path.join(os.path.dirname(DATA_BASE_PATH), "summaries.db")
+)
+SUMMARY_TTL = float(os.getenv("SUMMARY_TTL", str(30 * 24 * 3600)))
+SUMMARY_STORE_MAX_BYTES = int(os.getenv("SUMMARY_STORE_MAX_BYTES", str(64 * 1024 * 1024)))
+SEMANTIC_HINT_THRESHOLD = float(os.getenv("SEMANTIC_HINT_THRESHOLD", "0.95"))
+
+
+class SummaryStore(SQLiteLRUStore):
+    """
+    A persistent, size-bounded cache of episode summaries.
+
+    Attributes:
+        path (str): The file path of the SQLite store.
+        ttl (float): Seconds after which a summary is considered stale.
+        max_bytes (int): Total UTF-8 size of the stored summaries above which the least recently used
+            ones are evicted.
+    """
+
+    TABLE = "summaries"
+    KEY_COLUMNS = ("podcast", "number", "hint", "model", "prompt_version")
+    VALUE_COLUMN = "summary"
+
+    def __init__(
+        self,
+        path: str = SUMMARY_STORE_PATH,
+        ttl: float = SUMMARY_TTL,
+        max_bytes: int = SUMMARY_STORE_MAX_BYTES,
+    ) -> None:
+        super().__init__(path, ttl, max_bytes)
+        self.hits = 0
+        self.misses = 0
+        self.semantic_hits = 0
+
+        conn = self._connection()
+        conn.execute(
+            """
+        CREATE TABLE IF NOT EXISTS summary_hints (
+            podcast TEXT NOT NULL,
+            number TEXT NOT NULL,
+            hint TEXT NOT NULL,
+            model TEXT NOT NULL,
+            prompt_version TEXT NOT NULL,
+            vector BLOB NOT NULL,
+            PRIMARY KEY (podcast, number, hint, model, prompt_version)
+        )
+        """
+        )
+        conn.commit()
+
+    @staticmethod
+    def key(
+        podcast: str, number, hint: str, model: str, prompt_version: str
+    ) -> Tuple[str, str, str, str, str]:
+        """
+        Builds the primary key of a summary.
+
+        Returns:
+            Tuple[str, str, str, str, str]: (podcast, number, normalized hint, model, prompt version).
+        """
+        return (podcast, str(number), normalize_prompt(hint), model, prompt_version)
+
+    def get(
+        self, podcast: str, number, hint: str, model: str, prompt_version: str
+    ) -> Optional[str]:
+        """
+        Looks up a summary.
+
+        Args:
+            podcast (str): The podcast name.
+            number (Union[int, str]): The episode number.
+            hint (str): The hint/question the summary was made for; it is normalized before the lookup.
+            model (str): The model that generated the summary.
+            prompt_version (str): The version of the summary prompts.
+
+        Returns:
+            Optional[str]: The summary, or None if it is missing or expired.
+        """
+        summary = self._read_summary(self.key(podcast, number, hint, model, prompt_version))
+        self._count(summary)
+        return summary
+
+    def lookup(
+        self,
+        podcast: str,
+        number,
+        hint: str,
+        model: str,
+        prompt_version: str,
+        embed: Optional[Callable[[str], List[float]]] = None,
+        threshold: float = SEMANTIC_HINT_THRESHOLD,
+    ) -> Tuple[Optional[str], Optional[List[float]]]:
+        """
+        Looks up a summary for the exact hint, then for a semantically close one, and counts the lookup once.
+
+        A summary found for a close hint is also stored under this hint, so the next identical lookup is an
+        exact hit; the vector of this hint is not stored, so reuse never chains away from the hint the
+        summary was actually made for.
+
+        Args:
+            podcast (str): The podcast name.
+            number (Union[int, str]): The episode number.
+            hint (str): The hint/question the summary is for.
+            model (str): The model that generated the summary.
+            prompt_version (str): The version of the summary prompts.
+            embed (Callable[[str], List[float]], optional): Embeds the hint for the semantic match; it is only
+                called when the exact hint misses. Defaults to None, which only looks up the exact hint.
+            threshold (float, optional): Minimum cosine similarity. Defaults to SEMANTIC_HINT_THRESHOLD.
+
+        Returns:
+            Tuple[Optional[str], Optional[List[float]]]: The summary or None, and the hint embedding if one
+                was computed.
+        """
+        summary = self._read_summary(self.key(podcast, number, hint, model, prompt_version))
+        vector = None
+        semantic = False
+        if summary is None and embed is not None and len(hint.strip()) > 0:
+            vector = embed(hint)
+            summary = self.find_similar(podcast, number, model, prompt_version, vector, threshold)
+            if summary is not None:
+                semantic = True
+                self.put(podcast, number, hint, model, prompt_version, summary)
+        self._count(summary, semantic)
+        return summary, vector
+
+    async def alookup(
+        self,
+        podcast: str,
+        number,
+        hint: str,
+        model: str,
+        prompt_version: str,
+        aembed: Optional[Callable[[str], Awaitable[List[float]]]] = None,
+        threshold: float = SEMANTIC_HINT_THRESHOLD,
+    ) -> Tuple[Optional[str], Optional[List[float]]]:
+        """
+        Async counterpart of lookup: the store is read on the database threads and the hint is embedded
+        with an async embedding call.
+        """
+        summary = await run_in_db_thread(
+            self._read_summary, self.key(podcast, number, hint, model, prompt_version)
+        )
+        vector = None
+        semantic = False
+        if summary is None and aembed is not None and len(hint.strip()) > 0:
+            vector = await aembed(hint)
+            summary = await run_in_db_thread(
+                self.find_similar, podcast, number, model, prompt_version, vector, threshold
+            )
+            if summary is not None:
+                semantic = True
+                await run_in_db_thread(
+                    self.put, podcast, number, hint, model, prompt_version, summary
+                )
+        self._count(summary, semantic)
+        return summary, vector
+
+    def _read_summary(self, key: Tuple[str, ...]) -> Optional[str]:
+        """
+        Reads a summary by its key without counting the lookup; a failing store reads as a miss.
+        """
+        try:
+            return self._read(key)
+        except sqlite3.Error as e:
+            logger.warning("Summary store read failed: {error}", error=e)
+            return None
+
+    def _count(self, summary: Optional[str], semantic: bool = False) -> None:
+        with self._lock:
+            if summary is None:
+                self.misses += 1
+            elif semantic:
+                self.semantic_hits += 1
+            else:
+                self.hits += 1
+
+    def put(
+        self, podcast: str, number, hint: str, model: str, prompt_version: str, summary: str
+    ) -> None:
+        """
+        Stores a summary and evicts expired and least recently used entries if needed.
+
+        Args:
+            podcast (str): The podcast name.
+            number (Union[int, str]): The episode number.
+            hint (str): The hint/question the summary was made for.
+            model (str): The model that generated the summary.
+            prompt_version (str): The version of the summary prompts.
+            summary (str): The summary text.
+        """
+        try:
+            self._write(self.key(podcast, number, hint, model, prompt_version), summary)
+        except sqlite3.Error as e:
+            logger.warning("Summary store write failed: {error}", error=e)
+
+    def _evicted(self, conn: sqlite3.Connection) -> None:
+        """
+        Deletes the hint embeddings of evicted summaries.
+        """
+        conn.execute(
+            """DELETE FROM summary_hints WHERE NOT EXISTS (
+                SELECT 1 FROM summaries s
+                WHERE s.podcast = summary_hints.podcast AND s.number = summary_hints.number
+                AND s.hint = summary_hints.hint AND s.model = summary_hints.model
+                AND s.prompt_version = summary_hints.prompt_version
+            )"""
+        )
+
+    def put_hint_vector(
+        self,
+        podcast: str,
+        number,
+        hint: str,
+        model: str,
+        prompt_version: str,
+        vector: List[float],
+    ) -> None:
+        """
+        Stores the embedding of a summarized hint for semantic lookups.
+
+        Args:
+            podcast (str): The podcast name.
+            number (Union[int, str]): The episode number.
+            hint (str): The hint the summary was made for.
+            model (str): The model that generated the summary.
+            prompt_version (str): The version of the summary prompts.
+            vector (List[float]): The embedding of the hint.
+        """
+        key = self.key(podcast, number, hint, model, prompt_version)
+        try:
+            conn = self._connection()
+            conn.execute(
+                """INSERT OR REPLACE INTO summary_hints
+                (podcast, number, hint, model, prompt_version, vector) VALUES (?, ?, ?, ?, ?, ?)""",
+                key + (np.asarray(vector, dtype=np.float32).tobytes(),),
+            )
+            conn.commit()
+        except sqlite3.Error as e:
+            logger.warning("Summary store write failed: {error}", error=e)
+
+    def find_similar(
+        self,
+        podcast: str,
+        number,
+        model: str,
+        prompt_version: str,
+        vector: List[float],
+        threshold: float = SEMANTIC_HINT_THRESHOLD,
+    ) -> Optional[str]:
+        """
+        Finds a stored summary of the same episode made for a hint semantically close to the given one.
+
+        The lookup is not counted; lookup() counts it.
+
+        Args:
+            podcast (str): The podcast name.
+            number (Union[int, str]): The episode number.
+            model (str): The model that generated the summary.
+            prompt_version (str): The version of the summary prompts.
+            vector (List[float]): The embedding of the new hint.
+            threshold (float, optional): Minimum cosine similarity. Defaults to SEMANTIC_HINT_THRESHOLD.
+
+        Returns:
+            Optional[str]: The summary of the closest hint above the threshold, or None.
+        """
+        if threshold > 1:
+            return None
+        try:
+            rows = (
+                self._connection()
+                .execute(
+                    """SELECT hint, vector FROM summary_hints
+                    WHERE podcast = ? AND number = ? AND model = ? AND prompt_version = ?""",
+                    (podcast, str(number), model, prompt_version),
+                )
+                .fetchall()
+            )
+        except sqlite3.Error as e:
+            logger.warning("Summary store read failed: {error}", error=e)
+            return None
+        if len(rows) == 0:
+            return None
+
+        query = np.asarray(vector, dtype=np.float32)
+        matrix = np.stack([np.frombuffer(row[1], dtype=np.float32) for row in rows])
+        similarities = (matrix @ query) / np.maximum(
+            np.linalg.norm(matrix, axis=1) * np.linalg.norm(query), 1e-12
+        )
+        best = int(np.argmax(similarities))
+        if similarities[best] < threshold:
+            return None
+
+        summary = self._read_summary(self.key(podcast, number, rows[best][0], model, prompt_version))
+        if summary is not None:
+            logger.info(
+                "Reusing summary of hint {hint} (cosine {similarity:.3f})",
+                hint=rows[best][0],
+                similarity=float(similarities[best]),
+            )
+        return summary
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Returns the hit/miss counters of the store.
+
+        Returns:
+            Dict[str, float]: hits, misses, semantic_hits, evictions and the hit_rate, the share of lookups
+                answered by an exact hit. Every lookup counts once, as an exact hit, a semantic hit or a miss.
+        """
+        with self._lock:
+            total = self.hits + self.misses + self.semantic_hits
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "semantic_hits": self.semantic_hits,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
@@ -12,10 +12,11 @@
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
 from typing import List, Tuple
+import numpy as np
 from loguru import logger
 
 
-from engine.data_handler.get import get_summary
+from engine.data_handler.get import get_episodes_bulk
 
 
 def extract_episode_from_docs(docs) -> List[Tuple[str, str]]:
@@ -48,13 +49,69 @@ def extract_episode_from_docs(docs) -> List[Tuple[str, str]]:
     return ls
 
 
+def aggregate_episode_scores(
+    docs, threshold: float, method: str = "max"
+) -> List[Tuple[Tuple[str, str], float]]:
+    """
+    Groups scored chunks by episode and ranks the episodes by an aggregated relevance.
+
+    Chunk distances are turned into relevances (threshold - distance, so only chunks under the
+    threshold count) and reduced per episode with a vectorized group-by.
+
+    Args:
+        docs (List[Tuple[Document, float]]): Chunks and their distances, sorted by ascending distance.
+        threshold (float): Chunks with a distance at or above this value are ignored.
+        method (str, optional): "max" keeps the best chunk of each episode, "sum" adds up the relevances
+            of all its chunks, "rrf" adds up the reciprocal ranks (1 / (60 + rank)). Defaults to "max".
+
+    Returns:
+        List[Tuple[Tuple[str, str], float]]: ((episode number, podcast title), score) pairs, best first.
+    """
+    keys = []
+    distances = []
+    for doc, distance in docs:
+        if distance >= threshold:
+            continue
+        try:
+            keys.append((str(doc.metadata["epi_num"]), doc.metadata["podcast"]))
+        except KeyError:
+            logger.warning(doc.metadata)
+            continue
+        distances.append(distance)
+
+    if len(keys) == 0:
+        return []
+
+    episodes = list(dict.fromkeys(keys))
+    index = {key: i for i, key in enumerate(episodes)}
+    groups = np.fromiter((index[key] for key in keys), dtype=np.int64, count=len(keys))
+    relevance = threshold - np.asarray(distances, dtype=np.float64)
+
+    if method == "max":
+        scores = np.full(len(episodes), -np.inf)
+        np.maximum.at(scores, groups, relevance)
+    elif method == "sum":
+        scores = np.zeros(len(episodes))
+        np.add.at(scores, groups, relevance)
+    elif method == "rrf":
+        ranks = np.argsort(np.argsort(-relevance, kind="stable"), kind="stable")
+        scores = np.zeros(len(episodes))
+        np.add.at(scores, groups, 1.0 / (60.0 + ranks + 1))
+    else:
+        raise ValueError(f"Unknown aggregation method: {method}")
+
+    # stable sort keeps the order of first appearance between ties
+    order = np.argsort(-scores, kind="stable")
+    return [(episodes[i], float(scores[i])) for i in order]
+
+
 def attach_summaries(
     episodes: List[Tuple[int, str]], exclude_episodes: List[Tuple[int, str]] = None
 ) -> List[Tuple[Tuple[int, str], str]]:
     """
     Attaches summaries to the provided list of episodes, excluding specified episodes.
 
-    This function queries for summaries of the given episodes and returns a list where each element is a tuple.
+    This function queries for summaries of the given episodes in one round-trip and returns a list where each element is a tuple.
     The tuple consists of the episode information and its summary. Episodes in the exclude list won't have summaries.
 
     Args:
@@ -66,9 +123,20 @@ def attach_summaries(
     """
     exclude_episodes = [] if exclude_episodes is None else exclude_episodes
 
+    summaries = get_episodes_bulk(
+        [epi for epi in episodes if epi[0] not in exclude_episodes], columns=("Summary",)
+    )
+
+    def _summary(epi_num, pod_name):
+        row = summaries.get((str(epi_num), pod_name.value))
+        if row is None:
+            logger.warning(f"Summary not found: {epi_num}, {pod_name}")
+            return [("summary didn't exists!",)]
+        return [(row["Summary"],)]
+
     return [
         (
-            ((epi_num, pod_name), get_summary(ep_num=epi_num, podcast_name=pod_name))
+            ((epi_num, pod_name), _summary(epi_num, pod_name))
             if epi_num not in exclude_episodes
             else (epi_num, "")
         )
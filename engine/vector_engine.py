@@ -0,0 +1,209 @@
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+This module provides an exact, brute-force vector search over a memory-mapped embedding matrix.
+
+The corpus holds a few thousand chunks, so a single matrix-vector product answers a query faster than
+an approximate index and returns exact neighbours. The index is an export of the Chroma collection:
+
+- embeddings.npy: a contiguous float32 matrix with one row per chunk, memory-mapped at load time.
+- meta.npz: the chunk ids, episode numbers and podcast names as arrays aligned with the matrix rows.
+- documents.json: the chunk texts, full metadata dictionaries and the distance space of the collection.
+
+Classes:
+- NumpyVectorIndex: Loads an exported index and answers similarity searches like Chroma does.
+
+Functions:
+- export_chroma: Dumps a Chroma collection into the files above.
+"""
+import json
+import os
+from typing import Any, Dict, List, Tuple
+import numpy as np
+from langchain.schema.document import Document
+from loguru import logger
+
+
+EMBEDDINGS_FILE = "embeddings.npy"
+META_FILE = "meta.npz"
+DOCUMENTS_FILE = "documents.json"
+
+
+def export_chroma(db: Any, path: str) -> int:
+    """
+    Exports a Chroma vector store into a NumpyVectorIndex directory.
+
+    Args:
+        db (Chroma): The LangChain Chroma vector store to export.
+        path (str): The output directory; it is created if needed.
+
+    Returns:
+        int: The number of exported chunks.
+    """
+    collection = db._collection
+    data = collection.get(include=["embeddings", "metadatas", "documents"])
+    space = (collection.metadata or {}).get("hnsw:space", "l2")
+
+    os.makedirs(path, exist_ok=True)
+    matrix = np.ascontiguousarray(np.asarray(data["embeddings"], dtype=np.float32))
+    np.save(os.path.join(path, EMBEDDINGS_FILE), matrix)
+
+    metadatas = data["metadatas"]
+    np.savez(
+        os.path.join(path, META_FILE),
+        ids=np.asarray(data["ids"], dtype=str),
+        epi_num=np.asarray([str(m.get("epi_num", "")) for m in metadatas], dtype=str),
+        podcast=np.asarray([str(m.get("podcast", "")) for m in metadatas], dtype=str),
+    )
+    with open(os.path.join(path, DOCUMENTS_FILE), "w", encoding="UTF-8") as f:
+        json.dump(
+            {"space": space, "documents": data["documents"], "metadatas": metadatas}, f
+        )
+
+    logger.info(
+        "Exported {n} chunks ({space}) to {path}", n=len(matrix), space=space, path=path
+    )
+    return len(matrix)
+
+
+class NumpyVectorIndex:
+    """
+    An exact nearest-neighbour index over a memory-mapped float32 matrix.
+
+    Distances follow the space of the exported Chroma collection so scores stay comparable with
+    LEAST_ACCEPTED_SIMILARITY: squared L2 for "l2", 1 - dot product for "ip" and 1 - cosine similarity
+    for "cosine".
+
+    Attributes:
+        embeddings (np.ndarray): The (n_chunks, dim) float32 matrix, memory-mapped read-only.
+        ids (np.ndarray): Chunk ids aligned with the matrix rows.
+        epi_num (np.ndarray): Episode numbers, as strings, aligned with the matrix rows.
+        podcast (np.ndarray): Podcast names aligned with the matrix rows.
+        space (str): The distance space, one of "l2", "ip" or "cosine".
+    """
+
+    def __init__(
+        self,
+        embeddings: np.ndarray,
+        ids: np.ndarray,
+        epi_num: np.ndarray,
+        podcast: np.ndarray,
+        documents: List[str],
+        metadatas: List[Dict],
+        space: str = "l2",
+    ) -> None:
+        if space not in ("l2", "ip", "cosine"):
+            raise ValueError(f"Unsupported distance space: {space}")
+        self.embeddings = embeddings
+        self.ids = ids
+        self.epi_num = epi_num
+        self.podcast = podcast
+        self.space = space
+        self._documents = documents
+        self._metadatas = metadatas
+        self._norms = np.linalg.norm(embeddings, axis=1).astype(np.float32)
+
+    @classmethod
+    def load(cls, path: str) -> "NumpyVectorIndex":
+        """
+        Loads an exported index, memory-mapping the embedding matrix.
+
+        Args:
+            path (str): The directory written by export_chroma.
+
+        Returns:
+            NumpyVectorIndex: The loaded index.
+        """
+        embeddings = np.load(os.path.join(path, EMBEDDINGS_FILE), mmap_mode="r")
+        with np.load(os.path.join(path, META_FILE)) as meta:
+            ids, epi_num, podcast = meta["ids"], meta["epi_num"], meta["podcast"]
+        with open(os.path.join(path, DOCUMENTS_FILE), encoding="UTF-8") as f:
+            documents = json.load(f)
+        return cls(
+            embeddings,
+            ids,
+            epi_num,
+            podcast,
+            documents["documents"],
+            documents["metadatas"],
+            space=documents.get("space", "l2"),
+        )
+
+    def __len__(self) -> int:
+        return self.embeddings.shape[0]
+
+    def distances(self, embeddings: np.ndarray) -> np.ndarray:
+        """
+        Computes the distance of one or more query vectors to every chunk.
+
+        Args:
+            embeddings (np.ndarray): A (dim,) query vector or a (n_queries, dim) matrix.
+
+        Returns:
+            np.ndarray: A (n_chunks,) or (n_queries, n_chunks) float32 array of distances.
+        """
+        queries = np.asarray(embeddings, dtype=np.float32)
+        dots = queries @ self.embeddings.T
+        if self.space == "ip":
+            return 1.0 - dots
+        if self.space == "cosine":
+            q_norms = np.linalg.norm(queries, axis=-1, keepdims=True)
+            return 1.0 - dots / np.maximum(q_norms * self._norms, 1e-12)
+        q_sq = np.sum(queries * queries, axis=-1, keepdims=True)
+        return np.maximum(q_sq + self._norms**2 - 2.0 * dots, 0.0)
+
+    def top_k(self, embedding: List[float], k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Finds the k nearest chunks to a query vector.
+
+        Args:
+            embedding (List[float]): The query vector.
+            k (int): The number of chunks to return.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: Row indices and distances, sorted by ascending distance.
+        """
+        distances = self.distances(embedding)
+        k = min(k, len(distances))
+        if k <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        rows = np.argpartition(distances, k - 1)[:k]
+        rows = rows[np.argsort(distances[rows], kind="stable")]
+        return rows, distances[rows]
+
+    def similarity_search_by_vector_with_relevance_scores(
+        self, embedding: List[float], k: int = 4
+    ) -> List[Tuple[Document, float]]:
+        """
+        Returns the k chunks closest to the embedding, with their distances.
+
+        Mirrors `Chroma.similarity_search_by_vector_with_relevance_scores`: lower scores mean more similar.
+
+        Args:
+            embedding (List[float]): The query vector.
+            k (int, optional): The number of chunks to return. Defaults to 4.
+
+        Returns:
+            List[Tuple[Document, float]]: The closest chunks and their distances.
+        """
+        rows, distances = self.top_k(embedding, k)
+        return [
+            (
+                Document(
+                    page_content=self._documents[row], metadata=dict(self._metadatas[row])
+                ),
+                float(distance),
+            )
+            for row, distance in zip(rows.tolist(), distances.tolist())
+        ]
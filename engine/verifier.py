@@ -0,0 +1,247 @@
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+This module verifies the relevance of candidate episodes concurrently.
+
+Every candidate is checked with an LLM call; the calls run on a bounded thread pool shared by all
+requests, with a per-request concurrency cap and a per-call timeout, so verifying TOP_K episodes takes
+about as long as a single call. The async server awaits the same checks as coroutines instead.
+
+Constants:
+- VERIFY_MAX_WORKERS: Threads of the shared pool (environment variable VERIFY_MAX_WORKERS).
+- VERIFY_CONCURRENCY: Checks one request may run at the same time (environment variable VERIFY_CONCURRENCY).
+- VERIFY_TIMEOUT: Seconds a single check may take (environment variable VERIFY_TIMEOUT).
+- VERIFY_FAIL_OPEN: Whether episodes whose check failed or timed out are kept (environment variable
+  VERIFY_FAIL_OPEN).
+
+Classes:
+- RelevanceVerifier: Runs a relevance check over candidate episodes and keeps the verified ones.
+"""
+import asyncio
+import contextvars
+import math
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+from loguru import logger
+
+
+VERIFY_MAX_WORKERS = int(os.getenv("VERIFY_MAX_WORKERS", "16"))
+VERIFY_CONCURRENCY = int(os.getenv("VERIFY_CONCURRENCY", "6"))
+VERIFY_TIMEOUT = float(os.getenv("VERIFY_TIMEOUT", "30"))
+VERIFY_FAIL_OPEN = os.getenv("VERIFY_FAIL_OPEN", "1") == "1"
+
+
+class RelevanceVerifier:
+    """
+    Checks candidate episodes against a prompt concurrently.
+
+    Attributes:
+        check (Callable[[Any, str], bool]): The relevance check, called as check(episode, prompt).
+        acheck (Callable[[Any, str], Awaitable[bool]]): The async relevance check used by averify, if any.
+        max_concurrency (int): Maximum number of checks in flight for a single verify() call. Checks that
+            timed out count until their call actually returns, so later checks may wait for them.
+        timeout (float): Seconds after which a check is abandoned. verify() as a whole gives up after
+            `timeout` seconds per round of max_concurrency checks; the episodes it did not get to are
+            treated like failed checks.
+        fail_open (bool): Whether an episode whose check raised or timed out is kept. The checks filter
+            candidates that already passed the similarity threshold, so by default a broken check does
+            not empty the results.
+    """
+
+    def __init__(
+        self,
+        check: Callable[[Any, str], bool],
+        max_workers: int = VERIFY_MAX_WORKERS,
+        max_concurrency: int = VERIFY_CONCURRENCY,
+        timeout: float = VERIFY_TIMEOUT,
+        fail_open: bool = VERIFY_FAIL_OPEN,
+        acheck: Optional[Callable[[Any, str], Awaitable[bool]]] = None,
+    ) -> None:
+        self.check = check
+        self.acheck = acheck
+        self.max_concurrency = max(1, max_concurrency)
+        self.timeout = timeout
+        self.fail_open = fail_open
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="verifier"
+        )
+
+    def verify(self, episodes: List, prompt: str) -> List:
+        """
+        Runs the relevance check on every episode and returns the verified ones.
+
+        Args:
+            episodes (List): The candidate episodes, best first.
+            prompt (str): The question the episodes should answer.
+
+        Returns:
+            List: The verified episodes, in their original order.
+        """
+        return self.verify_with_status(episodes, prompt)[0]
+
+    def verify_with_status(self, episodes: List, prompt: str) -> Tuple[List, bool]:
+        """
+        Like verify(), and also tells whether any check failed or timed out.
+
+        The verdicts of failed checks are guesses (see fail_open), so such results should not be cached
+        for long.
+
+        Returns:
+            Tuple[List, bool]: The verified episodes, and whether any check failed or timed out.
+        """
+        degraded = False
+        verdicts: Dict[int, bool] = {}
+        pending: Dict[Future, int] = {}
+        deadlines: Dict[Future, float] = {}
+        # checks that timed out but are still running; they keep counting against the cap
+        abandoned: Set[Future] = set()
+        queue = list(enumerate(episodes))
+        # hung checks holding every slot must not stall the request
+        deadline = time.monotonic() + self.timeout * math.ceil(len(episodes) / self.max_concurrency)
+
+        def _submit() -> None:
+            abandoned.difference_update([f for f in abandoned if f.done()])
+            while queue and len(pending) + len(abandoned) < self.max_concurrency:
+                i, episode = queue.pop(0)
+                # a copy of the caller's context carries the request's stage timings into the thread
+                future = self._executor.submit(
+                    contextvars.copy_context().run, self.check, episode, prompt
+                )
+                pending[future] = i
+                deadlines[future] = time.monotonic() + self.timeout
+
+        _submit()
+        while pending or queue:
+            # with every slot held by abandoned checks, wait for one of them to finish, or the deadline
+            wait_until = min([deadline, *deadlines.values()])
+            done, _ = wait(
+                list(pending) + list(abandoned),
+                timeout=max(0.0, wait_until - time.monotonic()),
+                return_when=FIRST_COMPLETED,
+            )
+
+            for future in done:
+                if future not in pending:
+                    continue
+                i = pending.pop(future)
+                deadlines.pop(future)
+                try:
+                    verdicts[i] = bool(future.result())
+                except Exception as e:
+                    logger.warning(
+                        "Relevance check failed for {episode}: {error}",
+                        episode=episodes[i],
+                        error=e,
+                    )
+                    verdicts[i] = self.fail_open
+                    degraded = True
+
+            now = time.monotonic()
+            expired = now >= deadline
+            for future in [f for f, due in deadlines.items() if expired or due <= now]:
+                i = pending.pop(future)
+                deadlines.pop(future)
+                # a running call cannot be interrupted; its result is ignored when it finishes
+                if not future.cancel():
+                    abandoned.add(future)
+                logger.warning(
+                    "Relevance check timed out after {timeout}s for {episode}",
+                    timeout=self.timeout,
+                    episode=episodes[i],
+                )
+                verdicts[i] = self.fail_open
+                degraded = True
+
+            if expired and queue:
+                logger.warning(
+                    "Relevance checks ran out of time; {count} episodes were not checked",
+                    count=len(queue),
+                )
+                for i, _ in queue:
+                    verdicts[i] = self.fail_open
+                queue.clear()
+                degraded = True
+
+            _submit()
+
+        return [episode for i, episode in enumerate(episodes) if verdicts.get(i)], degraded
+
+    async def averify(self, episodes: List, prompt: str) -> List:
+        """
+        Awaits the async relevance check on every episode and returns the verified ones.
+
+        The concurrency cap, timeout and fail-open policy are the same as for verify().
+
+        Args:
+            episodes (List): The candidate episodes, best first.
+            prompt (str): The question the episodes should answer.
+
+        Returns:
+            List: The verified episodes, in their original order.
+
+        Raises:
+            ValueError: If the verifier has no async check.
+        """
+        return (await self.averify_with_status(episodes, prompt))[0]
+
+    async def averify_with_status(self, episodes: List, prompt: str) -> Tuple[List, bool]:
+        """
+        Like averify(), and also tells whether any check failed or timed out.
+
+        Returns:
+            Tuple[List, bool]: The verified episodes, and whether any check failed or timed out.
+
+        Raises:
+            ValueError: If the verifier has no async check.
+        """
+        if self.acheck is None:
+            raise ValueError("RelevanceVerifier has no async check")
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def _verdict(episode) -> Optional[bool]:
+            # None marks a check that failed or timed out
+            async with semaphore:
+                try:
+                    return bool(
+                        await asyncio.wait_for(self.acheck(episode, prompt), self.timeout)
+                    )
+                except asyncio.TimeoutError:
+                    logger.warning(
+                        "Relevance check timed out after {timeout}s for {episode}",
+                        timeout=self.timeout,
+                        episode=episode,
+                    )
+                except Exception as e:
+                    logger.warning(
+                        "Relevance check failed for {episode}: {error}",
+                        episode=episode,
+                        error=e,
+                    )
+                return None
+
+        verdicts = await asyncio.gather(*(_verdict(episode) for episode in episodes))
+        verified = [
+            episode
+            for episode, verdict in zip(episodes, verdicts)
+            if (self.fail_open if verdict is None else verdict)
+        ]
+        return verified, None in verdicts
+
+    def shutdown(self) -> None:
+        """
+        Stops the shared thread pool.
+        """
+        self._executor.shutdown(wait=False, cancel_futures=True)
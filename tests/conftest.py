@@ -0,0 +1,71 @@
+import sqlite3
+import pytest
+
+import engine.data_handler.get as get
+from engine.constants import Podcast
+
+
+EPISODES = [
+    (str(i), f"Episode {i}", f"text {i}", f"summary {i}", f"https://example.com/{i}")
+    for i in range(1, 11)
+]
+
+
+@pytest.fixture
+def database(tmp_path, monkeypatch):
+    path = str(tmp_path / "metadata.db")
+    conn = sqlite3.connect(path)
+    conn.execute(
+        """
+    CREATE TABLE merged_data (
+        Number TEXT NOT NULL,
+        Title TEXT NOT NULL,
+        Text TEXT,
+        Summary TEXT,
+        URL TEXT,
+        Podcast_Name TEXT,
+        PRIMARY KEY (Number, Title)
+    )
+    """
+    )
+    conn.executemany(
+        "INSERT INTO merged_data VALUES (?, ?, ?, ?, ?, ?)",
+        [row + (Podcast.PHILOSOPHIZE_THIS.value,) for row in EPISODES],
+    )
+    conn.commit()
+    conn.close()
+
+    monkeypatch.setattr(get, "DATA_BASE_PATH", path)
+    yield path
+    get.DataBase.close()
+
+
+@pytest.fixture
+def stub_llm():
+    import engine.similiarty_retrieval as retrieval
+    import engine.summarizer as summarizer
+    from engine.llm import ChatLLM
+    from tests.fakes import StubLLM
+
+    llm = StubLLM()
+    ChatLLM.set_llm(llm)
+    retrieval.is_related.cache_clear()
+    summarizer.make_summary.cache_clear()
+    yield llm
+    ChatLLM.set_llm(None)
+    retrieval.is_related.cache_clear()
+    summarizer.make_summary.cache_clear()
+
+
+@pytest.fixture(autouse=True)
+def result_cache(tmp_path, monkeypatch):
+    import engine.similiarty_retrieval as retrieval
+    from engine.result_cache import SQLiteResultCache
+
+    cache = SQLiteResultCache(str(tmp_path / "results.db"))
+    monkeypatch.setattr(retrieval, "get_result_cache", lambda: cache)
+    retrieval._recent_results.clear()
+    retrieval._arecent_results.clear()
+    yield cache
+    retrieval._recent_results.clear()
+    retrieval._arecent_results.clear()
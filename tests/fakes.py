@@ -0,0 +1,110 @@
+import asyncio
+import re
+import time
+import zlib
+from typing import Any, AsyncIterator, Iterator, List, Optional
+
+from langchain.llms.base import LLM
+from langchain.schema.embeddings import Embeddings
+from langchain.schema.output import GenerationChunk
+
+
+class StubLLM(LLM):
+    """
+    A local LLM answering "Yes" when the prompt contains one of `related` and "No" otherwise,
+    after `delay` seconds. Every prompt it receives is kept in `prompts`. Async calls await the delay
+    instead of sleeping in a thread.
+    """
+
+    related: List[str] = []
+    delay: float = 0.0
+    calls: int = 0
+    prompts: List[str] = []
+
+    @property
+    def _llm_type(self) -> str:
+        return "stub"
+
+    def _answer(self, prompt: str) -> str:
+        self.calls += 1
+        self.prompts.append(prompt)
+        if any(marker in prompt for marker in self.related):
+            return "Yes"
+        return "No"
+
+    def _call(self, prompt: str, stop: Optional[List[str]] = None, **kwargs: Any) -> str:
+        time.sleep(self.delay)
+        return self._answer(prompt)
+
+    async def _acall(
+        self, prompt: str, stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs: Any
+    ) -> str:
+        await asyncio.sleep(self.delay)
+        return self._answer(prompt)
+
+
+class StreamingStubLLM(LLM):
+    """
+    A local LLM answering `answer` word by word, waiting `first_token_delay` seconds before the first
+    word and `token_delay` seconds before each following one. `streamed` counts the streamed calls.
+    """
+
+    answer: str = "a streamed summary of the episode"
+    first_token_delay: float = 0.0
+    token_delay: float = 0.0
+    calls: int = 0
+    streamed: int = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return "streaming-stub"
+
+    def _tokens(self) -> List[str]:
+        words = self.answer.split(" ")
+        return [words[0]] + [" " + word for word in words[1:]]
+
+    def _call(self, prompt: str, stop: Optional[List[str]] = None, **kwargs: Any) -> str:
+        self.calls += 1
+        return self.answer
+
+    def _stream(
+        self, prompt: str, stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs: Any
+    ) -> Iterator[GenerationChunk]:
+        self.calls += 1
+        self.streamed += 1
+        time.sleep(self.first_token_delay)
+        for i, token in enumerate(self._tokens()):
+            if i > 0:
+                time.sleep(self.token_delay)
+            yield GenerationChunk(text=token)
+
+    async def _astream(
+        self, prompt: str, stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs: Any
+    ) -> AsyncIterator[GenerationChunk]:
+        self.calls += 1
+        self.streamed += 1
+        await asyncio.sleep(self.first_token_delay)
+        for i, token in enumerate(self._tokens()):
+            if i > 0:
+                await asyncio.sleep(self.token_delay)
+            yield GenerationChunk(text=token)
+
+
+class BagOfWordsEmbeddings(Embeddings):
+    """
+    Local embeddings counting hashed words, so texts sharing most words have a high cosine similarity.
+    """
+
+    def __init__(self, dim: int = 64) -> None:
+        self.dim = dim
+        self.calls = 0
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self.embed_query(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        self.calls += 1
+        vector = [0.0] * self.dim
+        for word in re.findall(r"\w+", text.lower()):
+            vector[zlib.crc32(word.encode()) % self.dim] += 1.0
+        return vector
@@ -0,0 +1,181 @@
+import gzip
+import json
+import time
+
+import pytest
+
+import engine.summarizer as summarizer
+from engine.llm import ChatLLM
+from engine.similiarty_retrieval import VectorDB
+from engine.summary_store import SummaryStore
+from tests.fakes import BagOfWordsEmbeddings, StreamingStubLLM, StubLLM
+
+
+@pytest.fixture
+def client(database, tmp_path, monkeypatch):
+    import app.server.app as server
+
+    store = SummaryStore(str(tmp_path / "summaries.db"))
+    monkeypatch.setattr(summarizer, "get_summary_store", lambda: store)
+    monkeypatch.setattr(VectorDB, "_embeddings", BagOfWordsEmbeddings())
+    llm = StubLLM()
+    ChatLLM.set_llm(llm)
+    summarizer.make_summary.cache_clear()
+    server.app.config["TESTING"] = True
+    with server.app.test_client() as client:
+        client.llm = llm
+        yield client
+    ChatLLM.set_llm(None)
+    summarizer.make_summary.cache_clear()
+
+
+def test_make_summary_reads_through_store(client):
+    payload = {"epi_num": 3, "question": "who%20is%20camus%3F", "podcast_title": "Philosophize This"}
+
+    first = client.post("/make_summary", json=payload).get_json()["results"]
+    second = client.post("/make_summary", json=payload).get_json()["results"]
+
+    assert first == second
+    assert first["episode_number"] == "3"
+    assert first["episode_title"] == "Episode 3"
+    assert client.llm.calls == 1
+    assert "who is camus?" in client.llm.prompts[0]
+
+
+def _events(body: str):
+    events = []
+    for block in body.strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.split("\n"))
+        events.append((fields.get("event", "message"), json.loads(fields["data"])))
+    return events
+
+
+def test_make_summary_stream_forwards_tokens_and_stores_summary(client):
+    llm = StreamingStubLLM(first_token_delay=0.2, token_delay=0.05)
+    ChatLLM.set_llm(llm)
+    payload = {"epi_num": 3, "question": "camus", "podcast_title": "Philosophize This"}
+
+    start = time.monotonic()
+    response = client.post("/make_summary/stream", json=payload, buffered=False)
+    assert response.mimetype == "text/event-stream"
+    chunks = response.iter_encoded()
+    first = next(chunks).decode()
+    assert '"episode_title": "Episode 3"' in first
+    first += next(chunks).decode()
+    first_token = time.monotonic() - start
+    body = first + "".join(chunk.decode() for chunk in chunks)
+    total = time.monotonic() - start
+
+    events = _events(body)
+    assert events[0][0] == "meta"
+    tokens = [data["token"] for event, data in events if event == "message"]
+    assert tokens == llm._tokens()
+    assert events[-1] == ("done", {"episode_summary": llm.answer})
+    assert first_token < total - 0.1
+
+    # the completed summary is served from the store, also to the non-streaming route
+    summary = client.post("/make_summary", json=payload).get_json()["results"]
+    assert summary["episode_summary"] == llm.answer
+    again = _events(client.post("/make_summary/stream", json=payload).get_data(as_text=True))
+    assert [data for event, data in again if event == "message"] == [{"token": llm.answer}]
+    assert llm.streamed == 1
+
+
+def test_search_projects_fields_and_compresses(client, monkeypatch):
+    import app.server.app as server
+
+    searches = []
+
+    def _find_episodes(prompt, fields=None):
+        searches.append(fields)
+        return [{"episode_number": str(i), "episode_title": f"Episode {i}" * 20} for i in range(50)]
+
+    monkeypatch.setattr(server, "find_episodes", _find_episodes)
+    monkeypatch.setattr(server.GibberishDetector, "detect", classmethod(lambda cls, text: False))
+
+    response = client.post(
+        "/search?fields=number,title",
+        json={"user_input": "who%20is%20camus%3F"},
+        headers={"Accept-Encoding": "gzip"},
+    )
+
+    assert searches == [("episode_number", "episode_title")]
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert len(json.loads(gzip.decompress(response.data))["results"]) == 50
+
+    plain = client.post("/search", json={"user_input": "camus", "fields": ["number"]})
+    assert "Content-Encoding" not in plain.headers
+    assert plain.get_json()["results"][0]["episode_number"] == "0"
+
+    bad = client.post("/search", json={"user_input": "camus", "fields": "number,transcript"})
+    assert bad.status_code == 400
+
+
+@pytest.fixture
+def request_log(monkeypatch):
+    from loguru import logger
+
+    from app.server.request_log import RequestLog
+
+    RequestLog.reset()
+    lines = []
+    sink = logger.add(lambda message: lines.append(message.record["message"]), level="INFO")
+    yield lines
+    RequestLog.flush()
+    logger.remove(sink)
+    RequestLog.reset()
+
+
+def test_request_log_truncates_bodies_and_samples(client, request_log, monkeypatch):
+    import app.server.app as server
+    import app.server.request_log as request_log_module
+    from app.server.request_log import RequestLog
+
+    monkeypatch.setattr(server, "truncate", lambda body: request_log_module.truncate(body, 64))
+    payload = {"epi_num": 3, "question": "camus" * 40, "podcast_title": "Philosophize This"}
+
+    client.post("/make_summary", json=payload)
+    RequestLog.flush()
+    records = [json.loads(line[len("Request: "):]) for line in request_log if line.startswith("Request: {")]
+    assert len(records) == 1
+    assert records[0]["status"] == 200
+    assert records[0]["url"].endswith("/make_summary")
+    assert records[0]["request"].endswith(f"... [{len(json.dumps(payload))} bytes]")
+
+    # unsampled successful requests are skipped, errors are always logged
+    monkeypatch.setattr(server, "sample", lambda: False)
+    client.post("/make_summary", json=payload)
+    client.post("/search", json={"user_input": "camus", "fields": "transcript"})
+    RequestLog.flush()
+    records = [json.loads(line[len("Request: "):]) for line in request_log if line.startswith("Request: {")]
+    assert [record["status"] for record in records] == [200, 400]
+
+
+def test_request_log_drops_records_when_full(request_log):
+    import queue
+
+    from app.server.request_log import RequestLog
+
+    # a queue without a writer: the second record finds it full
+    RequestLog._queue = queue.Queue(maxsize=1)
+    RequestLog._thread = type("Alive", (), {"is_alive": lambda self: True})()
+
+    assert RequestLog.submit({"n": 1})
+    assert not RequestLog.submit({"n": 2})
+    assert RequestLog.stats() == {"written": 0, "dropped": 1, "pending": 1}
+    RequestLog._queue.get_nowait()
+    RequestLog._queue.task_done()
+
+
+def test_metrics_and_server_timing(client):
+    payload = {"epi_num": 3, "question": "camus", "podcast_title": "Philosophize This"}
+
+    response = client.post("/make_summary", json=payload)
+
+    stages = {entry.split(";")[0] for entry in response.headers["Server-Timing"].split(", ")}
+    assert {"sqlite", "make_summary"} <= stages
+    scrape = client.get("/metrics")
+    assert scrape.status_code == 200
+    body = scrape.get_data(as_text=True)
+    assert 'podcast_stage_seconds_count{stage="make_summary"}' in body
+    assert 'podcast_cache_hit_ratio{cache="make_summary"}' in body
@@ -0,0 +1,128 @@
+import asyncio
+import json
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+import engine.similiarty_retrieval as retrieval
+import engine.summarizer as summarizer
+from engine.llm import ChatLLM
+from engine.security import GibberishDetector
+from engine.similiarty_retrieval import VectorDB
+from engine.summary_store import SummaryStore
+from tests.fakes import BagOfWordsEmbeddings, StreamingStubLLM, StubLLM
+
+
+@pytest.fixture
+def client(database, tmp_path, monkeypatch):
+    import app.server.asgi as server
+
+    store = SummaryStore(str(tmp_path / "summaries.db"))
+    monkeypatch.setattr(summarizer, "get_summary_store", lambda: store)
+    monkeypatch.setattr(VectorDB, "_embeddings", BagOfWordsEmbeddings())
+    monkeypatch.setattr(GibberishDetector, "detect", classmethod(lambda cls, text: False))
+    llm = StubLLM()
+    ChatLLM.set_llm(llm)
+    with TestClient(server.app) as client:
+        client.llm = llm
+        yield client
+    ChatLLM.set_llm(None)
+    summarizer.amake_summary.cache_clear()
+    retrieval.ais_related.cache_clear()
+
+
+def test_search_verifies_candidates(client, monkeypatch):
+    monkeypatch.setattr(
+        retrieval,
+        "_suggest_by_vector",
+        lambda embedding, k, TOP_K: [("3", "Philosophize This"), ("5", "Philosophize This")],
+    )
+    client.llm.related = ["text 3"]
+
+    results = client.post("/search", json={"user_input": "who%20is%20camus%3F"}).json()["results"]
+
+    assert results == [
+        {
+            "episode_number": "3",
+            "episode_title": "Episode 3",
+            "podcast_title": "Philosophize This",
+            "episode_text": "summary 3",
+            "episode_link": "https://example.com/3",
+        }
+    ]
+
+
+def test_make_summary_matches_flask_route(client):
+    payload = {"epi_num": 3, "question": "who%20is%20camus%3F", "podcast_title": "Philosophize This"}
+
+    first = client.post("/make_summary", json=payload).json()["results"]
+    second = client.post("/make_summary", json=payload).json()["results"]
+
+    assert first == second
+    assert first["episode_title"] == "Episode 3"
+    assert client.llm.calls == 1
+    assert "who is camus?" in client.llm.prompts[0]
+
+
+def test_make_summary_stream(client):
+    llm = StreamingStubLLM()
+    ChatLLM.set_llm(llm)
+    payload = {"epi_num": 3, "question": "camus", "podcast_title": "Philosophize This"}
+
+    body = client.post("/make_summary/stream", json=payload).text
+
+    assert body.startswith("event: meta\n")
+    assert body.count('data: {"token"') == len(llm._tokens())
+    assert f'event: done\ndata: {{"episode_summary": "{llm.answer}"}}' in body
+    assert llm.streamed == 1
+
+
+def test_llm_calls_do_not_hold_threads():
+    llm = StubLLM(delay=0.5)
+    ChatLLM.set_llm(llm)
+
+    async def _summaries():
+        return await asyncio.gather(
+            *(summarizer.amake_summary.__wrapped__(f"text {i}") for i in range(64))
+        )
+
+    start = time.monotonic()
+    try:
+        summaries = asyncio.run(_summaries())
+    finally:
+        ChatLLM.set_llm(None)
+
+    assert len(summaries) == 64
+    assert llm.calls == 64
+    # 64 calls in flight at once on a single thread
+    assert time.monotonic() - start < 2.0
+
+
+def test_request_log_keeps_parsed_body(client):
+    from loguru import logger
+
+    from app.server.request_log import RequestLog
+
+    lines = []
+    sink = logger.add(lambda message: lines.append(message.record["message"]), level="INFO")
+    payload = {"epi_num": 3, "question": "camus", "podcast_title": "Philosophize This"}
+    try:
+        client.post("/make_summary", json=payload)
+        RequestLog.flush()
+    finally:
+        logger.remove(sink)
+
+    records = [json.loads(line[len("Request: "):]) for line in lines if line.startswith("Request: {")]
+    assert records[-1]["status"] == 200
+    assert json.loads(records[-1]["request"]) == payload
+
+
+def test_server_timing_covers_threaded_stages(client):
+    payload = {"epi_num": 3, "question": "camus", "podcast_title": "Philosophize This"}
+
+    response = client.post("/make_summary", json=payload)
+
+    stages = {entry.split(";")[0] for entry in response.headers["server-timing"].split(", ")}
+    assert {"sqlite", "make_summary"} <= stages
+    assert "podcast_stage_seconds_bucket" in client.get("/metrics").text
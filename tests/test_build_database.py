@@ -0,0 +1,126 @@
+import functools
+import os
+
+import pytest
+
+pytest.importorskip("chromadb")
+
+import data_preparation.build_database as build
+from data_preparation.ingest import JOURNAL_FILE, ingest
+from engine.index_versions import MANIFEST_FILE, NUMPY_SUBDIR, read_manifest, resolve_index, version_path
+from engine.vector_engine import NumpyVectorIndex
+from tests.fakes import BagOfWordsEmbeddings
+
+
+class CountingEmbeddings(BagOfWordsEmbeddings):
+    def __init__(self):
+        super().__init__()
+        self.embedded = []
+        self.requests = 0
+
+    def embed_documents(self, texts):
+        self.requests += 1
+        self.embedded.extend(texts)
+        return super().embed_documents(texts)
+
+
+def _write(directory, number, text):
+    path = directory / f"episode{number:03}.txt"
+    path.write_text(text, encoding="UTF-8")
+    return path
+
+
+@pytest.fixture
+def transcripts(tmp_path, monkeypatch):
+    monkeypatch.setattr(build, "CHUNK_SIZE", 200)
+    monkeypatch.setattr(build, "CHUNK_OVERLAP", 0)
+    directory = tmp_path / "philosophize_this" / "episode_transcripts"
+    directory.mkdir(parents=True)
+    for number in range(1, 4):
+        _write(directory, number, f"episode {number} is about stoicism. " * 20)
+    return directory
+
+
+def _chunks(root):
+    from langchain.vectorstores import Chroma
+
+    _, path = resolve_index(str(root))
+    data = Chroma(persist_directory=path, embedding_function=BagOfWordsEmbeddings())._collection.get(
+        include=["metadatas"]
+    )
+    return sorted(meta["file"] for meta in data["metadatas"])
+
+
+def test_incremental_build_only_embeds_changes(tmp_path, transcripts):
+    root = tmp_path / "vectorDB"
+    full = CountingEmbeddings()
+    first = build.build_new_db(str(root), transcripts_path=str(transcripts), embeddings=full)
+    manifest = read_manifest(str(root), first)
+    assert manifest["chunk_count"] == len(full.embedded) > 3
+    # the chunks of all episodes share one request
+    assert full.requests == 1
+    assert manifest["chunks_per_second"] > 0
+    assert set(manifest["files"]) == {"episode001.txt", "episode002.txt", "episode003.txt"}
+    per_episode = len(full.embedded) // 3
+
+    _write(transcripts, 2, "episode 2 is now about cynicism. " * 10)
+    _write(transcripts, 4, "episode 4 is about epicurus. " * 20)
+    os.remove(transcripts / "episode003.txt")
+    delta = CountingEmbeddings()
+    second = build.build_new_db(
+        str(root), incremental=True, transcripts_path=str(transcripts), embeddings=delta
+    )
+
+    assert all("cynicism" in text or "epicurus" in text for text in delta.embedded)
+    chunks = _chunks(root)
+    assert chunks.count("episode001.txt") == per_episode
+    assert "episode003.txt" not in chunks
+    assert chunks.count("episode002.txt") + chunks.count("episode004.txt") == len(delta.embedded)
+    manifest = read_manifest(str(root), second)
+    assert manifest["chunk_count"] == len(chunks)
+    assert manifest["base_version"] == first
+    # the first version is untouched and can still be rolled back to
+    assert read_manifest(str(root), first)["chunk_count"] == 3 * per_episode
+
+
+def test_resume_continues_an_interrupted_build(tmp_path, transcripts, monkeypatch):
+    monkeypatch.setattr(build, "ingest", functools.partial(ingest, batch_size=2))
+    root = tmp_path / "vectorDB"
+    full = CountingEmbeddings()
+    version = build.build_new_db(
+        str(root), activate_version=False, transcripts_path=str(transcripts), embeddings=full
+    )
+    total = len(full.embedded)
+
+    # as if the job was killed after committing two batches, and after writing a third one
+    path = version_path(str(root), version)
+    os.remove(os.path.join(path, MANIFEST_FILE))
+    journal = os.path.join(path, JOURNAL_FILE)
+    with open(journal, encoding="UTF-8") as f:
+        lines = f.readlines()
+    with open(journal, "w", encoding="UTF-8") as f:
+        f.writelines(lines[:3] + ['{"event": "batch", "ids": ["epis'])
+
+    resumed = CountingEmbeddings()
+    assert (
+        build.build_new_db(
+            str(root), transcripts_path=str(transcripts), embeddings=resumed, resume=True
+        )
+        == version
+    )
+
+    assert len(resumed.embedded) == total - 4
+    assert len(_chunks(root)) == total
+    assert read_manifest(str(root), version)["chunk_count"] == total
+
+
+def test_numpy_backend_build_is_exported_before_activation(tmp_path, transcripts, monkeypatch):
+    monkeypatch.setattr(build, "VECTOR_BACKEND", "numpy")
+    root = tmp_path / "vectorDB"
+    version = build.build_new_db(
+        str(root), transcripts_path=str(transcripts), embeddings=BagOfWordsEmbeddings()
+    )
+
+    assert resolve_index(str(root))[0] == version
+    index = NumpyVectorIndex.load(os.path.join(version_path(str(root), version), NUMPY_SUBDIR))
+    assert len(index.ids) == read_manifest(str(root), version)["chunk_count"]
@@ -0,0 +1,49 @@
+import pytest
+
+import engine.context as context
+import engine.summarizer as summarizer
+
+
+FILLER = "the weather was mild and the market was busy that day. " * 40
+TRANSCRIPT = FILLER * 3 + "Camus argues that the absurd demands revolt. " * 10 + FILLER * 3
+
+
+@pytest.fixture
+def small_window(monkeypatch):
+    monkeypatch.setattr(context, "CONTEXT_WINDOW", 1200)
+    monkeypatch.setattr(context, "MAX_OUTPUT_TOKENS", 200)
+
+
+@pytest.fixture
+def token_usage(monkeypatch):
+    # TokenUsage is process-wide; give the test its own counters
+    monkeypatch.setattr(context.TokenUsage, "_usage", {})
+    return context.TokenUsage
+
+
+def test_select_relevant_chunks_fits_budget():
+    selected = context.select_relevant_chunks(TRANSCRIPT, "what does camus say about the absurd?", budget=300, chunk_tokens=100)
+    assert context.count_tokens(selected) <= 300
+    assert "Camus argues" in selected
+    assert context.select_relevant_chunks("short text", "q", budget=300) == "short text"
+
+
+def test_long_summary_uses_map_reduce_within_budget(small_window, stub_llm, token_usage):
+    assert context.count_tokens(TRANSCRIPT) > context.CONTEXT_WINDOW
+
+    summarizer.make_summary(TRANSCRIPT, hint="camus")
+
+    limit = context.CONTEXT_WINDOW - context.MAX_OUTPUT_TOKENS
+    assert stub_llm.calls > 2
+    assert all(context.count_tokens(p) <= limit for p in stub_llm.prompts)
+    usage = token_usage.stats()
+    assert usage["make_summary.reduce"]["calls"] >= 1
+    assert (
+        usage["make_summary.map"]["calls"] + usage["make_summary.reduce"]["calls"]
+        == stub_llm.calls
+    )
+
+
+def test_short_summary_is_one_call(stub_llm):
+    summarizer.make_summary("Camus and the absurd.", hint="")
+    assert stub_llm.calls == 1
@@ -0,0 +1,117 @@
+import os
+import shutil
+import sqlite3
+import threading
+import pytest
+
+import engine.data_handler.get as get
+from engine.constants import Podcast
+from engine.data_handler.pool import ConnectionPool, enable_wal
+from tests.conftest import EPISODES
+
+
+def test_pool_reuses_connection_per_thread(database):
+    pool = ConnectionPool(database)
+    assert pool.get() is pool.get()
+
+    other = []
+    thread = threading.Thread(target=lambda: other.append(pool.get()))
+    thread.start()
+    thread.join()
+    assert other[0] is not pool.get()
+    pool.close_all()
+
+
+def test_pool_is_read_only(database):
+    pool = ConnectionPool(database)
+    with pytest.raises(sqlite3.OperationalError):
+        pool.get().execute("DELETE FROM merged_data")
+    pool.close_all()
+
+
+def test_pool_leaves_journal_mode_to_the_build(database):
+    def _journal_mode():
+        conn = sqlite3.connect(database)
+        try:
+            return conn.execute("PRAGMA journal_mode").fetchone()[0]
+        finally:
+            conn.close()
+
+    pool = ConnectionPool(database)
+    pool.get().execute("SELECT 1").fetchone()
+    assert _journal_mode() == "delete"
+
+    enable_wal(database)
+    assert _journal_mode() == "wal"
+    assert pool.get().execute("SELECT COUNT(*) FROM merged_data").fetchone()[0] == len(EPISODES)
+    pool.close_all()
+
+
+def test_getters_use_pool(database):
+    assert get.get_title(3, Podcast.PHILOSOPHIZE_THIS) == "Episode 3"
+    assert get.get_link(3, Podcast.PHILOSOPHIZE_THIS) == [("https://example.com/3",)]
+    assert get.get_summary(3, Podcast.PHILOSOPHIZE_THIS) == [("summary 3",)]
+    assert get.get_text(3, Podcast.PHILOSOPHIZE_THIS.value) == [("text 3",)]
+    assert get.DataBase.get_pool().path == database
+
+
+def test_get_episodes_bulk(database):
+    keys = [(3, Podcast.PHILOSOPHIZE_THIS), ("5", Podcast.PHILOSOPHIZE_THIS.value), (99, Podcast.PHILOSOPHIZE_THIS)]
+    rows = get.get_episodes_bulk(keys, columns=("Title", "URL"))
+    assert rows == {
+        ("3", "Philosophize This"): {"Title": "Episode 3", "URL": "https://example.com/3"},
+        ("5", "Philosophize This"): {"Title": "Episode 5", "URL": "https://example.com/5"},
+    }
+
+    with pytest.raises(ValueError):
+        get.get_episodes_bulk(keys, columns=("Title; DROP TABLE merged_data",))
+
+
+def test_catalog_serves_metadata_and_reloads(database, monkeypatch):
+    catalog = get.DataBase.get_catalog()
+    catalog.check_interval = 0
+    assert len(catalog) == len(EPISODES)
+
+    calls = []
+    run_query = get.run_query
+    monkeypatch.setattr(get, "run_query", lambda q, p: calls.append(q) or run_query(q, p))
+    assert get.get_title(3, Podcast.PHILOSOPHIZE_THIS) == "Episode 3"
+    assert get.get_link(3, Podcast.PHILOSOPHIZE_THIS) == [("https://example.com/3",)]
+    assert calls == []
+
+    # the transcript is only read on demand
+    assert get.get_episode("3", Podcast.PHILOSOPHIZE_THIS.value)[0][2] == "text 3"
+    assert len(calls) == 1
+
+    conn = sqlite3.connect(database)
+    conn.execute("UPDATE merged_data SET Title = 'Renamed' WHERE Number = '3'")
+    conn.commit()
+    conn.close()
+    assert get.get_title(3, Podcast.PHILOSOPHIZE_THIS) == "Renamed"
+
+
+def test_catalog_reloads_a_replaced_database_with_the_same_size_and_mtime(database):
+    catalog = get.DataBase.get_catalog()
+    catalog.check_interval = 0
+    stat = os.stat(database)
+
+    replacement = f"{database}.new"
+    shutil.copyfile(database, replacement)
+    os.utime(replacement, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    os.replace(replacement, database)
+
+    assert os.path.getsize(database) == stat.st_size
+    assert catalog.refresh_if_changed()
+    assert not catalog.refresh_if_changed()
+
+
+@pytest.mark.parametrize("catalog", [True, False])
+def test_missing_summary_gets_default(database, monkeypatch, catalog):
+    monkeypatch.setattr(get, "EPISODE_CATALOG", catalog)
+    conn = sqlite3.connect(database)
+    conn.execute("UPDATE merged_data SET Summary = NULL WHERE Number = '4'")
+    conn.commit()
+    conn.close()
+
+    assert get.get_summary(4, Podcast.PHILOSOPHIZE_THIS) == ["summary didn't exists!"]
+    assert get.get_summary(99, Podcast.PHILOSOPHIZE_THIS) == ["summary didn't exists!"]
@@ -0,0 +1,36 @@
+from engine.embedding_cache import CachedEmbeddings, EmbeddingCache, normalize_prompt
+from tests.fakes import BagOfWordsEmbeddings
+
+
+def test_normalize_prompt():
+    assert normalize_prompt("  Who is   CAMUS?\n") == "who is camus?"
+
+
+def test_cache_tiers_and_counters(tmp_path):
+    path = str(tmp_path / "embeddings.db")
+    upstream = BagOfWordsEmbeddings()
+    embeddings = CachedEmbeddings(upstream, cache=EmbeddingCache(path), model="m")
+
+    vector = embeddings.embed_query("Who is Camus?")
+    assert embeddings.embed_query("who is  camus?") == vector
+    assert upstream.calls == 1
+    assert embeddings.cache.stats()["memory_hits"] == 1
+
+    # a new process only shares the file
+    restarted = CachedEmbeddings(upstream, cache=EmbeddingCache(path), model="m")
+    assert restarted.embed_query("WHO IS CAMUS?") == vector
+    assert upstream.calls == 1
+    assert restarted.cache.stats() == {"memory_hits": 0, "disk_hits": 1, "misses": 0, "hit_rate": 1.0}
+
+    # the model is part of the key
+    other_model = CachedEmbeddings(upstream, cache=EmbeddingCache(path), model="other")
+    other_model.embed_query("who is camus?")
+    assert upstream.calls == 2
+
+
+def test_memory_tier_is_bounded():
+    cache = EmbeddingCache(path=None, max_size=2)
+    for prompt in ("a", "b", "c"):
+        cache.put(prompt, "m", [1.0])
+    assert cache.get("a", "m") is None
+    assert cache.get("c", "m") == [1.0]
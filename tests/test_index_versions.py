@@ -0,0 +1,151 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+import engine.similiarty_retrieval as retrieval
+from engine.index_versions import (
+    activate,
+    create_version,
+    current_version,
+    list_versions,
+    resolve_index,
+    rollback,
+    write_manifest,
+)
+
+
+def _build(root, chunks):
+    version, path = create_version(str(root))
+    write_manifest(str(root), version, {"chunk_count": chunks, "embedding_model": "test"})
+    return version, path
+
+
+def test_activate_and_rollback(tmp_path):
+    assert resolve_index(str(tmp_path)) == (None, str(tmp_path))
+    first, first_path = _build(tmp_path, 10)
+    second, _ = _build(tmp_path, 12)
+    unfinished, _ = create_version(str(tmp_path))
+
+    activate(str(tmp_path), first)
+    assert resolve_index(str(tmp_path)) == (first, first_path)
+    activate(str(tmp_path), second)
+    with pytest.raises(ValueError):
+        activate(str(tmp_path), unfinished)
+
+    assert [m["version"] for m in list_versions(str(tmp_path))] == [first, second]
+    assert rollback(str(tmp_path))["chunk_count"] == 10
+    assert current_version(str(tmp_path)) == first
+    with pytest.raises(ValueError):
+        rollback(str(tmp_path))
+
+
+def test_vector_db_swaps_to_activated_version(tmp_path, monkeypatch):
+    loads = []
+
+    def _load(cls, path):
+        loads.append(path)
+        return object()
+
+    monkeypatch.setattr(retrieval, "DB_PATH", str(tmp_path))
+    monkeypatch.setattr(retrieval, "VECTOR_BACKEND", "chroma")
+    monkeypatch.setattr(retrieval, "INDEX_CHECK_INTERVAL", 0)
+    monkeypatch.setattr(retrieval.VectorDB, "_load", classmethod(_load))
+    for name, value in (("_db", None), ("_version", None), ("_active", None), ("_checked", 0.0)):
+        monkeypatch.setattr(retrieval.VectorDB, name, value)
+    cleared = []
+    monkeypatch.setattr(retrieval.VectorDB, "_swap_hooks", [lambda: cleared.append(1)])
+
+    first, first_path = _build(tmp_path, 10)
+    activate(str(tmp_path), first)
+    old = retrieval.VectorDB._get_db()
+    assert retrieval.VectorDB._get_db() is old
+    assert retrieval.VectorDB.index_version() == first
+
+    second, second_path = _build(tmp_path, 12)
+    activate(str(tmp_path), second)
+    new = retrieval.VectorDB._get_db()
+
+    assert new is not old
+    assert retrieval.VectorDB.index_version() == second
+    assert loads == [first_path, second_path]
+    assert cleared == [1]
+
+    rollback(str(tmp_path))
+    assert retrieval.VectorDB._get_db() is not new
+    assert retrieval.VectorDB.index_version() == first
+
+
+def test_diff_files():
+    from engine.index_versions import diff_files
+
+    old = {"a.txt": "1", "b.txt": "2", "c.txt": "3"}
+    new = {"a.txt": "1", "b.txt": "20", "d.txt": "4"}
+
+    assert diff_files(old, new) == (["d.txt"], ["b.txt"], ["c.txt"])
+
+
+def test_vector_db_keeps_serving_when_new_version_fails_to_load(tmp_path, monkeypatch):
+    def _load(cls, path):
+        if path.endswith("numpy") and not os.path.isdir(path):
+            raise FileNotFoundError(path)
+        return object()
+
+    monkeypatch.setattr(retrieval, "DB_PATH", str(tmp_path))
+    monkeypatch.setattr(retrieval, "VECTOR_BACKEND", "numpy")
+    monkeypatch.setattr(retrieval, "INDEX_CHECK_INTERVAL", 0)
+    monkeypatch.setattr(retrieval.VectorDB, "_load", classmethod(_load))
+    for name, value in (
+        ("_db", None),
+        ("_version", None),
+        ("_active", None),
+        ("_checked", 0.0),
+        ("_failed", None),
+    ):
+        monkeypatch.setattr(retrieval.VectorDB, name, value)
+    monkeypatch.setattr(retrieval.VectorDB, "_swap_hooks", [])
+
+    first, first_path = _build(tmp_path, 10)
+    os.makedirs(os.path.join(first_path, "numpy"))
+    activate(str(tmp_path), first)
+    old = retrieval.VectorDB._get_db()
+
+    # activated before its NumPy export exists
+    second, second_path = _build(tmp_path, 12)
+    activate(str(tmp_path), second)
+    assert retrieval.VectorDB._get_db() is old
+    assert retrieval.VectorDB.index_version() == first
+
+    os.makedirs(os.path.join(second_path, "numpy"))
+    assert retrieval.VectorDB._get_db() is not old
+    assert retrieval.VectorDB.index_version() == second
+
+
+def test_legacy_chroma_version_survives_queries(tmp_path, monkeypatch):
+    pytest.importorskip("chromadb")
+    from langchain.schema.document import Document
+    from langchain.vectorstores import Chroma
+
+    from tests.fakes import BagOfWordsEmbeddings
+
+    path = str(tmp_path / "vectorDB")
+    documents = [Document(page_content=f"episode {i} is about stoicism") for i in range(50)]
+    Chroma.from_documents(documents, BagOfWordsEmbeddings(), persist_directory=path)
+    monkeypatch.setattr(retrieval, "DB_PATH", path)
+    monkeypatch.setattr(retrieval, "VECTOR_BACKEND", "chroma")
+    monkeypatch.setattr(retrieval, "INDEX_CHECK_INTERVAL", 0)
+    monkeypatch.setattr(retrieval.VectorDB, "_active", None)
+    before = retrieval.VectorDB.index_version()
+
+    # a fresh process opening and querying the index rewrites its HNSW segment files
+    query = (
+        "from langchain.vectorstores import Chroma\n"
+        "from tests.fakes import BagOfWordsEmbeddings\n"
+        f"db = Chroma(persist_directory={path!r}, embedding_function=BagOfWordsEmbeddings())\n"
+        "db.similarity_search_with_score('stoicism', k=3)\n"
+    )
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    subprocess.run([sys.executable, "-c", query], cwd=root, check=True, capture_output=True)
+
+    assert retrieval.VectorDB.index_version() == before
@@ -0,0 +1,121 @@
+import time
+
+import pytest
+from langchain.schema.document import Document
+
+from data_preparation.ingest import Chunk, IngestJournal, TokenBucket, embed_batch, ingest, pack_batches
+from tests.fakes import BagOfWordsEmbeddings
+
+
+class RateLimitError(Exception):
+    status_code = 429
+
+    def __init__(self, retry_after):
+        super().__init__("Rate limit reached")
+        self.headers = {"retry-after": retry_after}
+
+
+class FlakyEmbeddings(BagOfWordsEmbeddings):
+    def __init__(self, failures):
+        super().__init__()
+        self.failures = failures
+        self.requests = []
+
+    def embed_documents(self, texts):
+        self.requests.append(time.monotonic())
+        if len(self.requests) <= self.failures:
+            raise RateLimitError("0.2")
+        return super().embed_documents(texts)
+
+
+def _chunks(sizes):
+    return [
+        Chunk(f"a.txt:{i}", Document(page_content="word " * size, metadata={"file": "a.txt"}), size)
+        for i, size in enumerate(sizes)
+    ]
+
+
+def test_pack_batches_respects_token_budget_and_size():
+    chunks = _chunks([10, 10, 10, 50, 5, 5, 5, 5])
+    batches = list(pack_batches(chunks, max_tokens=35, max_size=3))
+
+    assert [len(batch) for batch in batches] == [3, 1, 3, 1]
+    assert [chunk.id for batch in batches for chunk in batch] == [f"a.txt:{i}" for i in range(8)]
+    # an oversized chunk still gets a batch of its own
+    assert batches[1][0].tokens > 35
+
+
+def test_embed_batch_honours_retry_after():
+    embeddings = FlakyEmbeddings(failures=1)
+    bucket = TokenBucket(tokens_per_minute=60_000)
+    vectors = embed_batch(embeddings, _chunks([3, 4]), bucket)
+
+    assert len(vectors) == 2
+    assert embeddings.requests[1] - embeddings.requests[0] >= 0.2
+
+
+def test_embed_batch_gives_up_after_max_retries():
+    embeddings = FlakyEmbeddings(failures=5)
+    with pytest.raises(RateLimitError):
+        embed_batch(embeddings, _chunks([3]), TokenBucket(), max_retries=0)
+
+
+def test_token_bucket_waits_for_refill():
+    bucket = TokenBucket(tokens_per_minute=6000, capacity=100)
+    assert bucket.acquire(100) == 0
+    # 100 tokens per second: the next 20 take about 0.2 seconds
+    assert 0.15 < bucket.acquire(20) < 0.5
+
+
+class FakeCollection:
+    def __init__(self):
+        self.rows = {}
+
+    def upsert(self, ids, embeddings, documents, metadatas):
+        self.rows.update(zip(ids, documents))
+
+
+def _load(path):
+    if "broken" in path:
+        raise OSError("unreadable")
+    name = path.rsplit("/", 1)[-1]
+    return [
+        Chunk(f"{name}:{i}", Document(page_content=f"{name} {i}", metadata={"file": name}), 3)
+        for i in range(5)
+    ]
+
+
+def test_ingest_streams_every_chunk_through_the_pipeline():
+    paths = [f"/transcripts/episode{i:03}.txt" for i in range(20)] + ["/transcripts/broken.txt"]
+    collection = FakeCollection()
+    stats = ingest(
+        paths,
+        _load,
+        BagOfWordsEmbeddings(),
+        collection,
+        workers=2,
+        embed_workers=3,
+        queue_size=1,
+        batch_size=4,
+    )
+
+    assert stats["chunks"] == len(collection.rows) == 100
+    assert collection.rows["episode007.txt:3"] == "episode007.txt 3"
+    assert stats["failed"] == {"broken.txt"}
+
+
+def test_journal_replay_drops_failed_episodes_and_torn_records(tmp_path):
+    path = str(tmp_path / "journal.jsonl")
+    journal = IngestJournal(path)
+    journal.record("start", to_embed=["a.txt", "b.txt"])
+    journal.record("batch", ids=["a.txt:0", "a.txt:1", "b.txt:0"])
+    journal.record("episode", file="a.txt")
+    journal.record("failed", file="b.txt")
+    journal.close()
+    with open(path, "a", encoding="UTF-8") as f:
+        f.write('{"event": "batch", "ids": ["b.t')
+
+    state = IngestJournal.read(path)
+    assert state["start"]["to_embed"] == ["a.txt", "b.txt"]
+    assert state["chunks"] == {"a.txt:0", "a.txt:1"}
+    assert state["episodes"] == {"a.txt"}
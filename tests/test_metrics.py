@@ -0,0 +1,54 @@
+import asyncio
+
+import pytest
+from prometheus_client import REGISTRY
+
+from engine import metrics
+
+
+def test_stage_timings_are_summed_per_request():
+    timings = metrics.start_request()
+
+    with metrics.timed("sqlite"):
+        pass
+    with metrics.timed("sqlite"):
+        pass
+    with pytest.raises(RuntimeError):
+        with metrics.timed("is_related"):
+            raise RuntimeError("boom")
+
+    totals = timings.totals()
+    assert totals["sqlite"][1] == 2
+    assert totals["is_related"][1] == 1
+    header = timings.header()
+    assert header.startswith("sqlite;dur=")
+    assert 'desc="2 calls"' in header
+    assert REGISTRY.get_sample_value("podcast_stage_errors_total", {"stage": "is_related"}) >= 1
+
+
+def test_instrument_times_coroutines():
+    @metrics.instrument("test_async_stage")
+    async def _stage():
+        await asyncio.sleep(0.01)
+        return 42
+
+    async def _request():
+        timings = metrics.start_request()
+        assert await _stage() == 42
+        return timings.totals()
+
+    totals = asyncio.run(_request())
+    assert totals["test_async_stage"][0] >= 0.01
+    assert REGISTRY.get_sample_value("podcast_stage_seconds_count", {"stage": "test_async_stage"}) == 1
+
+
+def test_cache_hit_ratio_is_exported():
+    metrics.register_cache("test_cache", lambda: (3, 1))
+    metrics.register_cache("test_missing_cache", lambda: None)
+
+    assert REGISTRY.get_sample_value("podcast_cache_hit_ratio", {"cache": "test_cache"}) == 0.75
+    assert REGISTRY.get_sample_value("podcast_cache_hits_total", {"cache": "test_cache"}) == 3
+    assert REGISTRY.get_sample_value("podcast_cache_hit_ratio", {"cache": "test_missing_cache"}) is None
+    body, content_type = metrics.render()
+    assert b'podcast_cache_hit_ratio{cache="test_cache"} 0.75' in body
+    assert content_type.startswith("text/plain")
@@ -0,0 +1,60 @@
+import engine.similiarty_retrieval as retrieval
+from engine.result_cache import SQLiteResultCache, result_key
+
+
+def test_key_normalizes_prompt_and_includes_index_version():
+    key = result_key("Who is  Camus?", [12, 6, None], "v1")
+
+    assert key == result_key("who is camus?", [12, 6, None], "v1")
+    assert key != result_key("who is camus?", [12, 6, None], "v2")
+    assert key != result_key("who is camus?", [12, 3, None], "v1")
+
+
+def test_expired_and_oversized_entries_are_dropped(tmp_path):
+    cache = SQLiteResultCache(str(tmp_path / "results.db"), ttl=60, max_bytes=200)
+    cache.put("a", [{"episode_number": "1"}])
+    assert cache.get("a") == [{"episode_number": "1"}]
+
+    cache.ttl = -1
+    assert cache.get("a") is None
+    cache.ttl = 60
+
+    for i in range(10):
+        cache.put(str(i), ["x" * 30])
+    assert cache.get("0") is None
+    assert cache.get("9") == ["x" * 30]
+    assert cache.stats()["evictions"] > 0
+
+
+def test_find_episodes_reads_through_shared_cache(result_cache, monkeypatch):
+    searches = []
+
+    def _search(prompt, k, TOP_K, fields):
+        searches.append(prompt)
+        # the relevance checks failed for this one, so its candidates are unverified
+        return [{"episode_number": "3"}], prompt == "outage"
+
+    monkeypatch.setattr(retrieval, "_search_episodes", _search)
+    monkeypatch.setattr(retrieval.VectorDB, "_active", ("v1", "unused"))
+    monkeypatch.setattr(retrieval.VectorDB, "_checked", float("inf"))
+    first = retrieval.find_episodes("Who is Camus?")
+    # a fresh worker: empty per-process cache, same shared cache
+    retrieval._recent_results.clear()
+    second = retrieval.find_episodes("who is camus?")
+    assert first == second == [{"episode_number": "3"}]
+    assert searches == ["Who is Camus?"]
+    # served from the per-process cache
+    retrieval.find_episodes("who is camus?")
+    assert retrieval._recent_results.stats()["hits"] == 1
+
+    # a rebuilt index misses the old entries, without clearing the per-process cache
+    monkeypatch.setattr(retrieval.VectorDB, "_active", ("v2", "unused"))
+    retrieval.find_episodes("who is camus?")
+    assert len(searches) == 2
+
+    # degraded results are kept in neither cache
+    retrieval.find_episodes("outage")
+    retrieval.find_episodes("outage")
+    assert searches[2:] == ["outage", "outage"]
+    assert result_cache.stats()["hits"] == 1
+    assert result_cache.stats()["misses"] == 4
@@ -0,0 +1,167 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from engine.classifier_backends import GIBBERISH_MAX_LENGTH, GIBBERISH_ONNX_PATH, load_backend, parity_report
+import engine.security as security
+from engine.embedding_cache import normalize_prompt
+from engine.security import GibberishDetector, MicroBatcher, VerdictCache, prefilter
+
+
+class FakePipe:
+    def __init__(self, delay=0.05):
+        self.delay = delay
+        self.batches = []
+
+    def __call__(self, texts, batch_size=None, **kwargs):
+        self.batches.append(list(texts))
+        self.kwargs = kwargs
+        time.sleep(self.delay)
+        return [{"label": "noise" if "xq" in text else "clean"} for text in texts]
+
+
+@pytest.fixture
+def detector(monkeypatch):
+    pipe = FakePipe()
+    monkeypatch.setattr(GibberishDetector, "_pipe", pipe)
+    batcher = MicroBatcher(
+        lambda texts: GibberishDetector.classify(texts), max_batch=8, max_wait_ms=50
+    )
+    monkeypatch.setattr(GibberishDetector, "_batcher", batcher)
+    monkeypatch.setattr(GibberishDetector, "_cache", VerdictCache(max_size=4))
+    monkeypatch.setattr(GibberishDetector, "_counts", {"prefilter": 0, "cache": 0, "model": 0})
+    monkeypatch.setattr(security, "GIBBERISH_PREFILTER", False)
+    return pipe, batcher
+
+
+def test_concurrent_detects_share_forward_passes(detector):
+    pipe, batcher = detector
+    inputs = [f"question {i}" if i % 3 else f"xq{i}zz" for i in range(16)]
+
+    with ThreadPoolExecutor(max_workers=16) as executor:
+        verdicts = list(executor.map(GibberishDetector.detect, inputs))
+
+    assert verdicts == ["xq" in text for text in inputs]
+    assert sorted(text for batch in pipe.batches for text in batch) == sorted(inputs)
+    assert len(pipe.batches) < len(inputs)
+    assert max(len(batch) for batch in pipe.batches) <= 8
+
+    stats = batcher.stats()
+    assert stats["items"] == 16
+    assert stats["batches"] == len(pipe.batches)
+    assert stats["mean_batch_size"] > 1
+    assert 0 < stats["max_queue_wait_ms"] < 1000
+
+
+def test_batch_errors_reach_every_caller():
+    def _fail(items):
+        raise ValueError("model failed")
+
+    batcher = MicroBatcher(_fail, max_batch=4, max_wait_ms=20)
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        futures = [executor.submit(batcher.submit, i) for i in range(4)]
+        for future in futures:
+            with pytest.raises(ValueError):
+                future.result()
+
+
+@pytest.mark.parametrize(
+    "text, verdict",
+    [
+        ("what is the absurd", False),
+        ("why did socrates accept his death sentence?", False),
+        ("is free will compatible with determinism?", False),
+        ("xcvb nmqw erty", True),
+        ("jjjjjjjjjjjjjjjj", True),
+        # word salad, lone keywords and short inputs are for the model
+        ("asdfghjkl", None),
+        ("banana sky run purple quickly the", None),
+        ("stoicism and anger", None),
+        ("hmm", None),
+    ],
+)
+def test_prefilter_decides_only_obvious_inputs(text, verdict):
+    assert prefilter(text) is verdict
+
+
+@pytest.mark.parametrize(
+    "name",
+    [
+        "Zhuangzi",
+        "Xunzi",
+        "Zizek",
+        "Žižek ideology",
+        "wu wei",
+        "Laozi Dao",
+        "Hypatia",
+        "Pyrrho",
+        "Krishnamurti",
+        "Nagarjuna sunyata",
+        "bhagavad gita",
+        "Gödel",
+    ],
+)
+def test_prefilter_leaves_names_to_the_model(name):
+    assert name in _fixtures()
+    assert prefilter(normalize_prompt(name)) is not True
+
+
+def test_prefilter_and_cache_skip_the_model(detector, monkeypatch):
+    pipe, _ = detector
+    monkeypatch.setattr(security, "GIBBERISH_PREFILTER", True)
+
+    assert GibberishDetector.detect("Who is Camus?") is False
+    assert GibberishDetector.detect("qwrtzp xqvbk zzkjh") is True
+    assert GibberishDetector.detect("stoicism and anger") is False
+    assert GibberishDetector.detect("  Stoicism and ANGER ") is False
+
+    assert pipe.batches == [["stoicism and anger"]]
+    assert GibberishDetector.stats() == {
+        "prefilter": 2,
+        "cache": 1,
+        "model": 1,
+        "skip_rate": 0.75,
+    }
+
+
+def test_served_pipeline_truncates_like_the_backends(detector, monkeypatch):
+    pipe, _ = detector
+    monkeypatch.setattr(security, "GIBBERISH_BACKEND", "torch")
+
+    assert GibberishDetector.classify(["who is camus?"]) == ["clean"]
+    assert pipe.kwargs == {"truncation": True, "max_length": GIBBERISH_MAX_LENGTH}
+
+
+def test_verdict_cache_is_bounded():
+    cache = VerdictCache(max_size=2)
+    cache.put("a", "clean")
+    cache.put("b", "noise")
+    cache.get("a")
+    cache.put("c", "clean")
+
+    assert len(cache) == 2
+    assert cache.get("b") is None
+    assert cache.get("a") == "clean"
+
+
+def _fixtures():
+    path = os.path.join(os.path.dirname(__file__), "fixtures", "gibberish_inputs.txt")
+    with open(path, encoding="UTF-8") as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+@pytest.mark.parametrize("backend", ["int8", "onnx"])
+def test_backend_labels_match_reference_pipeline(backend):
+    pytest.importorskip("torch")
+    if backend == "onnx" and not os.path.exists(GIBBERISH_ONNX_PATH):
+        pytest.skip("run python -m data_preparation.export_gibberish_onnx first")
+    try:
+        reference = load_backend("torch")
+    except OSError as e:
+        pytest.skip(f"classifier weights unavailable: {e}")
+
+    report = parity_report(reference, load_backend(backend), _fixtures())
+
+    assert report["agreement"] >= 0.95, report["mismatches"]
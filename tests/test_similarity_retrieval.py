@@ -0,0 +1,162 @@
+import threading
+
+import pytest
+
+from langchain.schema.document import Document
+
+import engine.data_handler.get as get
+import engine.similiarty_retrieval as retrieval
+from engine.constants import Podcast
+from engine.utils import aggregate_episode_scores
+from engine.verifier import RelevanceVerifier
+from tests.fakes import BagOfWordsEmbeddings
+
+
+@pytest.fixture
+def stub_search(monkeypatch):
+    def _suggest(prompt, k=8):
+        return [("3", "Philosophize This"), ("5", "Philosophize This"), ("99", "Philosophize This")]
+
+    monkeypatch.setattr(retrieval, "suggest_me_episodes", _suggest)
+    monkeypatch.setattr(retrieval, "is_related", lambda episode, prompt: True)
+
+
+@pytest.mark.parametrize("catalog", [False, True], ids=["sqlite", "catalog"])
+def test_find_episodes_hydrates_in_one_query(database, stub_search, monkeypatch, catalog):
+    monkeypatch.setattr(get, "EPISODE_CATALOG", catalog)
+    if catalog:
+        get.DataBase.get_catalog()
+
+    calls = []
+    run_query = get.run_query
+
+    def _counting_run_query(query, parameters):
+        calls.append(query)
+        return run_query(query=query, parameters=parameters)
+
+    monkeypatch.setattr(get, "run_query", _counting_run_query)
+
+    episodes = retrieval.find_episodes("who is camus?", k=12, TOP_K=6)
+
+    # with the catalog only the episode it does not know (99) reaches the database
+    assert len(calls) == 1
+    assert [e["episode_number"] for e in episodes] == ["3", "5"]
+    assert episodes[0] == {
+        "episode_number": "3",
+        "episode_title": "Episode 3",
+        "podcast_title": Podcast.PHILOSOPHIZE_THIS.value,
+        "episode_text": "summary 3",
+        "episode_link": "https://example.com/3",
+    }
+
+
+def _chunk(epi_num, score):
+    return Document(page_content="", metadata={"epi_num": epi_num, "podcast": "Philosophize This"}), score
+
+
+@pytest.fixture
+def chunk_index(monkeypatch):
+    # three chunks per episode, ranked by distance; episodes 1..8 pass the threshold
+    chunks = [_chunk(1 + i // 3, 0.1 + i * 0.01) for i in range(24)]
+    chunks += [_chunk(100 + i, 0.5 + i * 0.01) for i in range(40)]
+    searches = []
+
+    def _search(embedding, k):
+        searches.append(k)
+        return chunks[:k]
+
+    monkeypatch.setattr(retrieval.VectorDB, "get_embeddings", classmethod(lambda cls: BagOfWordsEmbeddings()))
+    monkeypatch.setattr(retrieval.VectorDB, "similarity_search_by_vector", _search)
+    return searches
+
+
+def test_adaptive_window_widens_until_top_k(chunk_index):
+    episodes = retrieval.suggest_episodes_adaptive("freedom", TOP_K=6, k=4)
+    assert episodes == [(str(i), "Philosophize This") for i in range(1, 7)]
+    assert chunk_index == [4, 8, 16]
+
+
+def test_adaptive_window_stops_past_threshold(chunk_index):
+    episodes = retrieval.suggest_episodes_adaptive("freedom", TOP_K=20, k=4)
+    assert len(episodes) == 8
+    # the 32 chunk window already ends above LEAST_ACCEPTED_SIMILARITY
+    assert chunk_index == [4, 8, 16, 32]
+
+
+@pytest.mark.parametrize(
+    "method, expected",
+    [("max", ["1", "2", "3"]), ("sum", ["2", "1", "3"]), ("rrf", ["2", "1", "3"])],
+)
+def test_aggregate_episode_scores(method, expected):
+    docs = [_chunk(1, 0.10), _chunk(2, 0.11), _chunk(2, 0.12), _chunk(3, 0.20), _chunk(4, 0.90)]
+    ranked = aggregate_episode_scores(docs, threshold=0.41, method=method)
+    assert [key[0] for key, _ in ranked] == expected
+
+
+def test_parse_fields():
+    assert retrieval.parse_fields(None) is None
+    assert retrieval.parse_fields("link, number,title") == (
+        "episode_number",
+        "episode_title",
+        "episode_link",
+    )
+    assert retrieval.parse_fields(["podcast_title"]) == ("podcast_title",)
+    with pytest.raises(ValueError):
+        retrieval.parse_fields("number,transcript")
+
+
+def test_find_episodes_reads_only_requested_columns(database, stub_search, monkeypatch):
+    monkeypatch.setattr(get, "EPISODE_CATALOG", False)
+    calls = []
+    run_query = get.run_query
+
+    def _counting_run_query(query, parameters):
+        calls.append(query)
+        return run_query(query=query, parameters=parameters)
+
+    monkeypatch.setattr(get, "run_query", _counting_run_query)
+
+    episodes = retrieval.find_episodes(
+        "who is camus?", fields=retrieval.parse_fields("number,link")
+    )
+
+    assert episodes == [
+        {"episode_number": "3", "episode_link": "https://example.com/3"},
+        {"episode_number": "5", "episode_link": "https://example.com/5"},
+    ]
+    assert "Summary" not in calls[0] and "Title" not in calls[0]
+
+
+def test_timed_out_check_is_not_cached(database, stub_search, monkeypatch):
+    searches = []
+    suggest = retrieval.suggest_me_episodes
+
+    def _counting_suggest(prompt, k=8):
+        searches.append(prompt)
+        return suggest(prompt, k)
+
+    release = threading.Event()
+    hang = [True]
+
+    def _check(episode, prompt):
+        if hang[0]:
+            release.wait(5)
+        return True
+
+    monkeypatch.setattr(retrieval, "suggest_me_episodes", _counting_suggest)
+    monkeypatch.setattr(retrieval, "RETRIEVAL_MODE", "chunk")
+    verifier = RelevanceVerifier(check=_check, timeout=0.1, fail_open=False)
+    monkeypatch.setattr(retrieval, "get_verifier", lambda: verifier)
+    try:
+        assert retrieval.find_episodes("who is camus?") == []
+    finally:
+        release.set()
+
+    hang[0] = False
+    episodes = retrieval.find_episodes("who is camus?")
+
+    assert [e["episode_number"] for e in episodes] == ["3", "5"]
+    assert len(searches) == 2
+    # the healthy result is kept
+    assert retrieval.find_episodes("who is camus?") == episodes
+    assert len(searches) == 2
@@ -0,0 +1,128 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import engine.similiarty_retrieval as retrieval
+from engine.singleflight import SingleFlight, single_flight
+
+
+def _run_concurrently(call, n):
+    with ThreadPoolExecutor(max_workers=n) as pool:
+        futures = [pool.submit(call, i) for i in range(n)]
+        return [future.exception() or future.result() for future in futures]
+
+
+def _release_when(condition, release):
+    def _watch():
+        deadline = time.monotonic() + 5
+        while not condition() and time.monotonic() < deadline:
+            time.sleep(0.001)
+        release.set()
+
+    threading.Thread(target=_watch, daemon=True).start()
+
+
+def test_concurrent_calls_share_one_computation():
+    flight = SingleFlight("test")
+    release = threading.Event()
+    calls = []
+
+    def _compute():
+        calls.append(1)
+        release.wait(5)
+        return ["result"]
+
+    _release_when(lambda: flight.coalesced == 7, release)
+    results = _run_concurrently(lambda i: flight.do("key", _compute), 8)
+
+    assert len(calls) == 1
+    assert all(result is results[0] for result in results)
+    assert flight.leaders == 1
+    assert flight.coalesced == 7
+    # the next call, after the first finished, computes again
+    flight.do("key", _compute)
+    assert len(calls) == 2
+
+
+def test_waiters_get_the_exception():
+    flight = SingleFlight("test_error")
+    started = threading.Event()
+    release = threading.Event()
+
+    def _fail():
+        started.set()
+        release.wait(5)
+        raise RuntimeError("boom")
+
+    def _call(i):
+        if i > 0:
+            started.wait(5)
+            threading.Timer(0.05, release.set).start()
+        return flight.do("key", _fail)
+
+    results = _run_concurrently(_call, 3)
+
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert flight.leaders + flight.coalesced == 3
+
+
+def test_coroutines_share_one_computation():
+    calls = []
+
+    @single_flight("test_async", key=lambda a: a)
+    async def _compute(a):
+        calls.append(a)
+        await asyncio.sleep(0.05)
+        return [a]
+
+    async def _main():
+        return await asyncio.gather(*(_compute("key") for _ in range(4)))
+
+    results = asyncio.run(_main())
+
+    assert calls == ["key"]
+    assert all(result is results[0] for result in results)
+    assert _compute.flight.coalesced == 3
+
+
+def test_find_episodes_coalesces_normalized_prompts(monkeypatch):
+    started = threading.Event()
+    release = threading.Event()
+    searches = []
+
+    def _suggest(prompt, k):
+        searches.append(prompt)
+        started.set()
+        release.wait(5)
+        return []
+
+    monkeypatch.setattr(retrieval, "RETRIEVAL_MODE", "chunk")
+    monkeypatch.setattr(retrieval, "suggest_me_episodes", _suggest)
+    flight = retrieval._find_episodes.flight
+    coalesced = flight.coalesced
+
+    def _call(i):
+        if i == 0:
+            return retrieval.find_episodes("Who is Camus?")
+        started.wait(5)
+        threading.Timer(0.05, release.set).start()
+        return retrieval.find_episodes("  who is   CAMUS? ")
+
+    assert _run_concurrently(_call, 2) == [[], []]
+
+    assert searches == ["Who is Camus?"]
+    assert flight.coalesced == coalesced + 1
+
+
+def test_key_uses_defaults():
+    seen = []
+
+    @single_flight("test_defaults", key=lambda a, b: (a, b))
+    def _function(a, b=2):
+        seen.append((a, b))
+        return a + b
+
+    assert _function(1) == 3
+    assert _function(1, b=3) == 4
+    assert seen == [(1, 2), (1, 3)]
@@ -0,0 +1,38 @@
+import time
+
+from engine.sqlite_store import SQLiteLRUStore
+
+
+class NotesStore(SQLiteLRUStore):
+    TABLE = "notes"
+    KEY_COLUMNS = ("topic", "name")
+    VALUE_COLUMN = "note"
+
+
+def test_puts_only_scan_when_the_running_total_is_exceeded(tmp_path):
+    store = NotesStore(str(tmp_path / "notes.db"), ttl=60, max_bytes=100)
+    statements = []
+    store._connection().set_trace_callback(statements.append)
+
+    for i in range(4):
+        store._write(("t", str(i)), "x" * 20)
+    assert not any("SUM(bytes)" in statement for statement in statements)
+
+    time.sleep(0.01)
+    store._read(("t", "0"))
+    store._write(("t", "4"), "x" * 20)
+    store._write(("t", "5"), "x" * 20)
+
+    assert sum("SUM(bytes)" in statement for statement in statements) == 1
+    # the least recently used entries were trimmed to 90 bytes
+    assert store._read(("t", "1")) is None and store._read(("t", "2")) is None
+    assert store._read(("t", "0")) == "x" * 20
+    assert store.evictions == 2
+    assert store._bytes == 80
+
+
+def test_running_total_starts_from_the_file(tmp_path):
+    path = str(tmp_path / "notes.db")
+    NotesStore(path, ttl=60, max_bytes=100)._write(("t", "a"), "x" * 30)
+
+    assert NotesStore(path, ttl=60, max_bytes=100)._bytes == 30
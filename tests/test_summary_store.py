@@ -0,0 +1,114 @@
+import time
+
+import engine.summarizer as summarizer
+from engine.llm import ChatLLM
+from engine.similiarty_retrieval import VectorDB
+from engine.summary_store import SummaryStore
+from tests.fakes import BagOfWordsEmbeddings, StubLLM
+
+
+def test_store_is_shared_and_keyed_by_normalized_hint(tmp_path):
+    path = str(tmp_path / "summaries.db")
+    SummaryStore(path).put("Philosophize This", 3, "Who is  Camus?", "m", "1", "a summary")
+
+    other_worker = SummaryStore(path)
+    assert other_worker.get("Philosophize This", "3", "who is camus?", "m", "1") == "a summary"
+    assert other_worker.get("Philosophize This", "3", "who is camus?", "m", "2") is None
+    assert other_worker.get("Philosophize This", "3", "who is camus?", "other", "1") is None
+    assert other_worker.stats() == {
+        "hits": 1,
+        "misses": 2,
+        "semantic_hits": 0,
+        "evictions": 0,
+        "hit_rate": 1 / 3,
+    }
+
+
+def test_ttl_and_size_eviction(tmp_path):
+    store = SummaryStore(str(tmp_path / "summaries.db"), ttl=0.2, max_bytes=25)
+    store.put("p", 1, "", "m", "1", "x" * 10)
+    store.put("p", 2, "", "m", "1", "x" * 10)
+    store.get("p", 1, "", "m", "1")
+    store.put("p", 3, "", "m", "1", "x" * 10)
+
+    # episode 2 was the least recently used
+    assert store.get("p", 2, "", "m", "1") is None
+    assert store.get("p", 1, "", "m", "1") is not None
+
+    time.sleep(0.3)
+    assert store.get("p", 3, "", "m", "1") is None
+
+
+def test_find_similar_hint(tmp_path):
+    store = SummaryStore(str(tmp_path / "summaries.db"))
+    store.put("p", 1, "camus", "m", "1", "about camus")
+    store.put_hint_vector("p", 1, "camus", "m", "1", [1.0, 0.0, 0.0])
+    store.put("p", 1, "sartre", "m", "1", "about sartre")
+    store.put_hint_vector("p", 1, "sartre", "m", "1", [0.0, 1.0, 0.0])
+    vectors = {"camus?!": [0.9, 0.1, 0.0], "kant": [0.5, 0.5, 0.0]}
+
+    assert store.lookup("p", 1, "camus?!", "m", "1", embed=vectors.get, threshold=0.95) == (
+        "about camus",
+        [0.9, 0.1, 0.0],
+    )
+    assert store.lookup("p", 1, "kant", "m", "1", embed=vectors.get, threshold=0.95)[0] is None
+    # the reused summary is now an exact hit, without embedding the hint
+    assert store.lookup("p", 1, "camus?!", "m", "1") == ("about camus", None)
+    # other episodes, models and prompt versions never share hints
+    assert store.find_similar("p", 2, "m", "1", [1.0, 0.0, 0.0], threshold=0.95) is None
+    assert store.find_similar("p", 1, "m", "2", [1.0, 0.0, 0.0], threshold=0.95) is None
+    assert store.find_similar("p", 1, "m", "1", [1.0, 0.0, 0.0], threshold=1.01) is None
+    # find_similar alone is not a lookup
+    stats = store.stats()
+    assert (stats["hits"], stats["misses"], stats["semantic_hits"]) == (1, 1, 1)
+
+
+def test_summarize_episode_reads_through(tmp_path, monkeypatch):
+    store = SummaryStore(str(tmp_path / "summaries.db"))
+    monkeypatch.setattr(summarizer, "get_summary_store", lambda: store)
+    monkeypatch.setattr(VectorDB, "_embeddings", BagOfWordsEmbeddings())
+    llm = StubLLM()
+    ChatLLM.set_llm(llm)
+    summarizer.make_summary.cache_clear()
+    loads = []
+
+    def _load_text():
+        loads.append(1)
+        return "episode text"
+
+    try:
+        first = summarizer.summarize_episode(3, "Philosophize This", "camus", _load_text)
+        second = summarizer.summarize_episode("3", "Philosophize This", " Camus ", _load_text)
+    finally:
+        ChatLLM.set_llm(None)
+        summarizer.make_summary.cache_clear()
+
+    assert first == second
+    assert llm.calls == 1
+    assert len(loads) == 1
+
+
+def test_summarize_episode_reuses_close_hints(tmp_path, monkeypatch):
+    store = SummaryStore(str(tmp_path / "summaries.db"))
+    monkeypatch.setattr(summarizer, "get_summary_store", lambda: store)
+    monkeypatch.setattr(VectorDB, "_embeddings", BagOfWordsEmbeddings())
+    llm = StubLLM()
+    ChatLLM.set_llm(llm)
+    summarizer.make_summary.cache_clear()
+
+    try:
+        first = summarizer.summarize_episode(
+            3, "Philosophize This", "what did camus think about the absurd", lambda: "text"
+        )
+        close = summarizer.summarize_episode(
+            3, "Philosophize This", "what did camus think about the absurd?!", lambda: "text"
+        )
+        summarizer.summarize_episode(3, "Philosophize This", "stoicism", lambda: "text")
+    finally:
+        ChatLLM.set_llm(None)
+        summarizer.make_summary.cache_clear()
+
+    assert first == close
+    assert llm.calls == 2
+    stats = store.stats()
+    assert (stats["hits"], stats["misses"], stats["semantic_hits"]) == (0, 2, 1)
@@ -0,0 +1,77 @@
+import zlib
+
+import numpy as np
+import pytest
+
+from langchain.schema.document import Document
+
+from engine.vector_engine import NumpyVectorIndex, export_chroma
+from tests.fakes import BagOfWordsEmbeddings
+
+
+DIM = 32
+
+
+class NoisyEmbeddings(BagOfWordsEmbeddings):
+    # seeded noise on top of the word counts, so no two chunks are at the same distance from a query
+    def embed_query(self, text):
+        noise = np.random.default_rng(zlib.crc32(text.encode())).standard_normal(self.dim)
+        return (np.asarray(super().embed_query(text)) + noise).tolist()
+
+
+@pytest.fixture
+def chroma_db(tmp_path):
+    pytest.importorskip("chromadb")
+    from langchain.vectorstores import Chroma
+
+    docs = [
+        Document(
+            page_content=f"chunk {i}",
+            metadata={"epi_num": i % 7, "podcast": "Philosophize This", "source": f"{i:03}.txt"},
+        )
+        for i in range(200)
+    ]
+    # large ef values make HNSW exhaustive on this corpus, so its results are exact too
+    return Chroma.from_documents(
+        docs,
+        NoisyEmbeddings(dim=DIM),
+        persist_directory=str(tmp_path / "chroma"),
+        collection_metadata={"hnsw:construction_ef": 400, "hnsw:search_ef": 400},
+    )
+
+
+def test_numpy_index_matches_chroma(chroma_db, tmp_path):
+    path = str(tmp_path / "npy")
+    assert export_chroma(chroma_db, path) == 200
+    index = NumpyVectorIndex.load(path)
+    assert isinstance(index.embeddings, np.memmap)
+
+    query = NoisyEmbeddings(dim=DIM).embed_query("who is camus?")
+    expected = chroma_db.similarity_search_by_vector_with_relevance_scores(query, 12)
+    actual = index.similarity_search_by_vector_with_relevance_scores(query, 12)
+
+    assert [d.page_content for d, _ in actual] == [d.page_content for d, _ in expected]
+    assert [d.metadata for d, _ in actual] == [d.metadata for d, _ in expected]
+    np.testing.assert_allclose([s for _, s in actual], [s for _, s in expected], rtol=1e-4)
+
+
+@pytest.mark.parametrize("space", ["l2", "ip", "cosine"])
+def test_top_k_is_exact(space):
+    rng = np.random.default_rng(1)
+    matrix = rng.standard_normal((50, DIM)).astype(np.float32)
+    ids = np.asarray([str(i) for i in range(50)])
+    index = NumpyVectorIndex(
+        matrix, ids, ids, ids, [""] * 50, [{}] * 50, space=space
+    )
+    query = rng.standard_normal(DIM).astype(np.float32)
+
+    if space == "l2":
+        reference = ((matrix - query) ** 2).sum(axis=1)
+    elif space == "ip":
+        reference = 1 - matrix @ query
+    else:
+        reference = 1 - matrix @ query / (np.linalg.norm(matrix, axis=1) * np.linalg.norm(query))
+
+    rows, distances = index.top_k(query, 5)
+    assert rows.tolist() == np.argsort(reference)[:5].tolist()
+    np.testing.assert_allclose(distances, np.sort(reference)[:5], rtol=1e-4, atol=1e-4)
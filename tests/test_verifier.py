@@ -0,0 +1,107 @@
+import asyncio
+import threading
+import time
+import pytest
+
+import engine.similiarty_retrieval as retrieval
+from engine.constants import Podcast
+from engine.verifier import RelevanceVerifier
+
+
+def test_all_candidates_verified_concurrently(database, stub_llm):
+    stub_llm.related = ["text 2", "text 5"]
+    stub_llm.delay = 0.3
+    episodes = [(str(i), Podcast.PHILOSOPHIZE_THIS) for i in range(1, 7)]
+    verifier = RelevanceVerifier(check=retrieval.is_related, max_concurrency=6)
+
+    start = time.monotonic()
+    verified = verifier.verify(episodes, "who is camus?")
+    elapsed = time.monotonic() - start
+
+    assert verified == [("2", Podcast.PHILOSOPHIZE_THIS), ("5", Podcast.PHILOSOPHIZE_THIS)]
+    assert stub_llm.calls == 6
+    # close to one call, far from six sequential ones
+    assert elapsed < 2 * stub_llm.delay
+
+
+def test_concurrency_cap_and_timeout():
+    running = []
+    peak = []
+
+    def _check(episode, prompt):
+        running.append(episode)
+        peak.append(len(running))
+        time.sleep(1.0 if episode == "slow" else 0.05)
+        running.remove(episode)
+        return True
+
+    verifier = RelevanceVerifier(check=_check, max_concurrency=2, timeout=0.3, fail_open=False)
+    verified = verifier.verify(["a", "slow", "b", "c"], "prompt")
+
+    assert verified == ["a", "b", "c"]
+    assert max(peak) <= 2
+
+
+def test_failed_checks_follow_fail_open():
+    def _check(episode, prompt):
+        if episode == "broken":
+            raise ValueError("context too long")
+        return episode == "yes"
+
+    episodes = ["yes", "no", "broken"]
+    assert RelevanceVerifier(check=_check, fail_open=True).verify(episodes, "p") == ["yes", "broken"]
+    assert RelevanceVerifier(check=_check, fail_open=False).verify(episodes, "p") == ["yes"]
+    assert RelevanceVerifier(check=_check).verify_with_status(episodes, "p")[1] is True
+    assert RelevanceVerifier(check=_check).verify_with_status(["yes", "no"], "p") == (["yes"], False)
+
+
+def test_async_checks_report_failures():
+    async def _acheck(episode, prompt):
+        if episode == "broken":
+            raise ValueError("rate limited")
+        return episode == "yes"
+
+    verifier = RelevanceVerifier(check=None, acheck=_acheck, fail_open=True)
+    assert asyncio.run(verifier.averify_with_status(["yes", "no", "broken"], "p")) == (
+        ["yes", "broken"],
+        True,
+    )
+    assert asyncio.run(verifier.averify_with_status(["yes", "no"], "p")) == (["yes"], False)
+
+
+def test_timed_out_checks_keep_their_slot():
+    running = []
+    peak = []
+
+    def _check(episode, prompt):
+        running.append(episode)
+        peak.append(len(running))
+        time.sleep(0.4 if episode == "slow" else 0.05)
+        running.remove(episode)
+        return True
+
+    verifier = RelevanceVerifier(check=_check, max_concurrency=1, timeout=0.3, fail_open=False)
+    assert verifier.verify(["slow", "a"], "prompt") == ["a"]
+    # "a" only started once the abandoned call returned
+    assert max(peak) == 1
+
+
+def test_hung_checks_do_not_stall_the_request():
+    release = threading.Event()
+
+    def _check(episode, prompt):
+        if episode.startswith("hung"):
+            release.wait(5)
+        return True
+
+    verifier = RelevanceVerifier(check=_check, max_concurrency=2, timeout=0.1, fail_open=True)
+    start = time.monotonic()
+    try:
+        verified, degraded = verifier.verify_with_status(["hung1", "hung2", "a", "b", "c"], "p")
+    finally:
+        release.set()
+
+    # three rounds of two checks at most
+    assert time.monotonic() - start < 1.0
+    assert verified == ["hung1", "hung2", "a", "b", "c"]
+    assert degraded